@@ -1,7 +1,9 @@
-import gradio as gr
 import os
 import json
-from mindmate_chatbot import MindMateBot
+from session_manager import SessionManager
+from mindmate_service import (state_writer_from_env, search_cache_from_env, search_client_from_env,
+                              sessions_from_env, reload_watcher_from_env, idle_evictor_from_env,
+                              stream_reply, iterate_in_thread)
 import random
 import time
 
@@ -84,140 +86,121 @@ custom_css = f"""
 }}
 """
 
-# Load or initialize the chatbot
-bot = MindMateBot("training_data.json")
-
-# Check for crisis keywords
-def check_for_crisis(message):
-    crisis_keywords = ["suicide", "kill myself", "end my life", "don't want to live", "better off dead"]
-    return any(keyword in message.lower() for keyword in crisis_keywords)
-
-# Helper function to make responses more conversational
-def make_more_conversational(response, message):
-    # Add conversation fillers and personalization
-    conversational_openers = [
-        "",  # sometimes keep it simple
-        "I hear you. ",
-        "I understand. ",
-        "That's interesting. ",
-        "Thanks for sharing that. ",
-        "I appreciate your openness. "
-    ]
-    
-    conversational_closers = [
-        "",
-        " How does that sound?",
-        " What do you think about that?",
-        " Does that make sense?",
-        " Would you like to tell me more?",
-        " How are you feeling about this?"
-    ]
-    
-    therapeutic_phrases = [
-        "As your health companion, I want to understand better. ",
-        "From a therapeutic perspective, ",
-        "It sounds like you're experiencing ",
-        "Many people feel similar things. ",
-        "Let's explore this together. "
-    ]
-    
-    # Don't add conversational elements to already conversational responses
-    if len(response.split()) > 12 and not any(phrase in response.lower() for phrase in ["how are you", "how do you feel", "what do you think"]):
-        # 30% chance to add a therapeutic phrase if message seems emotional or health-related
-        health_keywords = ["pain", "feeling", "doctor", "sick", "hurt", "tired", "stress", "anxiety", "depression"]
-        if any(keyword in message.lower() for keyword in health_keywords) and random.random() < 0.3:
-            response = random.choice(therapeutic_phrases) + response
-        else:
-            response = random.choice(conversational_openers) + response
-        
-        # Only add a closer if the response doesn't already end with a question
-        if not response.rstrip().endswith("?"):
-            # 40% chance to add a conversational closer
-            if random.random() < 0.4:
-                response = response.rstrip() + random.choice(conversational_closers)
-    
-    return response
+# Every visitor gets their own session; sessions share the training data and are spilled to disk when idle
+state_writer = state_writer_from_env()
+search_cache = search_cache_from_env()
+search_client = search_client_from_env()
+sessions = sessions_from_env(state_writer, search_cache=search_cache, search_client=search_client)
+reload_watcher = reload_watcher_from_env(sessions)
+idle_evictor = idle_evictor_from_env(sessions)
 
-# Chat function that processes messages and returns bot responses
-def chat(message, history):
+# Number of messages shown in the chat box; the full conversation stays in the session's history
+HISTORY_WINDOW = int(os.environ.get('MINDMATE_GRADIO_HISTORY', 50))
+
+# Number of visitors whose replies are generated at the same time
+CONCURRENCY = int(os.environ.get('MINDMATE_GRADIO_CONCURRENCY', 16))
+
+# Chat function that streams the bot's reply into the chat history as it is produced
+def chat(message, history, session_id):
+    if not SessionManager.is_valid_session_id(session_id):
+        session_id = SessionManager.new_session_id()
     if message == "":
-        return history
+        yield history, session_id
+        return
     
-    # Check for crisis keywords
-    if check_for_crisis(message):
-        bot_response = bot.get_crisis_response()
-    else:
-        # Process the user message
-        bot_response = bot.process_input(message)
-        
-        # Make responses more conversational
-        bot_response = make_more_conversational(bot_response, message)
+    # Show the message straight away, then fill in the reply chunk by chunk;
+    # the history is updated in place and only the latest messages are kept
+    history.append((message, ""))
+    del history[:-HISTORY_WINDOW]
+    reply = ""
+    # Gradio may resume this generator from a different thread each time, but the
+    # stream holds the session's lock, so it is taken in a thread of its own
+    for kind, text in iterate_in_thread(stream_reply(lambda: sessions.session(session_id), message)):
+        if kind == "status":
+            # Shown until the reply arrives
+            history[-1] = (message, text)
+        else:
+            reply += text
+            history[-1] = (message, reply)
+        yield history, session_id
+
+# Build the interface; gradio is imported here so importing this module stays fast
+def build_demo():
+    import gradio as gr
     
-    # Add the message and response to history
-    history = history + [(message, bot_response)]
-    return history
-
-# Create blocks for custom layout
-with gr.Blocks(css=custom_css) as demo:
-    # Header section
-    with gr.Row():
-        with gr.Column():
-            gr.HTML("""
-            <div class="header">
-                <h1>MindMate</h1>
-                <p>Your friendly AI health companion and therapeutic friend</p>
-            </div>
-            """)
-
-    # Main chat interface
-    with gr.Row():
-        with gr.Column():
-            # Simple chatbot implementation
-            chatbot = gr.Chatbot(
-                value=[
-                    (None, "Hi there! I'm MindMate, your friendly health companion and therapeutic friend. How are you feeling today?")
-                ],
-                height=500,
-                elem_id="chat-box"
-            )
+    # Create blocks for custom layout
+    with gr.Blocks(css=custom_css) as demo:
+        # Header section
+        with gr.Row():
+            with gr.Column():
+                gr.HTML("""
+                <div class="header">
+                    <h1>MindMate</h1>
+                    <p>Your friendly AI health companion and therapeutic friend</p>
+                </div>
+                """)
+
+        # Main chat interface
+        with gr.Row():
+            with gr.Column():
+                # Simple chatbot implementation
+                chatbot = gr.Chatbot(
+                    value=[
+                        (None, "Hi there! I'm MindMate, your friendly health companion and therapeutic friend. How are you feeling today?")
+                    ],
+                    height=500,
+                    elem_id="chat-box"
+                )
+            
+                # Session id of this browser session, assigned on the first message
+                session_state = gr.State(None)
             
-            # Message input
-            msg = gr.Textbox(
-                placeholder="Type your message here...",
-                lines=2,
-                label="",
-                elem_id="input-box"
-            )
+                # Message input
+                msg = gr.Textbox(
+                    placeholder="Type your message here...",
+                    lines=2,
+                    label="",
+                    elem_id="input-box"
+                )
             
-            # Clear button
-            clear = gr.Button("Clear conversation")
+                # Clear button
+                clear = gr.Button("Clear conversation")
             
-            # Set up the event handlers
-            msg.submit(chat, [msg, chatbot], chatbot).then(
-                lambda: "", None, msg
-            )
+                # Set up the event handlers
+                msg.submit(chat, [msg, chatbot, session_state], [chatbot, session_state]).then(
+                    lambda: "", None, msg
+                )
             
-            clear.click(lambda: [], None, chatbot)
-
-            # Disclaimer
-            gr.HTML("""
-            <div class="disclaimer">
-                <strong>Important:</strong> I'm an AI companion designed to provide supportive conversations about your health and wellbeing.
-                While I can offer a friendly chat and information, I'm not a licensed healthcare professional. If you're experiencing a health crisis or need
-                professional help, please contact a healthcare provider.
-            </div>
-            """)
-
-    # Footer
-    with gr.Row():
-        with gr.Column():
-            gr.HTML("""
-            <div class="footer">
-                <p>MindMate is designed with privacy in mind. Your conversations are processed locally and not stored or shared with third parties.</p>
-                <p>© 2023 MindMate - Your friendly health companion and therapeutic friend</p>
-            </div>
-            """)
+                # Clearing starts a new conversation in a new session
+                clear.click(lambda: ([], None), None, [chatbot, session_state])
+
+                # Disclaimer
+                gr.HTML("""
+                <div class="disclaimer">
+                    <strong>Important:</strong> I'm an AI companion designed to provide supportive conversations about your health and wellbeing.
+                    While I can offer a friendly chat and information, I'm not a licensed healthcare professional. If you're experiencing a health crisis or need
+                    professional help, please contact a healthcare provider.
+                </div>
+                """)
+
+        # Footer
+        with gr.Row():
+            with gr.Column():
+                gr.HTML("""
+                <div class="footer">
+                    <p>MindMate is designed with privacy in mind. Your conversations are processed locally and not stored or shared with third parties.</p>
+                    <p>© 2023 MindMate - Your friendly health companion and therapeutic friend</p>
+                </div>
+                """)
+    return demo
+
+# The interface as a module attribute, e.g. for `gradio app.py`; built on first access
+def __getattr__(name):
+    if name == "demo":
+        demo = globals()["demo"] = build_demo()
+        return demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Launch the app
 if __name__ == "__main__":
-    demo.queue().launch()
\ No newline at end of file
+    build_demo().queue(default_concurrency_limit=CONCURRENCY).launch()
\ No newline at end of file
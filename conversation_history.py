@@ -0,0 +1,188 @@
+import gzip
+import json
+import os
+from collections import deque
+from itertools import islice
+from turn import Turn
+
+# Archive segment files are named after the absolute positions of their first and last turns
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class HistoryArchive:
+    """
+    Compressed on-disk segments holding conversation turns that left the in-memory window
+    """
+
+    def __init__(self, directory, segment_size=100):
+        """
+        Initialize the archive
+
+        Args:
+            directory: Directory holding the segment files (created on first write)
+            segment_size: Number of turns written per segment
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+
+    def write_segment(self, start, entries):
+        """
+        Write a segment of consecutive turns
+
+        Rewriting a segment with the same start replaces it, so archiving is
+        safe to repeat after a crash.
+
+        Args:
+            start: Absolute position of the first turn
+            entries: List of Turn objects
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = "%09d-%09d%s" % (start, start + len(entries) - 1, SEGMENT_SUFFIX)
+        path = os.path.join(self.directory, name)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry.to_dict(), separators=(',', ':')) + "\n")
+        os.replace(temp_path, path)
+
+    def _segments(self):
+        """List (first, last, path) for every segment, in order"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            first, last = name[:-len(SEGMENT_SUFFIX)].split("-")
+            segments.append((int(first), int(last), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def read(self, offset, limit, end=None):
+        """
+        Read archived turns by absolute position
+
+        Args:
+            offset: Absolute position of the first turn to return
+            limit: Maximum number of turns to return
+            end: Optional absolute position to stop before
+
+        Returns:
+            List of Turn objects
+        """
+        stop = offset + limit if end is None else min(offset + limit, end)
+        entries = []
+        for first, last, path in self._segments():
+            if last < offset or first >= stop:
+                continue
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                for position, line in enumerate(file, start=first):
+                    if offset <= position < stop:
+                        turn = Turn.parse(json.loads(line))
+                        if turn is not None:
+                            entries.append(turn)
+        return entries
+
+
+class ConversationHistory:
+    """
+    Conversation history with a bounded in-memory window
+
+    Positions are absolute: len() is the total number of turns ever recorded,
+    and `start` is the position of the oldest turn still in memory. Turns
+    before `start` live in the archive (or are dropped if there is none).
+    Negative indexes and slices work on the in-memory window like a list.
+    """
+
+    def __init__(self, entries=(), start=0, window=None, archive=None):
+        """
+        Initialize the history
+
+        Args:
+            entries: Turns currently in memory, oldest first
+            start: Absolute position of the first entry
+            window: Number of turns to keep in memory, or None for no limit
+            archive: Optional HistoryArchive receiving turns that leave the window
+        """
+        self._entries = deque(entries)
+        self.start = start
+        self.window = window
+        self.archive = archive
+
+    def __len__(self):
+        return self.start + len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._entries)[index]
+        return self._entries[index]
+
+    def append(self, entry):
+        self._entries.append(entry)
+
+    def since(self, position):
+        """
+        Get the turns recorded at or after an absolute position
+
+        Args:
+            position: Absolute position, which must still be in memory
+
+        Returns:
+            List of Turn objects
+        """
+        if position < self.start:
+            raise IndexError("History before position %d has already been archived" % self.start)
+        offset = position - self.start
+        return list(islice(self._entries, offset, None))
+
+    def archive_overflow(self, limit):
+        """
+        Move turns beyond the window out of memory, one archive segment at a time
+
+        Args:
+            limit: Absolute position before which turns are safe to move (already persisted)
+
+        Returns:
+            Number of turns moved out of memory
+        """
+        if self.window is None:
+            return 0
+        chunk = self.archive.segment_size if self.archive else 1
+        moved = 0
+        while True:
+            movable = min(len(self._entries) - self.window, limit - self.start)
+            if movable < chunk:
+                return moved
+            if self.archive:
+                self.archive.write_segment(self.start, list(islice(self._entries, chunk)))
+            for _ in range(chunk):
+                self._entries.popleft()
+            self.start += chunk
+            moved += chunk
+
+    def page(self, offset=0, limit=50):
+        """
+        Read turns by absolute position from the archive and the in-memory window
+
+        Args:
+            offset: Absolute position of the first turn to return
+            limit: Maximum number of turns to return
+
+        Returns:
+            List of Turn objects
+        """
+        offset = max(0, offset)
+        entries = []
+        if offset < self.start and self.archive:
+            entries = self.archive.read(offset, limit, end=self.start)
+        # The rest of the requested range comes from the in-memory window
+        window_offset = max(offset, self.start)
+        count = offset + limit - window_offset
+        if count > 0:
+            first = window_offset - self.start
+            entries.extend(islice(self._entries, first, first + count))
+        return entries
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Local health information index with BM25 ranking
+
+Answers health lookups without network access. Documents are the sections
+of the knowledge base plus any .txt or .md files in a corpus directory,
+split into paragraphs. The inverted index is built once into a single
+binary file that is memory-mapped when opened, so worker processes share
+its pages and nothing is parsed at startup:
+
+    python health_index.py build --corpus health_docs -o health_index.bin
+    python health_index.py query "symptoms of anxiety"
+
+The file is written in the byte order of the machine that builds it.
+"""
+import argparse
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from knowledge_base import SECTIONS, KnowledgeBase
+
+# Index file written when no other path is given
+DEFAULT_INDEX_PATH = "health_index.bin"
+
+# File layout version; bump when the layout changes so old files are rebuilt
+MAGIC = b"MMBM25\x00\x01"
+
+# Magic, byte order, document count, term count, average document length, source digest,
+# then the offsets of the term table, term strings, postings, document table and document strings
+HEADER = struct.Struct("=8sBIId32sQQQQQ")
+
+# Per term: string offset, string length, first posting, document frequency
+TERM_FIELDS = 4
+
+# Per document: length in tokens, title offset, title length, text offset, text length
+DOC_FIELDS = 5
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Terms the bot adds to lookups that have no health words of their own; they say nothing about the question
+QUERY_FILLER_TERMS = frozenset(("health",))
+
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "been", "but", "by", "can", "do", "for", "from", "had", "has",
+    "have", "how", "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "so", "such", "that",
+    "the", "their", "them", "they", "this", "to", "was", "were", "what", "when", "which", "who", "why",
+    "will", "with", "you", "your"
+))
+
+
+def tokenize(text):
+    """
+    Split text into index terms
+
+    Lowercases, drops stopwords and strips a plural "s", so "Symptoms" and
+    "symptom" are the same term.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def collect_documents(knowledge_base=None, corpus_dir=None):
+    """
+    Gather the documents to index
+
+    Args:
+        knowledge_base: KnowledgeBase whose sections are indexed; defaults to the shared knowledge base
+        corpus_dir: Optional directory of .txt and .md files; every paragraph becomes a document
+
+    Returns:
+        List of (title, text) tuples
+    """
+    knowledge_base = knowledge_base or KnowledgeBase.shared()
+    documents = []
+    for section in SECTIONS:
+        for topic, text in getattr(knowledge_base, section).items():
+            text = text.strip()
+            if text:
+                documents.append((topic.replace("_", " "), text[0].upper() + text[1:]))
+
+    if corpus_dir:
+        for root, dirs, files in os.walk(corpus_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith((".txt", ".md")):
+                    continue
+                with open(os.path.join(root, name), 'r', encoding='utf-8', errors='replace') as file:
+                    content = file.read()
+                title = os.path.splitext(name)[0].replace("_", " ").replace("-", " ")
+                for paragraph in re.split(r"\n\s*\n", content):
+                    paragraph = " ".join(paragraph.split())
+                    if paragraph:
+                        documents.append((title, paragraph))
+    return documents
+
+
+def source_digest(documents):
+    """SHA-256 of the documents, stored in the index to detect when it is out of date"""
+    digest = hashlib.sha256()
+    for title, text in documents:
+        digest.update(title.encode('utf-8'))
+        digest.update(b"\x00")
+        digest.update(text.encode('utf-8'))
+        digest.update(b"\x01")
+    return digest.digest()
+
+
+class HealthIndex:
+    """
+    Memory-mapped BM25 index of health documents
+
+    search() has the same interface as HealthSearchClient.search, so a bot
+    can use either one for its health information lookups. The best
+    matching document is returned as the "AbstractText" of the results.
+    A lookup only matches documents through terms specific to it: filler
+    terms and terms found in most documents don't count, so an unrelated
+    question gets no match instead of the most "healthy" document.
+    """
+
+    # Lookups are answered locally in microseconds
+    remote = False
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, k1=1.5, b=0.75, max_document_share=0.5):
+        """
+        Open an index file
+
+        Args:
+            path: Path to an index file written by HealthIndex.build
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+            max_document_share: Terms found in a larger share of the documents are ignored by search()
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_document_share = max_document_share
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        (magic, byteorder, self.doc_count, self.term_count, self.average_length, self.digest,
+         terms_offset, strings_offset, postings_offset, docs_offset, doc_strings_offset) = HEADER.unpack_from(view)
+        if magic != MAGIC or byteorder != (sys.byteorder == "little"):
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"Not a compatible health index: {path}")
+        self._terms = view[terms_offset:strings_offset].cast("I")
+        self._term_strings = view[strings_offset:postings_offset]
+        self._postings = view[postings_offset:docs_offset].cast("I")
+        self._docs = view[docs_offset:doc_strings_offset].cast("I")
+        self._doc_strings = view[doc_strings_offset:]
+
+    @classmethod
+    def build(cls, documents, path=DEFAULT_INDEX_PATH):
+        """
+        Write an index file for a list of documents
+
+        Args:
+            documents: List of (title, text) tuples, e.g. from collect_documents
+            path: Path of the index file; replaced atomically
+
+        Returns:
+            The path written
+        """
+        postings = {}
+        lengths = []
+        for doc_id, (title, text) in enumerate(documents):
+            terms = tokenize(f"{title} {text}")
+            lengths.append(len(terms))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        term_table = array("I")
+        term_strings = bytearray()
+        posting_table = array("I")
+        for term in sorted(postings, key=lambda term: term.encode('utf-8')):
+            encoded = term.encode('utf-8')
+            term_table.extend((len(term_strings), len(encoded), len(posting_table) // 2, len(postings[term])))
+            term_strings += encoded
+            for doc_id, count in postings[term]:
+                posting_table.extend((doc_id, count))
+
+        doc_table = array("I")
+        doc_strings = bytearray()
+        for (title, text), length in zip(documents, lengths):
+            title_bytes, text_bytes = title.encode('utf-8'), text.encode('utf-8')
+            doc_table.extend((length, len(doc_strings), len(title_bytes), len(doc_strings) + len(title_bytes), len(text_bytes)))
+            doc_strings += title_bytes + text_bytes
+
+        # Keep the integer tables 4-byte aligned so they can be cast in place
+        term_strings += b"\x00" * (-len(term_strings) % 4)
+        terms_offset = HEADER.size + (-HEADER.size % 4)
+        strings_offset = terms_offset + len(term_table) * 4
+        postings_offset = strings_offset + len(term_strings)
+        docs_offset = postings_offset + len(posting_table) * 4
+        doc_strings_offset = docs_offset + len(doc_table) * 4
+        average_length = sum(lengths) / len(lengths) if lengths else 0.0
+        header = HEADER.pack(MAGIC, sys.byteorder == "little", len(documents), len(postings), average_length,
+                             source_digest(documents), terms_offset, strings_offset, postings_offset,
+                             docs_offset, doc_strings_offset)
+
+        # Each process writes its own temporary file, so workers building the index at once never mix their writes
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(header + b"\x00" * (terms_offset - HEADER.size))
+            file.write(term_table.tobytes())
+            file.write(term_strings)
+            file.write(posting_table.tobytes())
+            file.write(doc_table.tobytes())
+            file.write(doc_strings)
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def ensure(cls, path=DEFAULT_INDEX_PATH, knowledge_base=None, corpus_dir=None):
+        """
+        Open an index, building it first if it is missing or its sources have changed
+
+        Args:
+            path: Path of the index file
+            knowledge_base: KnowledgeBase to index; defaults to the shared knowledge base
+            corpus_dir: Optional directory of extra .txt and .md documents
+
+        Returns:
+            An open HealthIndex
+        """
+        documents = collect_documents(knowledge_base, corpus_dir)
+        try:
+            index = cls(path)
+            if index.digest == source_digest(documents):
+                return index
+            index.close()
+        except (OSError, ValueError, struct.error):
+            pass
+        cls.build(documents, path)
+        return cls(path)
+
+    def _find_term(self, term):
+        """Binary search the sorted term table; returns the term's row or -1"""
+        target = term.encode('utf-8')
+        terms, strings = self._terms, self._term_strings
+        low, high = 0, self.term_count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            offset = terms[middle * TERM_FIELDS]
+            candidate = strings[offset:offset + terms[middle * TERM_FIELDS + 1]].tobytes()
+            if candidate == target:
+                return middle
+            if candidate < target:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return -1
+
+    def scores(self, query, specific_only=False):
+        """
+        Score the documents matching any term of a query
+
+        Args:
+            query: Search query
+            specific_only: Whether to skip filler terms and terms found in more than
+                max_document_share of the documents
+
+        Returns:
+            Dictionary of document id to BM25 score
+        """
+        k1, b = self.k1, self.b
+        average_length = self.average_length or 1.0
+        docs, postings = self._docs, self._postings
+        scores = {}
+        for term in set(tokenize(query)):
+            if specific_only and term in QUERY_FILLER_TERMS:
+                continue
+            row = self._find_term(term)
+            if row < 0:
+                continue
+            start = self._terms[row * TERM_FIELDS + 2]
+            frequency = self._terms[row * TERM_FIELDS + 3]
+            if specific_only and frequency > self.max_document_share * self.doc_count:
+                continue
+            idf = math.log(1 + (self.doc_count - frequency + 0.5) / (frequency + 0.5))
+            for position in range(start * 2, (start + frequency) * 2, 2):
+                doc_id, count = postings[position], postings[position + 1]
+                length = docs[doc_id * DOC_FIELDS]
+                weight = count * (k1 + 1) / (count + k1 * (1 - b + b * length / average_length))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * weight
+        return scores
+
+    def document(self, doc_id):
+        """Get the (title, text) of a document"""
+        _, title_offset, title_length, text_offset, text_length = self._docs[doc_id * DOC_FIELDS:(doc_id + 1) * DOC_FIELDS]
+        return (
+            bytes(self._doc_strings[title_offset:title_offset + title_length]).decode('utf-8'),
+            bytes(self._doc_strings[text_offset:text_offset + text_length]).decode('utf-8')
+        )
+
+    def top_k(self, query, k=3, specific_only=False):
+        """
+        Rank the documents for a query
+
+        Returns:
+            List of (score, title, text) tuples, best first
+        """
+        ranked = sorted(self.scores(query, specific_only).items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(score,) + self.document(doc_id) for doc_id, score in ranked]
+
+    def search(self, query):
+        """
+        Look up a search query
+
+        Args:
+            query: The search query
+
+        Returns:
+            Result dictionary in the format of HealthSearchClient.search; "unavailable"
+            when no document matches a specific term, so the bot uses its generic health information
+        """
+        ranked = self.top_k(query, 1, specific_only=True)
+        if not ranked:
+            return {"status": "unavailable", "reason": "no_match"}
+        score, title, text = ranked[0]
+        return {"status": "ok", "data": {"Heading": title, "AbstractText": text, "AbstractSource": "local"}}
+
+    def close(self):
+        for view in (self._terms, self._term_strings, self._postings, self._docs, self._doc_strings):
+            view.release()
+        self._mmap.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the local health information index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="Build the index file")
+    build.add_argument("-o", "--output", default=DEFAULT_INDEX_PATH, help="Index file to write")
+    build.add_argument("--corpus", help="Directory of extra .txt and .md documents")
+    query = subcommands.add_parser("query", help="Show the best matches for a query")
+    query.add_argument("query")
+    query.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index file to search")
+    query.add_argument("-k", type=int, default=3, help="Number of matches shown")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        documents = collect_documents(corpus_dir=args.corpus)
+        HealthIndex.build(documents, args.output)
+        print(f"Indexed {len(documents)} documents into {args.output}")
+    else:
+        index = HealthIndex(args.index)
+        for score, title, text in index.top_k(args.query, args.k, specific_only=True):
+            print(f"{score:.3f}  {title}: {text[:120]}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import json
+import threading
+import time
+
+# Search API used for health information lookups
+DEFAULT_SEARCH_URL = "https://api.duckduckgo.com/"
+
+# Answer used when the search API replies with something other than JSON
+NON_JSON_RESULT = {"AbstractText": "I found some information online, but it's better to consult with a healthcare professional for accurate guidance."}
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for a while
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    calls are refused until `reset_timeout` seconds have passed. Then one
+    trial call is let through: success closes the breaker, failure opens it
+    again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Initialize the breaker
+
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Return True if a call may be made now"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_progress:
+                # Only one trial call at a time while half open
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_progress or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+
+class HealthSearchClient:
+    """
+    HTTP client for the health information search API
+
+    Connections are pooled and kept alive in one requests.Session. Every
+    lookup, retries included, must finish within `deadline` seconds, and a
+    circuit breaker stops calling the API while it keeps failing, so a slow
+    or broken search service can't hold up a turn. Requests run on a small
+    thread pool and the caller stops waiting at the deadline, since
+    requests' own timeouts only limit each socket read, not the whole reply.
+
+    search() returns a dictionary with a "status" of "ok" (results in
+    "data"), "unavailable" (the bot answers from its generic health
+    information), or "error".
+    """
+
+    # Lookups go over the network, so a caller may want to tell the user it is waiting
+    remote = True
+
+    def __init__(self, base_url=DEFAULT_SEARCH_URL, deadline=3.0, connect_timeout=1.0, retries=1, pool_size=10,
+                 failure_threshold=5, reset_timeout=30.0):
+        """
+        Initialize the client
+
+        Args:
+            base_url: URL of the search API, e.g. a local stub server in tests
+            deadline: Seconds a lookup may take in total, including retries
+            connect_timeout: Seconds allowed for opening a connection
+            retries: Extra attempts after a connection error or 5xx response, if the deadline allows
+            pool_size: Connections kept alive for reuse
+            failure_threshold: Consecutive failed lookups that open the circuit breaker
+            reset_timeout: Seconds the circuit breaker stays open
+        """
+        self.base_url = base_url
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._session = None
+        self._executor = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled requests.Session, created on the first lookup"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    # requests is slow to import, so processes that never look anything up don't load it
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def executor(self):
+        """Thread pool the requests run on, created on the first lookup"""
+        if self._executor is None:
+            with self._session_lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool_size,
+                                                        thread_name_prefix="mindmate-search")
+        return self._executor
+
+    def search(self, query):
+        """
+        Look up a search query
+
+        Args:
+            query: The search query
+
+        Returns:
+            Result dictionary with a "status" and, when it is "ok", the results as "data"
+        """
+        if not self.breaker.allow():
+            return {"status": "unavailable", "reason": "circuit_open"}
+
+        deadline = time.monotonic() + self.deadline
+        result = None
+        for attempt in range(self.retries + 1):
+            if deadline - time.monotonic() <= 0:
+                result = {"status": "unavailable", "reason": "deadline"}
+                break
+            result = self._request(query, deadline)
+            if not result.get("retry"):
+                break
+
+        result.pop("retry", None)
+        if result["status"] == "ok":
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        return result
+
+    def _request(self, query, deadline):
+        """Make one request, waiting for it until `deadline` (a time.monotonic() value)"""
+        from concurrent.futures import TimeoutError as FutureTimeout
+        future = self.executor.submit(self._fetch, query, deadline)
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            # The worker notices the deadline itself at its next read and gives up
+            future.cancel()
+            return {"status": "unavailable", "reason": "deadline"}
+
+    def _fetch(self, query, deadline):
+        """Send one request and read the reply in chunks until `deadline`"""
+        session = self.session
+        import requests
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return {"status": "unavailable", "reason": "deadline"}
+        try:
+            response = session.get(
+                self.base_url,
+                params={"q": query, "format": "json"},
+                timeout=(min(self.connect_timeout, timeout), timeout),
+                stream=True
+            )
+        except requests.Timeout:
+            return {"status": "unavailable", "reason": "deadline"}
+        except requests.ConnectionError as e:
+            return {"status": "unavailable", "reason": "connection", "error": str(e), "retry": True}
+        except requests.RequestException as e:
+            print(f"Error searching for health information: {e}")
+            return {"status": "error", "error": str(e)}
+
+        with response:
+            if response.status_code != 200:
+                return {"status": "unavailable", "reason": "status", "code": response.status_code,
+                        "retry": response.status_code >= 500}
+            # A server can keep each read under the timeout while dripping the body for much longer
+            chunks = []
+            try:
+                for chunk in response.iter_content(chunk_size=8192):
+                    if time.monotonic() >= deadline:
+                        return {"status": "unavailable", "reason": "deadline"}
+                    chunks.append(chunk)
+            except (requests.Timeout, requests.ConnectionError):
+                return {"status": "unavailable", "reason": "deadline"}
+            except requests.RequestException as e:
+                print(f"Error searching for health information: {e}")
+                return {"status": "error", "error": str(e)}
+        try:
+            return {"status": "ok", "data": json.loads(b"".join(chunks))}
+        except (json.JSONDecodeError, ValueError):
+            # DuckDuckGo API sometimes returns non-JSON responses
+            return {"status": "ok", "data": dict(NON_JSON_RESULT)}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+
+# Process-wide client, created on first use so its connection pool is shared
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_search_client():
+    """Get the shared HealthSearchClient for the default search API"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HealthSearchClient()
+        return _default_client
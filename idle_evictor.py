@@ -0,0 +1,51 @@
+import threading
+
+
+class IdleEvictor:
+    """
+    Spills a SessionManager's idle sessions to disk in the background
+
+    A daemon thread calls SessionManager.evict_idle() every `interval`
+    seconds, so memory is released for sessions nobody is talking to even
+    when the manager is below its capacity.
+    """
+
+    def __init__(self, sessions, max_idle_seconds=1800.0, interval=60.0):
+        """
+        Start evicting
+
+        Args:
+            sessions: The SessionManager whose idle sessions are spilled
+            max_idle_seconds: Sessions unused for longer than this are spilled
+            interval: Seconds between checks
+        """
+        self.sessions = sessions
+        self.max_idle_seconds = max_idle_seconds
+        self.interval = interval
+        self.spilled = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mindmate-idle-evictor", daemon=True)
+        self._thread.start()
+
+    def check(self):
+        """
+        Spill the sessions that are idle now
+
+        Returns:
+            Number of sessions spilled
+        """
+        try:
+            spilled = self.sessions.evict_idle(self.max_idle_seconds)
+        except OSError as e:
+            print(f"Error spilling idle sessions: {e}")
+            return 0
+        self.spilled += spilled
+        return spilled
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
@@ -0,0 +1,220 @@
+import math
+import re
+from collections import Counter
+
+# Words are runs of letters, digits and apostrophes
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Articles, prepositions and the like say nothing about intent, but the patterns are too few
+# to give them a low IDF, so a message made of them would match whichever intent uses them
+FUNCTION_WORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "been", "but", "by", "for", "from", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "with"
+))
+
+
+def extract_features(text, ngram_sizes=(3, 4)):
+    """
+    Split a text into word and character n-gram features
+
+    Character n-grams are taken inside each word padded with spaces, so
+    paraphrases and inflections ("stressed", "stressful") share features.
+    Function words are skipped.
+
+    Args:
+        text: The text to featurize
+        ngram_sizes: Sizes of the character n-grams to extract
+
+    Returns:
+        Counter mapping each feature to its count
+    """
+    features = Counter()
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in FUNCTION_WORDS:
+            continue
+        features["w:" + word] += 1
+        padded = " " + word + " "
+        for size in ngram_sizes:
+            for start in range(len(padded) - size + 1):
+                features["c:" + padded[start:start + size]] += 1
+    return features
+
+
+class IntentClassifier:
+    """
+    TF-IDF intent classifier over word and character n-gram features
+
+    Every intent's patterns are vectorized once into one L2-normalized row of
+    a sparse intent x feature matrix, stored column-wise as posting lists. A
+    message is scored against all intents with one sparse matrix-vector
+    product: only the postings of features present in the message are read,
+    so scoring cost follows the message, not the number of intents.
+
+    A message is normalized over all of its features, including ones no
+    pattern has. Words the training data has never seen therefore lower
+    the score, so a message that is mostly unrelated to every intent falls
+    back to the default intent.
+    """
+
+    def __init__(self, training_data, threshold=0.15, default_intent="default", ngram_sizes=(3, 4)):
+        """
+        Vectorize the patterns of every intent
+
+        Args:
+            training_data: Dictionary of intents, as loaded from training_data.json
+            threshold: Minimum cosine score for a match; below it the default intent is returned
+            default_intent: Intent returned when nothing scores above the threshold
+            ngram_sizes: Sizes of the character n-grams used as features
+        """
+        self.threshold = threshold
+        self.default_intent = default_intent
+        self.ngram_sizes = ngram_sizes
+        # Row order follows the training data, which also breaks score ties
+        self.intents = [intent for intent in training_data if intent != default_intent]
+
+        documents = []
+        for intent in self.intents:
+            counts = Counter()
+            for pattern in training_data[intent].get("patterns", []):
+                if isinstance(pattern, str):
+                    counts.update(extract_features(pattern, ngram_sizes))
+            documents.append(counts)
+
+        # Smoothed inverse document frequency over intents
+        document_frequency = Counter()
+        for counts in documents:
+            document_frequency.update(counts.keys())
+        intent_count = len(documents)
+        self.idf = {
+            feature: math.log((1 + intent_count) / (1 + frequency)) + 1
+            for feature, frequency in document_frequency.items()
+        }
+        # IDF of a feature found in no intent, used to weigh a message's unknown features
+        self.unseen_idf = math.log(1 + intent_count) + 1
+
+        # Feature -> list of (row, weight) for rows where the feature is non-zero
+        self._postings = {}
+        for row, counts in enumerate(documents):
+            for feature, weight in self._weigh(counts).items():
+                self._postings.setdefault(feature, []).append((row, weight))
+
+    @property
+    def feature_count(self):
+        return len(self._postings)
+
+    def _weigh(self, counts):
+        """
+        Turn feature counts into a sublinear TF-IDF vector over known features
+
+        The vector is L2-normalized over all the features, so unknown ones
+        weigh in with the IDF of an unseen feature even though they are left out.
+        """
+        vector = {}
+        squared_norm = 0.0
+        for feature, count in counts.items():
+            idf = self.idf.get(feature)
+            weight = (1 + math.log(count)) * (idf if idf is not None else self.unseen_idf)
+            squared_norm += weight * weight
+            if idf is not None:
+                vector[feature] = weight
+        norm = math.sqrt(squared_norm)
+        if norm:
+            for feature in vector:
+                vector[feature] /= norm
+        return vector
+
+    def vectorize(self, message):
+        """
+        Vectorize a message in the classifier's feature space
+
+        Args:
+            message: The text to vectorize
+
+        Returns:
+            Dictionary mapping known features to their weights
+        """
+        return self._weigh(extract_features(message, self.ngram_sizes))
+
+    def scores(self, message):
+        """
+        Score a message against every intent
+
+        Args:
+            message: The user's input message
+
+        Returns:
+            Dictionary mapping row number to cosine score, for intents sharing any feature
+        """
+        scores = {}
+        for feature, weight in self.vectorize(message).items():
+            for row, intent_weight in self._postings[feature]:
+                scores[row] = scores.get(row, 0.0) + weight * intent_weight
+        return scores
+
+    def _ranked(self, scores, k):
+        """Top k (intent, score) pairs, best first, ties in training data order"""
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(self.intents[row], score) for row, score in best]
+
+    def top_k(self, message, k=3):
+        """
+        Find the best scoring intents for a message
+
+        Args:
+            message: The user's input message
+            k: Number of intents to return
+
+        Returns:
+            List of (intent, score) pairs, best first
+        """
+        return self._ranked(self.scores(message), k)
+
+    def classify(self, message):
+        """
+        Pick the intent for a message
+
+        Args:
+            message: The user's input message
+
+        Returns:
+            The best scoring intent, or the default intent if none reaches the threshold
+        """
+        ranked = self.top_k(message, 1)
+        if not ranked or ranked[0][1] < self.threshold:
+            return self.default_intent
+        return ranked[0][0]
+
+    def top_k_batch(self, messages, k=3):
+        """
+        Find the best scoring intents for many messages at once
+
+        Repeated messages, common in replays and batch requests, are
+        vectorized and scored only once.
+
+        Args:
+            messages: Sequence of messages
+            k: Number of intents to return per message
+
+        Returns:
+            List with one list of (intent, score) pairs per message, in input order
+        """
+        ranked = {}
+        for message in messages:
+            if message not in ranked:
+                ranked[message] = self.top_k(message, k)
+        return [ranked[message] for message in messages]
+
+    def classify_batch(self, messages):
+        """
+        Pick the intent for many messages at once
+
+        Args:
+            messages: Sequence of messages
+
+        Returns:
+            List of intents, in input order
+        """
+        return [
+            ranked[0][0] if ranked and ranked[0][1] >= self.threshold else self.default_intent
+            for ranked in self.top_k_batch(messages, 1)
+        ]
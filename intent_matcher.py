@@ -0,0 +1,177 @@
+from collections import deque
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton for finding many keywords in a single pass
+    Matching is plain substring matching, the same as `keyword in text`
+    """
+
+    def __init__(self, keywords):
+        """
+        Build the automaton from an iterable of keywords
+
+        Args:
+            keywords: Iterable of keyword strings. Duplicates and empty strings are ignored
+        """
+        self.keywords = []
+        self._keyword_ids = {}
+        # Node 0 is the root; each node has a transition dict and an output tuple
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for keyword in keywords:
+            if not keyword or keyword in self._keyword_ids:
+                continue
+            self._keyword_ids[keyword] = len(self.keywords)
+            self.keywords.append(keyword)
+            self._insert(keyword, self._keyword_ids[keyword])
+
+        self._build_failure_links()
+
+    def _insert(self, keyword, keyword_id):
+        """Add a keyword to the trie"""
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        self._output[node] = self._output[node] + (keyword_id,)
+
+    def _build_failure_links(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        # Children of the root always fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Every keyword that ends at the failure node also ends here
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def find_all(self, text):
+        """
+        Find the set of distinct keywords present in the text
+
+        Args:
+            text: The text to scan
+
+        Returns:
+            Set of keyword ids that occur at least once
+        """
+        return self.find_all_batch((text,))[0]
+
+    def find_all_batch(self, texts):
+        """
+        Find the keywords present in each of many texts in one scanning loop
+
+        Args:
+            texts: Iterable of texts to scan
+
+        Returns:
+            List with the set of keyword ids found in each text, in input order
+        """
+        results = []
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        for text in texts:
+            found = set()
+            node = 0
+            for char in text:
+                while node and char not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(char, 0)
+                if output[node]:
+                    found.update(output[node])
+            results.append(found)
+        return results
+
+
+class IntentMatcher:
+    """
+    Compiled pattern index over the intents in the training data
+
+    All patterns are matched against a message in one pass. When several
+    intents match, the longest matching pattern wins; ties go to the intent
+    that appears first in the training data.
+    """
+
+    def __init__(self, training_data):
+        """
+        Compile the patterns of every intent into a single automaton
+
+        Args:
+            training_data: Dictionary of intents, as loaded from training_data.json
+        """
+        # Priority follows the order of intents in the training data
+        self.intent_order = [intent for intent in training_data if intent != "default"]
+        self._intent_rank = {intent: rank for rank, intent in enumerate(self.intent_order)}
+
+        # Map each lowercased pattern to the intents that use it
+        pattern_intents = {}
+        for intent in self.intent_order:
+            for pattern in training_data[intent].get("patterns", []):
+                if not isinstance(pattern, str):
+                    continue
+                pattern = pattern.lower()
+                if not pattern:
+                    continue
+                intents = pattern_intents.setdefault(pattern, [])
+                if intent not in intents:
+                    intents.append(intent)
+
+        self.automaton = KeywordAutomaton(pattern_intents)
+        self._pattern_intents = [tuple(pattern_intents[pattern]) for pattern in self.automaton.keywords]
+
+    @property
+    def pattern_count(self):
+        return len(self.automaton)
+
+    def match_all(self, message):
+        """
+        Find every intent whose patterns occur in the message
+
+        Args:
+            message: The user's input message
+
+        Returns:
+            Dictionary mapping each matched intent to its longest matching pattern
+        """
+        matches = {}
+        keywords = self.automaton.keywords
+        for keyword_id in self.automaton.find_all(message.lower()):
+            pattern = keywords[keyword_id]
+            for intent in self._pattern_intents[keyword_id]:
+                current = matches.get(intent)
+                if current is None or len(pattern) > len(current):
+                    matches[intent] = pattern
+        return matches
+
+    def best_match(self, message):
+        """
+        Pick the winning intent for a message
+
+        Args:
+            message: The user's input message
+
+        Returns:
+            The winning intent, or None if no pattern matches
+        """
+        matches = self.match_all(message)
+        if not matches:
+            return None
+        return min(matches, key=lambda intent: (-len(matches[intent]), self._intent_rank[intent]))
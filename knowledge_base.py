@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+from intent_matcher import KeywordAutomaton
+
+# Knowledge base shipped next to this module
+DEFAULT_KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.json")
+
+# Sections of the knowledge base file, each mapping a topic to a block of text
+SECTIONS = ("male_specific_context", "topic_information", "expert_additions", "health_topics")
+
+
+class KnowledgeBase:
+    """
+    Read-only topic knowledge used to enrich responses
+
+    Loaded once per process and shared by every bot and session. Each section
+    is a read-only mapping from topic to text, in the order of the data file.
+    """
+
+    # Process-wide cache of knowledge bases by path
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, data, path=None):
+        """
+        Build a knowledge base from already-parsed data
+
+        Args:
+            data: Dictionary with one topic -> text dictionary per section
+            path: Optional path the data was loaded from
+        """
+        self.path = path
+        for section in SECTIONS:
+            setattr(self, section, MappingProxyType(dict(data.get(section, {}))))
+        # Health topics are found in a query by substring, so index them for a single-pass scan
+        self._health_topic_matcher = KeywordAutomaton(self.health_topics)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_KNOWLEDGE_BASE_PATH):
+        """
+        Load a knowledge base from a JSON file
+
+        Args:
+            path: Path to the knowledge base JSON file
+
+        Returns:
+            A new KnowledgeBase
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file), path)
+
+    @classmethod
+    def shared(cls, path=DEFAULT_KNOWLEDGE_BASE_PATH):
+        """
+        Get the process-wide knowledge base for a file, loading it on first use
+
+        Args:
+            path: Path to the knowledge base JSON file
+
+        Returns:
+            The shared KnowledgeBase for the path
+        """
+        with cls._cache_lock:
+            knowledge_base = cls._cache.get(path)
+            if knowledge_base is None:
+                knowledge_base = cls._cache[path] = cls.from_file(path)
+            return knowledge_base
+
+    @classmethod
+    def share(cls, knowledge_base):
+        """Make a knowledge base the process-wide one for its path, e.g. after reloading it"""
+        with cls._cache_lock:
+            cls._cache[knowledge_base.path] = knowledge_base
+
+    def find_health_topic(self, text):
+        """
+        Find the first health topic, in file order, mentioned in a text
+
+        Args:
+            text: Lowercased text to scan
+
+        Returns:
+            The topic's information, or None if no topic is mentioned
+        """
+        found = self._health_topic_matcher.find_all(text)
+        if not found:
+            return None
+        return self.health_topics[self._health_topic_matcher.keywords[min(found)]]
@@ -0,0 +1,216 @@
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from types import MappingProxyType
+from intent_matcher import KeywordAutomaton
+
+# Keyword lists checked against every user message, grouped by what they indicate
+INDICATORS = {
+    # Communication style
+    "fact_oriented": ["facts", "research", "statistics", "studies", "evidence", "information", "data", "logical", "science"],
+    "solution_seeking": ["how to", "solution", "fix", "solve", "advice", "steps", "strategy", "what should i do", "help me", "suggestions"],
+    "emotional": ["feel", "feeling", "sad", "angry", "happy", "upset", "anxious", "depressed", "emotions", "hurt", "lonely", "scared"],
+    "action": ["do", "activity", "exercise", "practice", "try", "action", "plan", "goal", "commit", "routine"],
+    "resistance": ["don't need help", "fine", "nothing's wrong", "not a big deal", "shouldn't complain", "man up", "get over it"],
+
+    # Crisis detection
+    "crisis": [
+        "suicide", "kill myself", "end my life", "die", "better off dead",
+        "no point living", "can't go on", "about to hurt", "harm myself",
+        "don't want to be alive", "everyone would be better without me"
+    ],
+
+    # Mood tracking
+    "positive_mood": ["happy", "good", "great", "excellent", "better", "joy", "hopeful", "grateful", "motivated", "proud", "confident"],
+    "negative_mood": ["sad", "bad", "terrible", "awful", "worse", "depressed", "anxious", "angry", "stressed", "frustrated", "miserable", "hopeless", "exhausted"],
+
+    # Risk assessment
+    "suicide_risk": ["suicide", "kill myself", "end my life", "better off dead", "no point", "can't go on"],
+    "isolation_risk": ["alone", "lonely", "no one cares", "by myself", "no friends", "isolated"],
+    "substance_risk": ["drinking a lot", "drunk", "high", "using", "wasted", "hungover", "addiction"],
+    "mood_severity": ["severely", "extreme", "can't function", "hopeless", "desperate", "unbearable"],
+    "work_stress": ["hate my job", "can't stand work", "going to quit", "fired", "laid off", "boss hates me"],
+    "relationship_difficulty": ["breakup", "divorce", "separation", "cheating", "fighting constantly", "abuse"],
+
+    # Knowledge and online information requests
+    "online_explicit": [
+        "search", "look up", "internet", "online", "latest", "recent",
+        "research", "studies", "what does the internet say", "find information"
+    ],
+    "knowledge_seeking": [
+        "what is", "what are", "how does", "why do", "can you explain",
+        "tell me about", "what causes", "symptoms of", "treatment for",
+        "therapy for", "research on", "studies about", "statistics on",
+        "facts about", "information on", "definition of", "meaning of"
+    ],
+    "general_question": ["what is", "what are", "how"],
+    "depth": ["why", "explain", "understand", "curious", "interested", "tell me more", "research", "know more", "details", "elaborate", "specific", "science", "studies"],
+    "mental_health_topics": [
+        "depression", "anxiety", "ptsd", "trauma", "addiction", "substance use",
+        "bipolar", "schizophrenia", "adhd", "ocd", "eating disorders", "insomnia",
+        "stress", "burnout", "grief", "loneliness", "suicide", "self-harm",
+        "therapy", "medication", "cbt", "dbt", "psychodynamic", "mindfulness",
+        "masculine norms", "help-seeking", "emotional regulation", "vulnerability"
+    ],
+    "health_terms": [
+        "symptoms", "treatment", "cure", "medication", "therapy", "disease",
+        "condition", "syndrome", "virus", "bacterial", "infection", "chronic",
+        "acute", "pain", "inflammation", "diet", "exercise", "nutrition",
+        "mental health", "anxiety", "depression", "stress", "sleep", "fatigue",
+        "headache", "migraine", "heart", "diabetes", "cancer", "arthritis",
+        "allergy", "immune", "vitamin", "supplement", "prescription"
+    ]
+}
+
+# Specific health questions that might benefit from up-to-date information
+HEALTH_QUESTION_PATTERNS = [
+    r"what (is|are) the (symptoms|signs|causes|treatments|side effects|risks) of",
+    r"how (can|do|should) (i|you) (treat|manage|handle|deal with|cure)",
+    r"is \w+ (a symptom|treatment|cure|effective) for",
+    r"latest (research|studies|findings|treatments|guidelines) (on|for|about)",
+    r"new (treatments|medications|therapies|approaches|studies) for"
+]
+
+# Joins the messages of a batch for one pass of the question patterns, which can't match across it
+BATCH_SEPARATOR = "\x00"
+
+# Conditions or symptoms named directly, e.g. "diagnosed with diabetes"
+CONDITION_PATTERN = re.compile(r"(suffering from|have|experiencing|diagnosed with) (\w+)")
+
+
+class MessageAnalysis(namedtuple("MessageAnalysis", ["message", "lowered", "word_count", "hits", "asks_health_question"])):
+    """
+    Immutable result of scanning one user message for every indicator list
+
+    Attributes:
+        message: The original message
+        lowered: The lowercased message
+        word_count: Number of whitespace-separated words
+        hits: Read-only mapping of category to the matched indicators, in list order
+        asks_health_question: Whether the message matches a health question pattern
+    """
+    __slots__ = ()
+
+    def has(self, category):
+        """Return True if any indicator from the category occurs in the message"""
+        return category in self.hits
+
+    def matches(self, category):
+        """Return the indicators from the category found in the message, in list order"""
+        return self.hits.get(category, ())
+
+
+class MessageAnalyzer:
+    """
+    Scans a message for all indicator categories in a single pass
+    """
+
+    def __init__(self, indicators=None, question_patterns=None):
+        """
+        Compile the indicator lists and question patterns
+
+        Args:
+            indicators: Dictionary of category to keyword list (defaults to INDICATORS)
+            question_patterns: List of regex strings (defaults to HEALTH_QUESTION_PATTERNS); none may
+                match BATCH_SEPARATOR
+        """
+        indicators = INDICATORS if indicators is None else indicators
+        question_patterns = HEALTH_QUESTION_PATTERNS if question_patterns is None else question_patterns
+
+        # Remember each keyword's categories and its position within each list
+        keyword_categories = {}
+        for category, keywords in indicators.items():
+            for position, keyword in enumerate(keywords):
+                keyword_categories.setdefault(keyword.lower(), []).append((category, position))
+
+        self.automaton = KeywordAutomaton(keyword_categories)
+        self._keyword_categories = [keyword_categories[keyword] for keyword in self.automaton.keywords]
+        self._question_regex = re.compile("|".join("(?:%s)" % pattern for pattern in question_patterns)) if question_patterns else None
+
+    def analyze(self, message):
+        """
+        Scan a message once and collect every indicator hit
+
+        Args:
+            message: The user's input message
+
+        Returns:
+            A MessageAnalysis for the message
+        """
+        lowered = message.lower()
+        asks_health_question = bool(self._question_regex and self._question_regex.search(lowered))
+        return self._analysis(message, lowered, self.automaton.find_all(lowered), asks_health_question)
+
+    def _analysis(self, message, lowered, keyword_ids, asks_health_question):
+        """Build a MessageAnalysis from the automaton's keyword ids for a message"""
+        keywords = self.automaton.keywords
+        found = {}
+        for keyword_id in keyword_ids:
+            for category, position in self._keyword_categories[keyword_id]:
+                found.setdefault(category, []).append((position, keywords[keyword_id]))
+        hits = {category: tuple(keyword for _, keyword in sorted(entries)) for category, entries in found.items()}
+        return MessageAnalysis(message, lowered, len(lowered.split()), MappingProxyType(hits), asks_health_question)
+
+    def _ask_health_questions(self, texts):
+        """
+        Check many lowercased messages against the question patterns in one regex pass
+
+        The messages are joined with BATCH_SEPARATOR, which the patterns never
+        match, so each match lies within one message.
+
+        Returns:
+            List of booleans, one per message
+        """
+        asks = [False] * len(texts)
+        if not self._question_regex or not texts:
+            return asks
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(BATCH_SEPARATOR)
+        for match in self._question_regex.finditer(BATCH_SEPARATOR.join(texts)):
+            asks[bisect_right(starts, match.start()) - 1] = True
+        return asks
+
+    def analyze_batch(self, messages):
+        """
+        Analyze many messages at once
+
+        Each distinct message is analyzed once. The keyword automaton scans
+        them all in one loop, and the health question patterns are searched
+        in a single pass over the joined messages.
+
+        Args:
+            messages: Sequence of messages
+
+        Returns:
+            List of MessageAnalysis objects, in input order
+        """
+        unique = list(dict.fromkeys(messages))
+        lowered = [message.lower() for message in unique]
+        if any(BATCH_SEPARATOR in text for text in lowered):
+            # The separator would split a message; such batches are searched message by message
+            asks = [bool(self._question_regex and self._question_regex.search(text)) for text in lowered]
+        else:
+            asks = self._ask_health_questions(lowered)
+        analyses = {
+            message: self._analysis(message, text, keyword_ids, asks_health_question)
+            for message, text, keyword_ids, asks_health_question
+            in zip(unique, lowered, self.automaton.find_all_batch(lowered), asks)
+        }
+        return [analyses[message] for message in messages]
+
+
+# Shared analyzer for the built-in indicator lists
+default_analyzer = MessageAnalyzer()
+
+
+def analyze_message(message):
+    """Analyze a message with the built-in indicator lists"""
+    return default_analyzer.analyze(message)
+
+
+def analyze_messages(messages):
+    """Analyze many messages with the built-in indicator lists"""
+    return default_analyzer.analyze_batch(messages)
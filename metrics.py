@@ -0,0 +1,337 @@
+import json
+import threading
+import time
+import types
+from abc import ABC, abstractmethod
+
+# Bot methods timed as stages of a turn, grouped under the stage name reported
+STAGES = {
+    "analysis": ("analyze_message",),
+    "style_adaptation": ("adapt_communication_style",),
+    "crisis_check": ("check_for_crisis",),
+    "mood_tracking": ("track_mood",),
+    "needs_online_info": ("needs_online_info",),
+    "online_search": ("search_health_info",),
+    "find_intent": ("find_intent",),
+    "risk_assessment": ("update_risk_assessment",),
+    # Each turn takes exactly one of these; the methods they call aren't timed separately, so it is recorded once
+    "response_generation": ("generate_response_parts", "format_online_info_response", "get_crisis_response"),
+    "conversation_enhancers": ("_conversation_enhancements",),
+    "save_state": ("save_state",)
+}
+
+# Latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# History length histogram buckets in turns
+HISTORY_BUCKETS = (2, 10, 50, 100, 200, 500, 1000, 5000)
+
+
+def instrument_stages(bot, observe, stages=STAGES):
+    """
+    Time the stages of a bot's turns by wrapping its methods on the instance
+
+    Only the given bot is affected, and a bot that isn't instrumented runs
+    the plain methods. Times are exclusive: when a timed method calls another
+    timed method, the inner call is counted only under its own stage. A
+    method that returns a generator is timed over the steps taken through
+    it, and observed once it is finished or closed.
+
+    Args:
+        bot: The MindMateBot to instrument
+        observe: Function called with (stage, seconds, result) after every timed call
+        stages: Mapping of stage name to the method names it covers
+    """
+    # One stack of nested-call time per thread, since a bot can be used from several threads
+    local = threading.local()
+
+    def timed_call(total, function, *args, **kwargs):
+        """Call a function, adding its exclusive time to total[0]"""
+        stack = getattr(local, "stack", None)
+        if stack is None:
+            stack = local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            total[0] += elapsed - nested
+
+    def timed_steps(stage, generator, total):
+        """Pass a generator's items through, timing every step"""
+        try:
+            while True:
+                try:
+                    item = timed_call(total, next, generator)
+                except StopIteration:
+                    return
+                yield item
+        finally:
+            try:
+                timed_call(total, generator.close)
+            finally:
+                observe(stage, total[0], None)
+
+    def wrap(stage, method):
+        def timed(*args, **kwargs):
+            total = [0.0]
+            result = None
+            try:
+                result = timed_call(total, method, *args, **kwargs)
+            finally:
+                steps = isinstance(result, types.GeneratorType)
+                if not steps:
+                    observe(stage, total[0], result)
+            return timed_steps(stage, result, total) if steps else result
+        return timed
+
+    for stage, method_names in stages.items():
+        for method_name in method_names:
+            setattr(bot, method_name, wrap(stage, getattr(bot, method_name)))
+
+
+def _format_labels(names, values, extra=()):
+    """Render a label set in the Prometheus text format"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Base class for a named metric with optional labels; subclasses implement samples()"""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self):
+        """List (name, labels, value) samples in the Prometheus text format"""
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s %s" % (self.name, self.kind)]
+        for name, labels, value in self.samples():
+            lines.append("%s%s %s" % (name, labels, _format_value(value)))
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count, either incremented directly or read from a callback at scrape time"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        if self.callback is not None:
+            return [(self.name, "", self.callback())]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in values]
+
+
+class Gauge(Counter):
+    """Current value, either set directly or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # Per-bucket counts (not cumulative), then sum and count
+                state = self._values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][position] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, [list(state[0]), state[1], state[2]]) for labels, state in self._values.items())
+        samples = []
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", _format_labels(self.labelnames, labels, [("le", _format_value(bound))]), cumulative))
+            samples.append((self.name + "_sum", _format_labels(self.labelnames, labels), total))
+            samples.append((self.name + "_count", _format_labels(self.labelnames, labels), count))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together for a /metrics endpoint"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+class BotMetrics:
+    """
+    The MindMate metrics and the hooks that feed them
+
+    Bots only report metrics when one of these is passed to them; a bot
+    without it runs no instrumentation code on the turn path.
+    """
+
+    # Content type of the Prometheus text exposition format
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        register = self.registry.register
+        self.turn_seconds = register(Histogram(
+            "mindmate_turn_seconds", "Time to process one message"))
+        self.stage_seconds = register(Histogram(
+            "mindmate_stage_seconds", "Time spent in each stage of a turn", ["stage"]))
+        self.intents = register(Counter(
+            "mindmate_intent_total", "Messages matched to each intent", ["intent"]))
+        self.crises = register(Counter(
+            "mindmate_crisis_total", "Messages answered with the crisis response", ["source"]))
+        self.search_seconds = register(Histogram(
+            "mindmate_search_seconds", "Time spent looking up health information"))
+        self.searches = register(Counter(
+            "mindmate_search_total", "Health information lookups by outcome", ["outcome"]))
+        self.save_seconds = register(Histogram(
+            "mindmate_state_save_seconds", "Time to write a session's state changes"))
+        self.save_bytes = register(Counter(
+            "mindmate_state_save_bytes_total", "Serialized size of the state changes written"))
+        self.history_turns = register(Histogram(
+            "mindmate_history_turns", "Conversation length after each turn", buckets=HISTORY_BUCKETS))
+
+    def instrument(self, bot):
+        """
+        Start reporting a bot's turns
+
+        Args:
+            bot: The MindMateBot to instrument
+        """
+        instrument_stages(bot, self._observe_stage)
+        instrument_stages(bot, lambda stage, seconds, result: self._observe_turn(bot, seconds),
+                          {"turn": ("process_input", "process_input_parts")})
+
+    def _observe_stage(self, stage, seconds, result):
+        self.stage_seconds.observe(seconds, stage)
+        if stage == "find_intent":
+            self.intents.inc(result)
+        elif stage == "crisis_check" and result:
+            self.crises.inc("bot")
+        elif stage == "online_search":
+            self.search_seconds.observe(seconds)
+            if result is None:
+                outcome = "error"
+            elif result.get("simulated"):
+                outcome = "fallback"
+            else:
+                outcome = "ok"
+            self.searches.inc(outcome)
+
+    def _observe_turn(self, bot, seconds):
+        self.turn_seconds.observe(seconds)
+        self.history_turns.observe(len(bot.conversation_history))
+
+    def observe_save(self, seconds, delta):
+        """
+        Record one write of a bot's state
+
+        Args:
+            seconds: Time the write took
+            delta: The delta written, or None if the complete state was written
+        """
+        self.save_seconds.observe(seconds)
+        if delta:
+            self.save_bytes.inc(amount=len(json.dumps(delta, separators=(',', ':'))))
+
+    def track_sessions(self, sessions):
+        """
+        Report the number of sessions a SessionManager holds in memory
+
+        Args:
+            sessions: The SessionManager to report on
+        """
+        self.registry.register(Gauge(
+            "mindmate_active_sessions", "Sessions held in memory", callback=lambda: len(sessions)))
+
+    def track_search_cache(self, cache):
+        """
+        Report the statistics of a SearchCache
+
+        Args:
+            cache: The SearchCache to report on
+        """
+        register = self.registry.register
+        register(Counter("mindmate_search_cache_hits_total", "Search lookups answered from the cache",
+                         callback=lambda: cache.stats()["hits"]))
+        register(Counter("mindmate_search_cache_misses_total", "Search lookups not found in the cache",
+                         callback=lambda: cache.stats()["misses"]))
+        register(Gauge("mindmate_search_cache_entries", "Queries held in the search cache",
+                       callback=lambda: cache.stats()["entries"]))
+        register(Gauge("mindmate_search_cache_bytes", "Serialized size of the search cache",
+                       callback=lambda: cache.stats()["bytes"]))
+
+    def track_search_client(self, client):
+        """
+        Report the circuit breaker state of a HealthSearchClient
+
+        Args:
+            client: The HealthSearchClient to report on
+        """
+        self.registry.register(Gauge(
+            "mindmate_search_circuit_open", "1 while the search circuit breaker refuses lookups",
+            callback=lambda: int(client.breaker.state == "open")))
+
+    def render(self):
+        return self.registry.render()
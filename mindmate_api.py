@@ -1,105 +1,168 @@
-from flask import Flask, request, jsonify, render_template
-from mindmate_chatbot import MindMateBot
-import random
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+from session_manager import SessionManager
+from message_analysis import analyze_messages
+from metrics import BotMetrics
+from mindmate_service import (SESSION_COOKIE, metrics_from_env, state_writer_from_env, search_cache_from_env,
+                              search_client_from_env, sessions_from_env, reload_watcher_from_env, idle_evictor_from_env, admin_authorized,
+                              reload_sessions, respond as respond_with_metrics, stream_reply, sse_event)
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 app = Flask(__name__)
 
-# Load the chatbot
-bot = MindMateBot("training_data.json")
+# Sessions and the components they share, configured from the MINDMATE_* environment variables
+state_writer = state_writer_from_env()
+metrics = metrics_from_env()
+search_cache = search_cache_from_env(metrics)
+search_client = search_client_from_env(metrics)
+sessions = sessions_from_env(state_writer, metrics, search_cache, search_client)
+reload_watcher = reload_watcher_from_env(sessions)
+idle_evictor = idle_evictor_from_env(sessions)
 
-# Helper function to make responses more conversational
-def make_more_conversational(response, message):
-    # List of query indicators that suggest the user is asking a specific question
-    query_indicators = ["can you", "how do", "what is", "where is", "when is", "who is", 
-                        "why is", "help me", "tell me", "number", "helpline", "contact",
-                        "?", "how can", "what are", "where can", "how to"]
-    
-    # Check if the message contains query indicators
-    is_specific_query = any(indicator in message.lower() for indicator in query_indicators)
-    
-    # If it's a specific query, return the response without conversational elements
-    if is_specific_query:
-        return response
-    
-    # Add conversation fillers and personalization
-    conversational_openers = [
-        "",  # sometimes keep it simple
-        "I hear you. ",
-        "I understand. ",
-        "That's interesting. ",
-        "Thanks for sharing that. ",
-        "I appreciate your openness. "
-    ]
-    
-    conversational_closers = [
-        "",
-        " How does that sound?",
-        " What do you think about that?",
-        " Does that make sense?",
-        " Would you like to tell me more?",
-        " How are you feeling about this?"
-    ]
-    
-    therapeutic_phrases = [
-        "As your health companion, I want to understand better. ",
-        "From a therapeutic perspective, ",
-        "It sounds like you're experiencing ",
-        "Many people feel similar things. ",
-        "Let's explore this together. "
-    ]
-    
-    # Don't add conversational elements to already conversational responses
-    if len(response.split()) > 12 and not any(phrase in response.lower() for phrase in ["how are you", "how do you feel", "what do you think"]):
-        # 30% chance to add a therapeutic phrase if message seems emotional or health-related
-        health_keywords = ["pain", "feeling", "doctor", "sick", "hurt", "tired", "stress", "anxiety", "depression"]
-        if any(keyword in message.lower() for keyword in health_keywords) and random.random() < 0.3:
-            response = random.choice(therapeutic_phrases) + response
-        else:
-            response = random.choice(conversational_openers) + response
-        
-        # Only add a closer if the response doesn't already end with a question
-        if not response.rstrip().endswith("?"):
-            # 40% chance to add a conversational closer
-            if random.random() < 0.4:
-                response = response.rstrip() + random.choice(conversational_closers)
-    
+# Batch requests process different sessions in parallel on this pool
+BATCH_MAX_MESSAGES = int(os.environ.get('MINDMATE_BATCH_MAX_MESSAGES', 256))
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('MINDMATE_BATCH_WORKERS', 8)),
+    thread_name_prefix="mindmate-batch"
+)
+
+# Get the session id from the request body or cookie, or start a new session
+def get_session_id(data):
+    session_id = data.get('session_id') or request.cookies.get(SESSION_COOKIE)
+    if not SessionManager.is_valid_session_id(session_id):
+        session_id = SessionManager.new_session_id()
+    return session_id
+
+# Build a JSON response and remember the session id in a cookie
+def session_response(payload, session_id):
+    payload["session_id"] = session_id
+    response = jsonify(payload)
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
     return response
 
-# Check for crisis keywords
-def check_for_crisis(message):
-    crisis_keywords = ["suicide", "kill myself", "end my life", "don't want to live", "better off dead"]
-    return any(keyword in message.lower() for keyword in crisis_keywords)
+# Generate the reply to one message; caller holds the session
+def respond(bot, message, analysis=None):
+    return respond_with_metrics(bot, message, analysis, metrics)
+
+# Run one session's share of a batch in order, holding the session for all of its turns
+def respond_in_session(session_id, turns):
+    with sessions.session(session_id) as bot:
+        return [(position, respond(bot, message, analysis)) for position, message, analysis in turns]
 
 # API endpoint for chat
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    data = request.json
+    data = request.get_json(silent=True) or {}
     message = data.get('message', '')
+    session_id = get_session_id(data)
     
     if not message:
-        return jsonify({"response": "Please enter a message."})
+        return session_response({"response": "Please enter a message."}, session_id)
+    
+    with sessions.session(session_id) as bot:
+        bot_response = respond(bot, message)
+    
+    return session_response({"response": bot_response}, session_id)
+
+# Streaming API endpoint for chat: the reply is sent as Server-Sent Events as soon as each part is ready
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.get_json(silent=True) or {}
+    message = data.get('message', '')
+    session_id = get_session_id(data)
     
-    # Check for crisis keywords
-    if check_for_crisis(message):
-        bot_response = bot.get_crisis_response()
-    else:
-        # Process the user message
-        bot_response = bot.process_input(message)
+    def generate():
+        if not message:
+            chunks = [("response", "Please enter a message.")]
+        else:
+            chunks = stream_reply(lambda: sessions.session(session_id), message, metrics)
         
-        # Make responses more conversational
-        bot_response = make_more_conversational(bot_response, message)
+        # Each chunk is sent as it is produced; "done" carries the whole reply
+        reply = []
+        for kind, text in chunks:
+            if kind != "status":
+                reply.append(text)
+            yield sse_event("chunk", {"kind": kind, "text": text})
+        yield sse_event("done", {"session_id": session_id, "response": "".join(reply)})
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
+
+# API endpoint for many messages at once, e.g. from a gateway or an evaluation job
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    data = request.get_json(silent=True) or {}
+    items = data.get('messages')
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "Expected a list of {session_id, message} objects in 'messages'."}), 400
+    if len(items) > BATCH_MAX_MESSAGES:
+        return jsonify({"error": f"A batch can hold at most {BATCH_MAX_MESSAGES} messages."}), 400
+    
+    session_ids = [get_session_id(item) for item in items]
+    messages = [item.get('message') if isinstance(item.get('message'), str) else '' for item in items]
+    responses = ["Please enter a message."] * len(items)
     
-    return jsonify({"response": bot_response})
+    # Analyze every message up front, then group the turns by session in request order
+    analyses = analyze_messages(messages)
+    turns_by_session = {}
+    for position, (session_id, message, analysis) in enumerate(zip(session_ids, messages, analyses)):
+        if message:
+            turns_by_session.setdefault(session_id, []).append((position, message, analysis))
+    
+    # Sessions run in parallel; turns within a session run in order
+    futures = [batch_executor.submit(respond_in_session, session_id, turns)
+               for session_id, turns in turns_by_session.items()]
+    for future in futures:
+        for position, bot_response in future.result():
+            responses[position] = bot_response
+    
+    return jsonify({"responses": [
+        {"session_id": session_id, "response": bot_response}
+        for session_id, bot_response in zip(session_ids, responses)
+    ]})
+
+# API endpoint for paging through a session's conversation history
+@app.route('/api/history', methods=['GET'])
+def history():
+    session_id = request.args.get('session_id') or request.cookies.get(SESSION_COOKIE)
+    if not SessionManager.is_valid_session_id(session_id):
+        return jsonify({"history": [], "total": 0})
+    
+    offset = request.args.get('offset', 0, type=int)
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    with sessions.session(session_id) as bot:
+        entries = bot.get_history(offset, limit)
+        total = len(bot.conversation_history)
+    
+    return session_response({"history": entries, "offset": offset, "total": total}, session_id)
+
+# Metrics in the Prometheus text format, when enabled
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if metrics is None:
+        return Response("Metrics are disabled. Set MINDMATE_METRICS=1 to enable them.\n", status=404, mimetype='text/plain')
+    return Response(metrics.render(), content_type=BotMetrics.CONTENT_TYPE)
 
 # Serve a simple HTML interface
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# Admin endpoint: reload the training data and knowledge base without a restart
+@app.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    if not admin_authorized(request.headers.get('Authorization')):
+        return jsonify({"error": "Not found"}), 404
+    status, payload = reload_sessions(sessions)
+    return jsonify(payload), status
+
 # Create a template directory and index.html file if it doesn't exist
 if not os.path.exists('templates'):
-    os.makedirs('templates')
+    # Preforked workers may get here at the same time
+    os.makedirs('templates', exist_ok=True)
     
     with open('templates/index.html', 'w') as f:
         f.write('''
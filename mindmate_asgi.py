@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Asyncio MindMate server
+
+Serves the same /api/chat, /api/chat/stream, /api/chat/batch, /api/history
+and /metrics contract as mindmate_api.py as a plain ASGI application, so one
+process can hold thousands of concurrent, mostly idle chat sessions instead
+of one thread per request. Requests are parsed and messages analyzed on
+the event loop; health lookups, loading spilled sessions, the turns
+themselves and state writes run in a thread pool, since a turn waits for
+its session's lock. Run it with any ASGI server:
+
+    uvicorn mindmate_asgi:app --port 8000
+    python mindmate_asgi.py --port 8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from session_manager import SessionManager
+from message_analysis import analyze_message, analyze_messages
+from metrics import BotMetrics
+from search_cache import MISS
+from mindmate_service import (SESSION_COOKIE, LOOKUP_NOTICES, metrics_from_env, state_writer_from_env,
+                              search_cache_from_env, search_client_from_env, sessions_from_env, reload_watcher_from_env, idle_evictor_from_env,
+                              admin_authorized, reload_sessions, needs_lookup, respond_parts, sse_event)
+
+
+class DeferredStateWriter:
+    """
+    State writer that leaves each turn's save to the server
+
+    Bots mark themselves dirty instead of writing during the turn, and the
+    server writes them in the thread pool once the turn is done, so a reply
+    still isn't finished before its state is saved.
+    """
+
+    def __init__(self):
+        self._dirty = {}
+
+    def mark_dirty(self, bot):
+        self._dirty[id(bot)] = bot
+
+    def take(self, bot):
+        """Return True, once, if the bot has changes to write"""
+        return self._dirty.pop(id(bot), None) is not None
+
+
+# Blocking work (network lookups, disk reads and writes) runs on this pool
+io_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('MINDMATE_ASYNC_IO_WORKERS', 32)),
+    thread_name_prefix="mindmate-io"
+)
+
+# Sessions and the components they share, configured from the MINDMATE_* environment variables;
+# without write-behind, each turn's state is written in the pool before the reply is sent
+state_writer = state_writer_from_env()
+if state_writer is None:
+    state_writer = DeferredStateWriter()
+metrics = metrics_from_env()
+search_cache = search_cache_from_env(metrics)
+search_client = search_client_from_env(metrics)
+sessions = sessions_from_env(state_writer, metrics, search_cache, search_client)
+reload_watcher = reload_watcher_from_env(sessions)
+idle_evictor = idle_evictor_from_env(sessions)
+
+BATCH_MAX_MESSAGES = int(os.environ.get('MINDMATE_BATCH_MAX_MESSAGES', 256))
+
+
+async def run_blocking(function, *args):
+    """Run a blocking function in the I/O pool"""
+    return await asyncio.get_running_loop().run_in_executor(io_executor, function, *args)
+
+
+def plan_lookup(session_id, message, analysis):
+    """
+    Check under the session's lock whether a message needs a health lookup; blocks
+
+    Returns:
+        Tuple of (whether to look the message up, whether the answer is ready
+        without waiting on the network, the session's search function)
+    """
+    with sessions.session(session_id) as bot:
+        lookup = needs_lookup(bot, message, analysis)
+        ready = not lookup or bot.health_info_is_ready(message, analysis)
+        return lookup, ready, bot.search_health_info
+
+
+def run_turn(session_id, message, analysis, online_info, send):
+    """Answer one message under its session's lock, passing each part to send(), and write the turn's state; blocks"""
+    try:
+        with sessions.session(session_id) as bot:
+            for part in respond_parts(bot, message, analysis, metrics, online_info):
+                send(part)
+            # The state is written before the session is released, so the next turn never starts from unsaved state
+            if isinstance(state_writer, DeferredStateWriter) and state_writer.take(bot):
+                bot.persist_state()
+    finally:
+        send(None)
+
+
+async def stream_turn(session_id, message, analysis=None):
+    """
+    Reply to one message in a session as a stream of chunks
+
+    Args:
+        session_id: A valid session id
+        message: The user's message
+        analysis: Optional precomputed MessageAnalysis for the message
+
+    Yields:
+        (kind, text) tuples, as from mindmate_service.stream_reply
+    """
+    if analysis is None:
+        analysis = analyze_message(message)
+
+    # Loading a spilled session reads its state from disk
+    lookup, ready, search = await run_blocking(plan_lookup, session_id, message, analysis)
+
+    # Look health questions up before the turn, so the lookup doesn't hold the event loop or the session
+    online_info = MISS
+    if lookup:
+        if not ready:
+            yield "status", random.choice(LOOKUP_NOTICES)
+        online_info = await run_blocking(search, message, analysis)
+
+    # Taking the session can wait for another turn of it or read its state, so the turn runs in the pool
+    # too; it hands each part to the event loop as soon as it is made
+    loop = asyncio.get_running_loop()
+    parts = asyncio.Queue()
+    turn = loop.run_in_executor(io_executor, run_turn, session_id, message, analysis, online_info,
+                                lambda part: loop.call_soon_threadsafe(parts.put_nowait, part))
+    while True:
+        part = await parts.get()
+        if part is None:
+            break
+        yield part
+    # Raises if the turn failed
+    await turn
+
+
+async def chat_turn(session_id, message, analysis=None):
+    """Reply to one message in a session; returns the whole reply"""
+    return "".join([text async for kind, text in stream_turn(session_id, message, analysis) if kind != "status"])
+
+
+async def chat_turns(turns):
+    """Reply to one session's share of a batch, in order"""
+    return [(position, await chat_turn(session_id, message, analysis))
+            for position, session_id, message, analysis in turns]
+
+
+def shutdown():
+    """Stop the background work and write every resident session's state; blocks"""
+    for worker in (reload_watcher, idle_evictor):
+        if worker is not None:
+            worker.stop()
+    # The write-behind thread must finish its batch before the final save, so no session is written twice at once
+    if not isinstance(state_writer, DeferredStateWriter):
+        state_writer.close()
+    sessions.save_all()
+
+
+def read_history(session_id, offset, limit):
+    with sessions.session(session_id) as bot:
+        return bot.get_history(offset, limit), len(bot.conversation_history)
+
+
+def read_index_page():
+    with open(os.path.join('templates', 'index.html'), 'rb') as file:
+        return file.read()
+
+
+class Request:
+    """The parts of an ASGI HTTP request the endpoints use"""
+
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query = parse_qs(scope.get("query_string", b"").decode('latin-1'))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get("headers", [])}
+        self.body = body
+
+    def json(self):
+        """The body as a JSON object, or an empty dictionary if it isn't one"""
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def cookie(self, name):
+        cookies = SimpleCookie()
+        try:
+            cookies.load(self.headers.get("cookie", ""))
+        except Exception:
+            return None
+        return cookies[name].value if name in cookies else None
+
+    def arg(self, name, default=None, type=str):
+        try:
+            return type(self.query[name][0])
+        except (KeyError, IndexError, ValueError):
+            return default
+
+    def session_id(self, data):
+        """Get the session id from the request body or cookie, or start a new session"""
+        session_id = data.get('session_id') or self.cookie(SESSION_COOKIE)
+        if not SessionManager.is_valid_session_id(session_id):
+            session_id = SessionManager.new_session_id()
+        return session_id
+
+
+def json_response(payload, status=200, session_id=None):
+    """
+    Build a JSON response, remembering the session id in a cookie if given
+
+    Returns:
+        Tuple of (status, headers, body)
+    """
+    headers = [(b"content-type", b"application/json")]
+    if session_id is not None:
+        payload["session_id"] = session_id
+        headers.append(session_cookie(session_id))
+    return status, headers, json.dumps(payload).encode('utf-8')
+
+
+def session_cookie(session_id):
+    """Header remembering the session id in a cookie"""
+    return b"set-cookie", f"{SESSION_COOKIE}={session_id}; HttpOnly; Path=/; SameSite=Lax".encode('latin-1')
+
+
+def text_response(text, status=200, content_type="text/plain; charset=utf-8"):
+    return status, [(b"content-type", content_type.encode('latin-1'))], text.encode('utf-8')
+
+
+async def chat(request):
+    data = request.json()
+    message = data.get('message', '')
+    session_id = request.session_id(data)
+
+    if not message or not isinstance(message, str):
+        return json_response({"response": "Please enter a message."}, session_id=session_id)
+
+    bot_response = await chat_turn(session_id, message)
+    return json_response({"response": bot_response}, session_id=session_id)
+
+
+async def chat_stream(request):
+    data = request.json()
+    message = data.get('message', '')
+    session_id = request.session_id(data)
+
+    async def events():
+        reply = []
+        if message and isinstance(message, str):
+            chunks = stream_turn(session_id, message)
+        else:
+            chunks = empty_message_chunks()
+        # Each chunk is sent as it is produced; "done" carries the whole reply
+        async for kind, text in chunks:
+            if kind != "status":
+                reply.append(text)
+            yield sse_event("chunk", {"kind": kind, "text": text}).encode('utf-8')
+        yield sse_event("done", {"session_id": session_id, "response": "".join(reply)}).encode('utf-8')
+
+    headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), session_cookie(session_id)]
+    return 200, headers, events()
+
+
+async def empty_message_chunks():
+    yield "response", "Please enter a message."
+
+
+async def chat_batch(request):
+    items = request.json().get('messages')
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return json_response({"error": "Expected a list of {session_id, message} objects in 'messages'."}, 400)
+    if len(items) > BATCH_MAX_MESSAGES:
+        return json_response({"error": f"A batch can hold at most {BATCH_MAX_MESSAGES} messages."}, 400)
+
+    session_ids = [request.session_id(item) for item in items]
+    messages = [item.get('message') if isinstance(item.get('message'), str) else '' for item in items]
+    responses = ["Please enter a message."] * len(items)
+
+    # Analyze every message up front, then group the turns by session in request order
+    analyses = analyze_messages(messages)
+    turns_by_session = {}
+    for position, (session_id, message, analysis) in enumerate(zip(session_ids, messages, analyses)):
+        if message:
+            turns_by_session.setdefault(session_id, []).append((position, session_id, message, analysis))
+
+    # Sessions run concurrently; turns within a session run in order
+    for results in await asyncio.gather(*(chat_turns(turns) for turns in turns_by_session.values())):
+        for position, bot_response in results:
+            responses[position] = bot_response
+
+    return json_response({"responses": [
+        {"session_id": session_id, "response": bot_response}
+        for session_id, bot_response in zip(session_ids, responses)
+    ]})
+
+
+async def history(request):
+    session_id = request.arg('session_id') or request.cookie(SESSION_COOKIE)
+    if not SessionManager.is_valid_session_id(session_id):
+        return json_response({"history": [], "total": 0})
+
+    offset = request.arg('offset', 0, int)
+    limit = min(request.arg('limit', 50, int), 500)
+    # Older turns may have to be read from the session's archive
+    entries, total = await run_blocking(read_history, session_id, offset, limit)
+    return json_response({"history": entries, "offset": offset, "total": total}, session_id=session_id)
+
+
+async def prometheus_metrics(request):
+    if metrics is None:
+        return text_response("Metrics are disabled. Set MINDMATE_METRICS=1 to enable them.\n", 404)
+    return text_response(metrics.render(), content_type=BotMetrics.CONTENT_TYPE)
+
+
+async def admin_reload(request):
+    if not admin_authorized(request.headers.get('authorization')):
+        return json_response({"error": "Not found"}, 404)
+    # Compiling the new indexes is CPU work that shouldn't hold up the event loop
+    status, payload = await run_blocking(reload_sessions, sessions)
+    return json_response(payload, status)
+
+
+async def index(request):
+    try:
+        page = await run_blocking(read_index_page)
+    except OSError:
+        return text_response("Start mindmate_api.py once to create templates/index.html.\n", 404)
+    return 200, [(b"content-type", b"text/html; charset=utf-8")], page
+
+
+# (method, path) -> endpoint
+ROUTES = {
+    ("POST", "/api/chat"): chat,
+    ("POST", "/api/chat/stream"): chat_stream,
+    ("POST", "/api/chat/batch"): chat_batch,
+    ("GET", "/api/history"): history,
+    ("GET", "/metrics"): prometheus_metrics,
+    ("POST", "/api/admin/reload"): admin_reload,
+    ("GET", "/"): index
+}
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def app(scope, receive, send):
+    """The ASGI application"""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    await run_blocking(shutdown)
+                except Exception as e:
+                    print(f"Error saving sessions at shutdown: {e}")
+                io_executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    body = await read_body(receive)
+    if body is None:
+        return
+    request = Request(scope, body)
+    endpoint = ROUTES.get((request.method, request.path))
+    if endpoint is not None:
+        try:
+            status, headers, content = await endpoint(request)
+        except Exception as e:
+            print(f"Error handling {request.method} {request.path}: {e}")
+            status, headers, content = json_response({"error": "Internal server error."}, 500)
+    elif any(path == request.path for _, path in ROUTES):
+        status, headers, content = text_response("Method not allowed\n", 405)
+    else:
+        status, headers, content = text_response("Not found\n", 404)
+
+    if isinstance(content, bytes):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers + [(b"content-length", str(len(content)).encode('latin-1'))]
+        })
+        await send({"type": "http.response.body", "body": content})
+        return
+
+    # Streamed responses send every chunk as soon as it is produced
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    try:
+        async for chunk in content:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    except Exception as e:
+        print(f"Error streaming {request.method} {request.path}: {e}")
+    await send({"type": "http.response.body", "body": b""})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the asyncio MindMate server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The asyncio server runs on uvicorn; install it with: pip install uvicorn")
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency benchmark for MindMateBot.process_input
+
+Builds a message corpus from the training data patterns and replays it
+through bots with different amounts of prior history and different
+training data sizes, timing every stage of a turn separately. Online
+search is disabled so results don't depend on the network. Results are
+written as JSON; pass an earlier result file with --compare to see the
+change per stage:
+
+    python mindmate_benchmark.py -o before.json
+    python mindmate_benchmark.py -o after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from mindmate_chatbot import MindMateBot
+from training_index import TrainingIndex
+from state_journal import StateJournal
+from state_store import MemoryStateStore
+from turn import Role, Turn
+from metrics import STAGES, instrument_stages
+
+# Ways a corpus message is built from a training pattern
+MESSAGE_TEMPLATES = [
+    "{pattern}",
+    "I think {pattern} lately",
+    "what is {pattern}?",
+    "honestly {pattern} and I don't know what to do",
+    "can you tell me more about {pattern}",
+    "what are the symptoms of {pattern}?",
+    "{pattern}, it has been going on for weeks and it is getting worse"
+]
+
+
+class StageTimer:
+    """Collects the duration of every stage call on one bot"""
+
+    def __init__(self, bot, stages=STAGES):
+        self.samples = {stage: [] for stage in stages}
+        instrument_stages(bot, lambda stage, seconds, result: self.samples[stage].append(seconds), stages)
+
+
+def summarize(samples):
+    """Summary statistics in microseconds for a list of durations in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        "count": count,
+        "mean_us": round(sum(ordered) / count * 1e6, 2),
+        "p50_us": round(ordered[count // 2] * 1e6, 2),
+        "p95_us": round(ordered[min(count - 1, int(count * 0.95))] * 1e6, 2),
+        "max_us": round(ordered[-1] * 1e6, 2),
+        "total_ms": round(sum(ordered) * 1e3, 3)
+    }
+
+
+def build_training_pack(training_data, pack_size):
+    """
+    Scale the training data up by adding renamed copies of every intent
+
+    Copies get distinct patterns, so the pattern index grows with the pack
+    size while the original intents still match the corpus.
+
+    Args:
+        training_data: Dictionary of intents, as loaded from training_data.json
+        pack_size: Number of copies of the intents, including the original
+
+    Returns:
+        New training data dictionary
+    """
+    pack = dict(training_data)
+    for copy in range(1, pack_size):
+        for intent, data in training_data.items():
+            if intent == "default":
+                continue
+            pack[f"{intent}_pack{copy}"] = dict(
+                data, patterns=[f"{pattern} pack{copy}" for pattern in data.get("patterns", [])]
+            )
+    return pack
+
+
+def build_corpus(training_data, size, rng):
+    """
+    Build benchmark messages from the training data patterns
+
+    Args:
+        training_data: Dictionary of intents
+        size: Number of messages
+        rng: random.Random used to pick patterns and templates
+
+    Returns:
+        List of messages
+    """
+    patterns = [
+        pattern for data in training_data.values() for pattern in data.get("patterns", [])
+        if isinstance(pattern, str) and pattern
+    ]
+    return [rng.choice(MESSAGE_TEMPLATES).format(pattern=rng.choice(patterns)) for _ in range(size)]
+
+
+def prefill_history(bot, corpus, length, rng):
+    """Give a bot `length` turns of prior history and mark them as already saved"""
+    for position in range(length):
+        role = Role.USER if position % 2 == 0 else Role.BOT
+        bot.conversation_history.append(Turn(role, rng.choice(corpus), int(time.time())))
+    bot.state_store.compact(bot.get_state_data())
+    bot._mark_state_persisted()
+    # Archive anything beyond the window now rather than during the first timed save
+    bot.conversation_history.archive_overflow(len(bot.conversation_history))
+
+
+def run_case(index, corpus, history_length, pack_size, store, state_dir, intent_engine, seed):
+    """
+    Time every stage over the corpus for one bot configuration
+
+    Returns:
+        Dictionary with per-stage and whole-turn statistics
+    """
+    rng = random.Random(seed)
+    state_file = os.path.join(state_dir, f"bench-{history_length}-{pack_size}.json")
+    state_store = MemoryStateStore() if store == "memory" else StateJournal(state_file)
+    bot = MindMateBot(
+        index.path, state_file=state_file, index=index, state_store=state_store,
+        intent_engine=intent_engine, online_search=False
+    )
+    prefill_history(bot, corpus, history_length, rng)
+
+    timer = StageTimer(bot)
+    random.seed(seed)
+    turns = []
+    for message in corpus:
+        start = time.perf_counter()
+        bot.process_input(message)
+        turns.append(time.perf_counter() - start)
+
+    stages = {stage: summarize(samples) for stage, samples in timer.samples.items()}
+    return {
+        "history_length": history_length,
+        "pack_size": pack_size,
+        "intents": len(index.training_data),
+        "patterns": index.intent_matcher.pattern_count,
+        "stages": stages,
+        "turn": summarize(turns)
+    }
+
+
+def run_benchmark(training_data_path="training_data.json", history_lengths=(0, 200, 1000), pack_sizes=(1, 10),
+                  turns=500, store="journal", intent_engine="patterns", seed=42):
+    """
+    Run every combination of history length and pack size
+
+    Returns:
+        Result dictionary suitable for writing as JSON
+    """
+    base_index = TrainingIndex.from_file(training_data_path)
+    corpus = build_corpus(base_index.training_data, turns, random.Random(seed))
+    state_dir = tempfile.mkdtemp(prefix="mindmate-bench-")
+    cases = []
+    try:
+        for pack_size in pack_sizes:
+            pack = build_training_pack(base_index.training_data, pack_size)
+            index = TrainingIndex(pack, path=training_data_path)
+            for history_length in history_lengths:
+                cases.append(run_case(index, corpus, history_length, pack_size, store, state_dir, intent_engine, seed))
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    return {
+        "config": {
+            "training_data": training_data_path,
+            "turns": turns,
+            "history_lengths": list(history_lengths),
+            "pack_sizes": list(pack_sizes),
+            "store": store,
+            "intent_engine": intent_engine,
+            "seed": seed
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform()
+        },
+        "cases": cases
+    }
+
+
+def compare(current, baseline):
+    """
+    Compare mean stage times with an earlier result
+
+    Returns:
+        Lines of text, one per stage of every case found in both results
+    """
+    previous = {(case["history_length"], case["pack_size"]): case for case in baseline.get("cases", [])}
+    lines = []
+    for case in current["cases"]:
+        old = previous.get((case["history_length"], case["pack_size"]))
+        if old is None:
+            continue
+        lines.append(f"history={case['history_length']} pack={case['pack_size']}")
+        for stage, stats in list(case["stages"].items()) + [("turn", case["turn"])]:
+            old_stats = old["stages"].get(stage) if stage != "turn" else old["turn"]
+            if not old_stats or not old_stats.get("count") or not stats.get("count"):
+                continue
+            change = (stats["mean_us"] - old_stats["mean_us"]) / old_stats["mean_us"] * 100 if old_stats["mean_us"] else 0.0
+            lines.append(f"  {stage:<24}{old_stats['mean_us']:>12.1f}us {stats['mean_us']:>12.1f}us {change:>+8.1f}%")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of MindMateBot.process_input")
+    parser.add_argument("-o", "--output", default="-", help="File for the JSON results, or - for stdout")
+    parser.add_argument("--training-data", default="training_data.json", help="Training data JSON file")
+    parser.add_argument("--history-lengths", default="0,200,1000", help="Comma-separated prior history lengths")
+    parser.add_argument("--pack-sizes", default="1,10", help="Comma-separated training data multipliers")
+    parser.add_argument("--turns", type=int, default=500, help="Messages replayed per case")
+    parser.add_argument("--store", choices=["journal", "memory"], default="journal", help="State store used by save_state")
+    parser.add_argument("--intent-engine", choices=["patterns", "tfidf"], default="patterns")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        args.training_data,
+        history_lengths=[int(value) for value in args.history_lengths.split(",")],
+        pack_sizes=[int(value) for value in args.pack_sizes.split(",")],
+        turns=args.turns,
+        store=args.store,
+        intent_engine=args.intent_engine,
+        seed=args.seed
+    )
+
+    output = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(output + "\n")
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            for line in compare(results, json.load(file)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
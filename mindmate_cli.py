@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from mindmate_chatbot import MindMateBot
+from mindmate_service import single_session, stream_reply
 import random
 import time
 import os
@@ -26,69 +27,6 @@ def print_slow(text, delay=0.03):
         time.sleep(delay)
     print()
 
-# Helper function to make responses more conversational
-def make_more_conversational(response, message):
-    # List of query indicators that suggest the user is asking a specific question
-    query_indicators = ["can you", "how do", "what is", "where is", "when is", "who is", 
-                        "why is", "help me", "tell me", "number", "helpline", "contact",
-                        "?", "how can", "what are", "where can", "how to"]
-    
-    # Check if the message contains query indicators
-    is_specific_query = any(indicator in message.lower() for indicator in query_indicators)
-    
-    # If it's a specific query, return the response without conversational elements
-    if is_specific_query:
-        return response
-    
-    # Otherwise, add conversation fillers and personalization
-    conversational_openers = [
-        "",  # sometimes keep it simple
-        "I hear you. ",
-        "I understand. ",
-        "That's interesting. ",
-        "Thanks for sharing that. ",
-        "I appreciate your openness. "
-    ]
-    
-    conversational_closers = [
-        "",
-        " How does that sound?",
-        " What do you think about that?",
-        " Does that make sense?",
-        " Would you like to tell me more?",
-        " How are you feeling about this?"
-    ]
-    
-    therapeutic_phrases = [
-        "As your health companion, I want to understand better. ",
-        "From a therapeutic perspective, ",
-        "It sounds like you're experiencing ",
-        "Many people feel similar things. ",
-        "Let's explore this together. "
-    ]
-    
-    # Don't add conversational elements to already conversational responses
-    if len(response.split()) > 12 and not any(phrase in response.lower() for phrase in ["how are you", "how do you feel", "what do you think"]):
-        # 30% chance to add a therapeutic phrase if message seems emotional or health-related
-        health_keywords = ["pain", "feeling", "doctor", "sick", "hurt", "tired", "stress", "anxiety", "depression"]
-        if any(keyword in message.lower() for keyword in health_keywords) and random.random() < 0.3:
-            response = random.choice(therapeutic_phrases) + response
-        else:
-            response = random.choice(conversational_openers) + response
-        
-        # Only add a closer if the response doesn't already end with a question
-        if not response.rstrip().endswith("?"):
-            # 40% chance to add a conversational closer
-            if random.random() < 0.4:
-                response = response.rstrip() + random.choice(conversational_closers)
-    
-    return response
-
-# Check for crisis keywords
-def check_for_crisis(message):
-    crisis_keywords = ["suicide", "kill myself", "end my life", "don't want to live", "better off dead"]
-    return any(keyword in message.lower() for keyword in crisis_keywords)
-
 # Main CLI application
 def main():
     clear_screen()
@@ -113,6 +51,7 @@ def main():
     # Initialize the chatbot
     print("Initializing MindMate...")
     bot = MindMateBot("training_data.json")
+    session = single_session(bot)
     print("MindMate is ready to chat!\n")
     
     # Initial greeting
@@ -142,20 +81,16 @@ def main():
         if not user_input.strip():
             continue
         
-        # Generate response
-        if check_for_crisis(user_input):
-            response = bot.get_crisis_response()
-        else:
-            # Process the user message
-            response = bot.process_input(user_input)
-            
-            # Make responses more conversational
-            response = make_more_conversational(response, user_input)
-        
-        # Print bot response
-        print(Colors.GREEN + "MindMate: " + Colors.ENDC, end="")
-        print_slow(response)
-        print()
+        # Print the bot response as it is generated
+        print(Colors.GREEN + "MindMate: " + Colors.ENDC, end="", flush=True)
+        for kind, text in stream_reply(session, user_input):
+            if kind == "status":
+                # Shown while the reply waits for an online lookup
+                print(Colors.YELLOW + text + Colors.ENDC)
+                print(Colors.GREEN + "MindMate: " + Colors.ENDC, end="", flush=True)
+            else:
+                print(text, end="", flush=True)
+        print("\n")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the MindMate entry points
+
+Imports each entry point in a fresh interpreter with `python -X importtime`,
+several times, and compares the median against its budget in
+import_budget.json. The exit status is 1 if any entry point is over budget,
+so the check can run in CI:
+
+    python mindmate_importtime.py
+    python mindmate_importtime.py --runs 9 -o importtime.json
+    python mindmate_importtime.py --update
+
+--update stores the measured times plus headroom as the new budget. Each
+import runs in a scratch directory holding a copy of the training data, so
+the sessions and files an entry point sets up on import don't touch the
+repository. An entry point that fails to import, e.g. because a dependency
+isn't installed, is reported with its error and fails the check.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Directory of this module, which holds the entry points
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Budget file, mapping each entry point module to milliseconds
+DEFAULT_BUDGET_PATH = os.path.join(REPO_DIR, "import_budget.json")
+
+ENTRY_POINTS = ("mindmate_cli", "mindmate_api", "app")
+
+# Files an entry point reads from the working directory on import
+WORKING_FILES = ("training_data.json",)
+
+# One line of -X importtime output: self and cumulative microseconds, then the module indented by depth
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def parse_importtime(output, module):
+    """
+    Find a module's import time in -X importtime output
+
+    Args:
+        output: The interpreter's stderr
+        module: Name of the top-level module imported
+
+    Returns:
+        (total microseconds, {direct import: cumulative microseconds}), or None if the module isn't listed
+    """
+    children = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        # Imports are listed after everything they import, so a module's direct imports come just before it
+        if depth == 0:
+            if name == module:
+                return cumulative, children
+            children = {}
+        elif depth == 2:
+            children[name] = cumulative
+    return None
+
+
+def measure(module, workdir):
+    """
+    Import a module once in a fresh interpreter
+
+    Returns:
+        (total microseconds, {direct import: cumulative microseconds}), or an error message string
+    """
+    # Measure the default configuration whatever this shell has set
+    env = {key: value for key, value in os.environ.items() if not key.startswith("MINDMATE_")}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (REPO_DIR, env.get("PYTHONPATH"))))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return lines[-1] if lines else f"exit status {result.returncode}"
+    parsed = parse_importtime(result.stderr, module)
+    return parsed if parsed is not None else "no import time reported"
+
+
+def benchmark(entry_points, runs, top):
+    """
+    Measure every entry point in a scratch working directory
+
+    Args:
+        entry_points: Module names to import
+        runs: Timed imports per entry point, after one untimed warm-up import
+        top: Number of heaviest direct imports reported per entry point
+
+    Returns:
+        Dictionary of module name to its results
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="mindmate-importtime-") as workdir:
+        for name in WORKING_FILES:
+            shutil.copy(os.path.join(REPO_DIR, name), workdir)
+        for module in entry_points:
+            # The warm-up writes bytecode and compiled training data caches, as a deployed instance would have
+            warmup = measure(module, workdir)
+            if isinstance(warmup, str):
+                results[module] = {"error": warmup}
+                continue
+            samples = [measure(module, workdir) for _ in range(runs)]
+            totals = [sample[0] for sample in samples if not isinstance(sample, str)]
+            if not totals:
+                results[module] = {"error": samples[0]}
+                continue
+            children = samples[-1][1] if not isinstance(samples[-1], str) else warmup[1]
+            results[module] = {
+                "median_ms": round(statistics.median(totals) / 1000, 2),
+                "min_ms": round(min(totals) / 1000, 2),
+                "runs": len(totals),
+                "heaviest_imports_ms": {
+                    name: round(cumulative / 1000, 2)
+                    for name, cumulative in sorted(children.items(), key=lambda item: -item[1])[:top]
+                }
+            }
+    return results
+
+
+def check_budget(results, budget):
+    """
+    Compare results against a budget
+
+    Returns:
+        List of (module, median ms, budget ms) for every entry point over its budget;
+        the median is None for an entry point that failed to import
+    """
+    over = []
+    for module, result in results.items():
+        limit = budget.get(module)
+        if "error" in result:
+            over.append((module, None, limit))
+        elif limit is not None and result["median_ms"] > limit:
+            over.append((module, result["median_ms"], limit))
+    return over
+
+
+def new_budget(results, headroom):
+    """Budget of the measured medians times headroom, rounded up to 10 ms"""
+    return {
+        module: int(math.ceil(result["median_ms"] * headroom / 10) * 10)
+        for module, result in results.items() if "median_ms" in result
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import time of the MindMate entry points against a budget")
+    parser.add_argument("entry_points", nargs="*", default=list(ENTRY_POINTS), help="Modules to measure")
+    parser.add_argument("--runs", type=int, default=5, help="Timed imports per entry point")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest direct imports shown per entry point")
+    parser.add_argument("--budget", default=DEFAULT_BUDGET_PATH, help="Budget file")
+    parser.add_argument("--update", action="store_true", help="Write the measured times plus headroom as the budget")
+    parser.add_argument("--headroom", type=float, default=2.0, help="Budget multiplier used by --update")
+    parser.add_argument("-o", "--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.budget, 'r') as file:
+            budget = json.load(file)
+    except FileNotFoundError:
+        budget = {}
+
+    results = benchmark(args.entry_points, args.runs, args.top)
+    for module, result in results.items():
+        if "error" in result:
+            print(f"{module:<16} failed to import: {result['error']}")
+            continue
+        limit = budget.get(module)
+        print(f"{module:<16} {result['median_ms']:>8.1f} ms  (budget {limit if limit is not None else '-'} ms)")
+        for name, cumulative in result["heaviest_imports_ms"].items():
+            print(f"    {name:<28} {cumulative:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({"python": sys.version.split()[0], "budget": budget, "results": results}, file, indent=2)
+
+    if args.update:
+        budget.update(new_budget(results, args.headroom))
+        with open(args.budget, 'w') as file:
+            json.dump(budget, file, indent=4)
+            file.write("\n")
+        print(f"Budget written to {args.budget}")
+        # The budgets of entry points that failed to import are left as they were
+        return 1 if any("error" in result for result in results.values()) else 0
+
+    over = check_budget(results, budget)
+    for module, median, limit in over:
+        if median is None:
+            print(f"{module} failed to import, so its import budget can't be checked")
+        else:
+            print(f"{module} is over its import budget: {median:.1f} ms > {limit} ms")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
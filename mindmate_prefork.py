@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Preforking server for the MindMate web API
+
+The parent process binds the port and loads and compiles the training data
+and knowledge base, then forks worker processes that serve mindmate_api.py
+from the shared socket. Workers inherit the compiled data copy-on-write, so
+it is loaded once however many workers there are:
+
+    python mindmate_prefork.py --workers 4 --port 5000
+
+The kernel hands each connection to whichever worker accepts it first, so
+consecutive messages of a session may be answered by different workers.
+Sessions are therefore reloaded whenever another worker has written their
+state since (MINDMATE_SHARED_STATE), and session affinity is not needed.
+Workers that exit are replaced. POSIX only.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from training_index import TrainingIndex
+from knowledge_base import KnowledgeBase
+from health_index import DEFAULT_INDEX_PATH, HealthIndex
+
+# Training data file served by mindmate_api.py
+TRAINING_DATA_PATH = "training_data.json"
+
+
+def preload(training_data_path=TRAINING_DATA_PATH):
+    """Load everything the workers only read, before they are forked"""
+    index = TrainingIndex.shared(training_data_path)
+    if os.environ.get('MINDMATE_INTENT_ENGINE', 'patterns') == 'tfidf':
+        index.intent_classifier
+    KnowledgeBase.shared()
+
+    # Build the local health index once here rather than in every worker; workers map the same file
+    if os.environ.get('MINDMATE_SEARCH_BACKEND', 'online') == 'local':
+        HealthIndex.ensure(
+            os.environ.get('MINDMATE_SEARCH_INDEX', DEFAULT_INDEX_PATH),
+            corpus_dir=os.environ.get('MINDMATE_SEARCH_CORPUS')
+        ).close()
+
+    # Keep the preloaded objects out of garbage collection passes, which would write to their pages
+    gc.freeze()
+
+
+def run_worker(listener):
+    """Serve the API from the inherited listening socket until terminated"""
+    # Exit normally on SIGTERM so buffered state and the search cache are written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    # Sessions, state writers and thread pools are created here, after the fork
+    from werkzeug.serving import make_server
+    import mindmate_api
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, mindmate_api.app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def spawn_worker(listener):
+    """Fork a worker; returns its pid in the parent and never returns in the worker"""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(listener)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the MindMate web API in several worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    args = parser.parse_args(argv)
+
+    # Workers share session state through the state files or database
+    if args.workers > 1:
+        os.environ.setdefault('MINDMATE_SHARED_STATE', '1')
+
+    listener = socket.create_server((args.host, args.port), backlog=128)
+    preload()
+
+    workers = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        workers.add(spawn_worker(listener))
+    print(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; starting a new one")
+            # Don't spin if workers fail straight away
+            time.sleep(1)
+            workers.add(spawn_worker(listener))
+    listener.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Replay recorded conversations through MindMate offline
+
+Reads conversations as JSONL, one conversation per line, either as
+{"id": ..., "messages": ["...", ...]} or with "messages" in the history
+format ({"role": "user", "message": "..."}; bot turns are skipped).
+Each conversation is replayed in a fresh in-memory session, so nothing is
+written to disk, and one JSONL result line is written per conversation in
+input order:
+
+    python mindmate_replay.py conversations.jsonl -o results.jsonl --workers 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from itertools import islice
+from multiprocessing import Pool
+from mindmate_chatbot import MindMateBot, join_parts
+from training_index import TrainingIndex
+from knowledge_base import KnowledgeBase
+from state_store import MemoryStateStore
+
+# Settings shared by every replay in this process; set by init_worker
+_worker = {}
+
+
+def init_worker(training_data_path, intent_engine="patterns", seed=None):
+    """
+    Load the shared training index and knowledge base once per process
+
+    Args:
+        training_data_path: Path to the JSON file containing training data
+        intent_engine: Intent engine the replayed bots use
+        seed: Optional seed making each conversation's replay reproducible
+    """
+    index = TrainingIndex.shared(training_data_path)
+    if intent_engine == "tfidf":
+        # Vectorize now rather than during the first conversation
+        index.intent_classifier
+    _worker.update(
+        training_data_path=training_data_path,
+        index=index,
+        knowledge_base=KnowledgeBase.shared(),
+        intent_engine=intent_engine,
+        seed=seed
+    )
+
+
+def user_messages(conversation):
+    """List the user messages of a conversation in either input format"""
+    messages = []
+    for entry in conversation.get("messages", []):
+        if isinstance(entry, str):
+            messages.append(entry)
+        elif isinstance(entry, dict) and entry.get("role", "user") == "user" and isinstance(entry.get("message"), str):
+            messages.append(entry["message"])
+    return messages
+
+
+def replay_conversation(conversation, conversation_id=None):
+    """
+    Replay one conversation in an isolated in-memory session
+
+    Args:
+        conversation: Dictionary with a "messages" list
+        conversation_id: Id reported in the result; defaults to the conversation's "id"
+
+    Returns:
+        Result dictionary with the intent, risk scores and response of every turn; the intent
+        is "crisis" or "online" for turns answered by the crisis or online information path
+    """
+    conversation_id = conversation.get("id", conversation_id)
+    if _worker.get("seed") is not None:
+        random.seed(f"{_worker['seed']}:{conversation_id}")
+
+    # No state file, archive or network access: everything stays in this process
+    bot = MindMateBot(
+        _worker["training_data_path"],
+        index=_worker["index"],
+        state_store=MemoryStateStore(),
+        history_window=None,
+        knowledge_base=_worker["knowledge_base"],
+        intent_engine=_worker["intent_engine"],
+        online_search=False
+    )
+    turns = []
+    for message in user_messages(conversation):
+        analysis = bot.analyze_message(message)
+        crisis = bot.check_for_crisis(message, analysis)
+        parts = list(bot.process_input_parts(message, analysis))
+        # Crisis and online answers are given before any intent is matched, so record the path taken
+        if crisis:
+            intent = "crisis"
+        elif any(kind == "online" for kind, _ in parts):
+            intent = "online"
+        else:
+            intent = bot.current_topic
+        response = join_parts(parts)
+        turns.append({
+            "message": message,
+            "intent": intent,
+            "crisis": crisis,
+            "risk_factors": dict(bot.risk_factors),
+            "response": response
+        })
+    return {"id": conversation_id, "turns": turns}
+
+
+def replay_line(numbered_line):
+    """
+    Parse and replay one input line
+
+    Args:
+        numbered_line: Tuple of (line number, raw JSONL line)
+
+    Returns:
+        The result line as a JSON string, or None for a blank line
+    """
+    line_number, line = numbered_line
+    if not line.strip():
+        return None
+    try:
+        conversation = json.loads(line)
+        if not isinstance(conversation, dict):
+            raise ValueError("expected a JSON object")
+        result = replay_conversation(conversation, conversation_id=line_number)
+    except Exception as e:
+        result = {"id": line_number, "error": str(e)}
+    return json.dumps(result, ensure_ascii=False)
+
+
+def replay(lines, output, training_data_path="training_data.json", workers=None, intent_engine="patterns",
+           seed=None, chunksize=16):
+    """
+    Replay conversations from JSONL lines and stream the results
+
+    Args:
+        lines: Iterable of JSONL lines, one conversation each
+        output: Writable text file for the result lines
+        training_data_path: Path to the JSON file containing training data
+        workers: Number of worker processes; 1 replays in this process, None uses every CPU
+        intent_engine: Intent engine the replayed bots use
+        seed: Optional seed making the replay reproducible
+        chunksize: Conversations handed to a worker at a time
+
+    Returns:
+        Number of conversations replayed
+    """
+    # Loaded before the pool starts so forked workers inherit the index
+    init_worker(training_data_path, intent_engine, seed)
+    numbered = enumerate(lines, start=1)
+    count = 0
+
+    if workers == 1:
+        for numbered_line in numbered:
+            result = replay_line(numbered_line)
+            if result is not None:
+                output.write(result + "\n")
+                count += 1
+        return count
+
+    workers = workers or os.cpu_count() or 1
+    with Pool(workers, initializer=init_worker, initargs=(training_data_path, intent_engine, seed)) as pool:
+        # Feed the pool a bounded block at a time so huge inputs aren't read into memory at once
+        block_size = workers * chunksize * 4
+        while True:
+            block = list(islice(numbered, block_size))
+            if not block:
+                break
+            for result in pool.imap(replay_line, block, chunksize):
+                if result is not None:
+                    output.write(result + "\n")
+                    count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay JSONL conversations through MindMate offline")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of conversations, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="File for the JSONL results, or - for stdout")
+    parser.add_argument("--training-data", default="training_data.json", help="Training data JSON file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--intent-engine", choices=["patterns", "tfidf"], default="patterns")
+    parser.add_argument("--seed", default=None, help="Seed for reproducible responses")
+    parser.add_argument("--chunksize", type=int, default=16, help="Conversations sent to a worker at a time")
+    args = parser.parse_args(argv)
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, 'r', encoding='utf-8')
+    output_file = sys.stdout if args.output == "-" else open(args.output, 'w', encoding='utf-8')
+    try:
+        count = replay(input_file, output_file, args.training_data, args.workers, args.intent_engine,
+                       args.seed, args.chunksize)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    print(f"Replayed {count} conversations", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
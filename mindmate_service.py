@@ -0,0 +1,326 @@
+"""
+Components shared by the MindMate front ends
+
+The Flask API (mindmate_api.py) and the asyncio server (mindmate_asgi.py)
+serve the same sessions and reply the same way, and the CLI and Gradio app
+stream replies the same way. The helpers here configure the shared parts
+from the MINDMATE_* environment variables described in DEPLOY.md and build
+the reply to one message, whole or as a stream of chunks.
+"""
+import json
+import os
+import queue
+import random
+import threading
+from contextlib import contextmanager
+from mindmate_chatbot import join_parts, frame_parts
+from search_cache import MISS, SearchCache
+from health_search import DEFAULT_SEARCH_URL, HealthSearchClient
+
+# The other components are imported by the functions that build them, so the
+# CLI, which only streams replies, doesn't pay for what the servers use
+
+# Cookie used to remember each visitor's session id
+SESSION_COOKIE = "mindmate_session"
+
+
+def metrics_from_env():
+    """Prometheus metrics at /metrics; when disabled no instrumentation runs at all"""
+    from metrics import BotMetrics
+    return BotMetrics() if os.environ.get('MINDMATE_METRICS', '').lower() in ('1', 'true', 'yes') else None
+
+
+def state_writer_from_env():
+    """Optionally write state in the background, trading a short durability window for latency"""
+    delay = os.environ.get('MINDMATE_WRITE_BEHIND_DELAY')
+    if not delay:
+        return None
+    from write_behind import WriteBehindWriter
+    return WriteBehindWriter(
+        delay=float(delay),
+        max_batch=int(os.environ.get('MINDMATE_WRITE_BEHIND_BATCH', 64))
+    )
+
+
+def search_cache_from_env(metrics=None):
+    """Health information lookups are cached for every session"""
+    search_cache = SearchCache(
+        ttl=float(os.environ.get('MINDMATE_SEARCH_CACHE_TTL', 3600)),
+        negative_ttl=float(os.environ.get('MINDMATE_SEARCH_CACHE_NEGATIVE_TTL', 300)),
+        max_entries=int(os.environ.get('MINDMATE_SEARCH_CACHE_ENTRIES', 1024)),
+        max_bytes=int(float(os.environ.get('MINDMATE_SEARCH_CACHE_MB', 8)) * 1024 * 1024),
+        path=os.environ.get('MINDMATE_SEARCH_CACHE_FILE')
+    )
+    if metrics is not None:
+        metrics.track_search_cache(search_cache)
+    return search_cache
+
+
+def search_client_from_env(metrics=None):
+    """Health lookups use the search API, or the local BM25 index for deployments without outbound network"""
+    if os.environ.get('MINDMATE_SEARCH_BACKEND', 'online') == 'local':
+        from health_index import DEFAULT_INDEX_PATH, HealthIndex
+        return HealthIndex.ensure(
+            os.environ.get('MINDMATE_SEARCH_INDEX', DEFAULT_INDEX_PATH),
+            corpus_dir=os.environ.get('MINDMATE_SEARCH_CORPUS')
+        )
+
+    # Lookups share one pool of kept-alive connections, must finish within the deadline,
+    # and stop for a while when the search service keeps failing
+    search_client = HealthSearchClient(
+        base_url=os.environ.get('MINDMATE_SEARCH_URL', DEFAULT_SEARCH_URL),
+        deadline=float(os.environ.get('MINDMATE_SEARCH_DEADLINE', 3)),
+        retries=int(os.environ.get('MINDMATE_SEARCH_RETRIES', 1)),
+        pool_size=int(os.environ.get('MINDMATE_SEARCH_POOL_SIZE', 10)),
+        failure_threshold=int(os.environ.get('MINDMATE_SEARCH_BREAKER_FAILURES', 5)),
+        reset_timeout=float(os.environ.get('MINDMATE_SEARCH_BREAKER_RESET', 30))
+    )
+    if metrics is not None:
+        metrics.track_search_client(search_client)
+    return search_client
+
+
+def sessions_from_env(state_writer=None, metrics=None, search_cache=None, search_client=None,
+                      training_data_path="training_data.json"):
+    """One bot per session, all sharing the same compiled training data"""
+    from session_manager import SessionManager
+    from sqlite_state_store import SQLiteStateStore
+    # Store session state in SQLite when a database path is configured, otherwise in per-session files
+    state_db = os.environ.get('MINDMATE_STATE_DB')
+    return SessionManager(
+        training_data_path,
+        sessions_dir=os.environ.get('MINDMATE_SESSIONS_DIR', 'sessions'),
+        max_sessions=int(os.environ.get('MINDMATE_MAX_SESSIONS', 1000)),
+        store_factory=SQLiteStateStore.factory(state_db) if state_db else None,
+        state_writer=state_writer,
+        history_window=int(os.environ.get('MINDMATE_HISTORY_WINDOW', 200)),
+        intent_engine=os.environ.get('MINDMATE_INTENT_ENGINE', 'patterns'),
+        metrics=metrics,
+        search_cache=search_cache,
+        search_client=search_client,
+        shared_state=os.environ.get('MINDMATE_SHARED_STATE', '').lower() in ('1', 'true', 'yes')
+    )
+
+
+def reload_watcher_from_env(sessions):
+    """Optionally reload the training data whenever its files change, without a restart"""
+    interval = os.environ.get('MINDMATE_RELOAD_INTERVAL')
+    if not interval:
+        return None
+    from reload_watcher import ReloadWatcher
+    return ReloadWatcher(sessions, interval=float(interval))
+
+
+def idle_evictor_from_env(sessions):
+    """Spill sessions to disk once they have been idle for a while; 0 keeps them until capacity is reached"""
+    max_idle_seconds = float(os.environ.get('MINDMATE_SESSION_IDLE_SECONDS', 1800))
+    if max_idle_seconds <= 0:
+        return None
+    from idle_evictor import IdleEvictor
+    return IdleEvictor(sessions, max_idle_seconds, interval=min(60.0, max_idle_seconds / 2))
+
+
+# Check the Authorization header of an admin request; admin endpoints are disabled without MINDMATE_ADMIN_TOKEN
+def admin_authorized(authorization):
+    token = os.environ.get('MINDMATE_ADMIN_TOKEN')
+    if not token or not authorization:
+        return False
+    import hmac
+    return hmac.compare_digest(authorization.encode('utf-8'), f"Bearer {token}".encode('utf-8'))
+
+# Reload the training data for the admin endpoint; returns the HTTP status and JSON payload
+def reload_sessions(sessions):
+    try:
+        index = sessions.reload()
+    except (OSError, ValueError) as e:
+        return 400, {"status": "error", "error": str(e)}
+    return 200, {"status": "reloaded", "intents": len(index.training_data),
+                 "patterns": index.intent_matcher.pattern_count}
+
+
+# Notices sent while a reply waits for an online lookup
+LOOKUP_NOTICES = [
+    "Let me look that up for you...",
+    "Give me a moment to find some information on that...",
+    "Let me check what I can find about that..."
+]
+
+
+# Helper function to make responses more conversational
+def make_more_conversational(response, message):
+    opener, closer = conversational_framing(response, message)
+    response = opener + response
+    if closer is not None:
+        response = response.rstrip() + closer
+    return response
+
+# Choose the opener and closer that make a response more conversational; closer is None when none is added
+def conversational_framing(response, message):
+    # List of query indicators that suggest the user is asking a specific question
+    query_indicators = ["can you", "how do", "what is", "where is", "when is", "who is",
+                        "why is", "help me", "tell me", "number", "helpline", "contact",
+                        "?", "how can", "what are", "where can", "how to"]
+
+    # Check if the message contains query indicators
+    is_specific_query = any(indicator in message.lower() for indicator in query_indicators)
+
+    # If it's a specific query, return the response without conversational elements
+    if is_specific_query:
+        return "", None
+
+    # Add conversation fillers and personalization
+    conversational_openers = [
+        "",  # sometimes keep it simple
+        "I hear you. ",
+        "I understand. ",
+        "That's interesting. ",
+        "Thanks for sharing that. ",
+        "I appreciate your openness. "
+    ]
+
+    conversational_closers = [
+        "",
+        " How does that sound?",
+        " What do you think about that?",
+        " Does that make sense?",
+        " Would you like to tell me more?",
+        " How are you feeling about this?"
+    ]
+
+    therapeutic_phrases = [
+        "As your health companion, I want to understand better. ",
+        "From a therapeutic perspective, ",
+        "It sounds like you're experiencing ",
+        "Many people feel similar things. ",
+        "Let's explore this together. "
+    ]
+
+    opener, closer = "", None
+
+    # Don't add conversational elements to already conversational responses
+    if len(response.split()) > 12 and not any(phrase in response.lower() for phrase in ["how are you", "how do you feel", "what do you think"]):
+        # 30% chance to add a therapeutic phrase if message seems emotional or health-related
+        health_keywords = ["pain", "feeling", "doctor", "sick", "hurt", "tired", "stress", "anxiety", "depression"]
+        if any(keyword in message.lower() for keyword in health_keywords) and random.random() < 0.3:
+            opener = random.choice(therapeutic_phrases)
+        else:
+            opener = random.choice(conversational_openers)
+
+        # Only add a closer if the response doesn't already end with a question
+        if not response.rstrip().endswith("?"):
+            # 40% chance to add a conversational closer
+            if random.random() < 0.4:
+                closer = random.choice(conversational_closers)
+
+    return opener, closer
+
+# Check for crisis keywords
+def check_for_crisis(message):
+    crisis_keywords = ["suicide", "kill myself", "end my life", "don't want to live", "better off dead"]
+    return any(keyword in message.lower() for keyword in crisis_keywords)
+
+# Whether the reply to a message looks health information up first
+def needs_lookup(bot, message, analysis):
+    return not check_for_crisis(message) and not analysis.has("crisis") and bot.needs_online_info(message, analysis)
+
+# Generate the reply to one message as (kind, text) parts, each made once the previous one is taken; caller holds the session
+def respond_parts(bot, message, analysis=None, metrics=None, online_info=MISS):
+    # Check for crisis keywords
+    if check_for_crisis(message):
+        if metrics is not None:
+            metrics.crises.inc("api")
+        yield "response", bot.get_crisis_response()
+        return
+
+    # Process the user message, making it more conversational; the framing is chosen
+    # from the core response, so that goes out before the optional parts are made
+    yield from frame_parts(bot.process_input_parts(message, analysis, online_info),
+                           lambda response: conversational_framing(response, message), strip=True)
+
+# Generate the reply to one message; caller holds the session
+def respond(bot, message, analysis=None, metrics=None, online_info=MISS):
+    return join_parts(respond_parts(bot, message, analysis, metrics, online_info))
+
+# Session function for stream_reply in front ends with a single bot
+def single_session(bot):
+    @contextmanager
+    def session():
+        with bot.lock:
+            yield bot
+    return session
+
+# Reply to a message as a stream of (kind, text) chunks
+def stream_reply(session, message, metrics=None):
+    """
+    Reply to a message in chunks, sending what is ready first
+
+    A "status" chunk is sent straight away when the reply has to wait for an
+    online lookup; it is not part of the reply. The reply follows as its
+    core "response" and its optional "resources", "expert" and "online"
+    parts, each made once the previous one is taken; their texts joined
+    together are the reply. The session is held until the last chunk is
+    taken, so take them all from one thread (see iterate_in_thread).
+
+    Args:
+        session: Function returning a context manager that yields the bot with
+            exclusive access, e.g. lambda: sessions.session(session_id)
+        message: The user's message
+        metrics: Optional BotMetrics
+
+    Yields:
+        (kind, text) tuples
+    """
+    with session() as bot:
+        analysis = bot.analyze_message(message)
+        if not needs_lookup(bot, message, analysis):
+            yield from respond_parts(bot, message, analysis, metrics)
+            return
+        ready = bot.health_info_is_ready(message, analysis)
+        search = bot.search_health_info
+
+    # The lookup runs without holding the session
+    if not ready:
+        yield "status", random.choice(LOOKUP_NOTICES)
+    online_info = search(message, analysis)
+
+    with session() as bot:
+        yield from respond_parts(bot, message, analysis, metrics, online_info)
+
+# Iterate a generator in a thread of its own, for consumers that may resume it from different threads
+def iterate_in_thread(generator):
+    """
+    Take a generator's items in one background thread and pass them on
+
+    stream_reply holds the session's lock until its last chunk is taken,
+    and the lock must be released by the thread that took it.
+
+    Args:
+        generator: The generator to consume
+
+    Yields:
+        The generator's items; an exception it raises is raised here
+    """
+    items = queue.Queue()
+
+    def produce():
+        try:
+            for item in generator:
+                items.put((True, item))
+        except BaseException as error:
+            items.put((False, error))
+        else:
+            items.put((False, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        more, item = items.get()
+        if more:
+            yield item
+        elif item is None:
+            return
+        else:
+            raise item
+
+# Format one Server-Sent Events message
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
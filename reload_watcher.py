@@ -0,0 +1,76 @@
+import os
+import threading
+
+
+class ReloadWatcher:
+    """
+    Reloads a SessionManager's training data when its files change
+
+    A daemon thread checks the size and modification time of the training
+    data and knowledge base files every `interval` seconds and calls
+    SessionManager.reload() when either has changed. A file that fails to
+    load, e.g. because it is still being written, leaves the current data
+    in use and is tried again the next time it changes.
+    """
+
+    def __init__(self, sessions, interval=2.0):
+        """
+        Start watching
+
+        Args:
+            sessions: The SessionManager to reload
+            interval: Seconds between checks
+        """
+        self.sessions = sessions
+        self.interval = interval
+        self.reloads = 0
+        self._signature = self._file_signature()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mindmate-reload-watcher", daemon=True)
+        self._thread.start()
+
+    def _paths(self):
+        paths = [self.sessions.training_data_path]
+        if self.sessions.knowledge_base.path:
+            paths.append(self.sessions.knowledge_base.path)
+        return paths
+
+    def _file_signature(self):
+        """Size and modification time of every watched file"""
+        signature = []
+        for path in self._paths():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def check(self):
+        """
+        Reload if a watched file changed since the last check
+
+        Returns:
+            True if the training data was reloaded
+        """
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            index = self.sessions.reload()
+        except (OSError, ValueError) as e:
+            print(f"Error reloading training data, keeping the current data: {e}")
+            return False
+        self.reloads += 1
+        print(f"Reloaded training data: {len(index.training_data)} intents, {index.intent_matcher.pattern_count} patterns")
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
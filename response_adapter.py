@@ -0,0 +1,212 @@
+import random
+import re
+
+# Patterns are compiled once here instead of on every response
+COULD_YOU_PATTERN = re.compile(r'Could you (.*?)\?')
+WOULD_YOU_LIKE_PATTERN = re.compile(r'Would you like to (.*?)\?')
+# One alternation removes every word starting with an emotional term in a single pass
+EMOTIONAL_TERMS = ["feel", "emotion", "difficult", "challenging", "struggling"]
+EMOTIONAL_TERM_PATTERN = re.compile(r'\b(?:' + '|'.join(EMOTIONAL_TERMS) + r')\w*\b')
+SHARE_MORE_PATTERN = re.compile(r'Could you share more.*?(\?)')
+EXPLORE_PATTERN = re.compile(r'Would you like to explore.*?(\?)')
+OPEN_QUESTION_PATTERN = re.compile(r'What.*\?')
+
+FACTUAL_PREFIXES = [
+    "Research suggests that ",
+    "Studies have shown ",
+    "According to mental health experts, ",
+    "The data indicates that "
+]
+EMOTIONAL_VALIDATORS = [
+    "It's completely understandable to feel that way. ",
+    "Your feelings are valid. ",
+    "Many men experience similar emotions. "
+]
+ACTION_PHRASES = [
+    "Let's focus on what you can do right now. ",
+    "Taking action, even small steps, can help. ",
+    "Let's think about practical next steps. "
+]
+NORMALIZING_PHRASES = [
+    "Many men have similar experiences. ",
+    "This is actually quite common. ",
+    "You're not alone in this. "
+]
+SPECIFIC_QUESTIONS = {
+    "stress": "On a scale of 1-10, how would you rate your current stress level?",
+    "sleep": "How many hours do you typically sleep per night?",
+    "emotions": "When did you first notice these feelings?",
+    "work": "What specific aspect of work has been most challenging?",
+    "relationships": "How long has this relationship issue been occurring?"
+}
+
+
+def _prefix_once(response, phrases):
+    """Prepend a random phrase unless the response already contains one"""
+    if not any(phrase in response for phrase in phrases):
+        response = random.choice(phrases) + response
+    return response
+
+
+def factual_style(response, intent):
+    """Add factual, research-based framing"""
+    if not any(prefix in response for prefix in FACTUAL_PREFIXES):
+        response = random.choice(FACTUAL_PREFIXES) + response.lower()
+    return response
+
+
+def solution_focused_style(response, intent):
+    """Replace an open-ended question with a more direct suggestion"""
+    if "?" in response and not response.startswith("Would you like"):
+        response = OPEN_QUESTION_PATTERN.sub('Let\'s identify specific steps to address this.', response)
+    return response
+
+
+def emotional_style(response, intent):
+    """Make the response more validation-focused"""
+    return _prefix_once(response, EMOTIONAL_VALIDATORS)
+
+
+def action_oriented_style(response, intent):
+    """Make the response more activity and action-focused"""
+    return _prefix_once(response, ACTION_PHRASES)
+
+
+def direct_questions(response, intent):
+    """Make questions more direct for users who prefer directness"""
+    if "?" in response:
+        response = COULD_YOU_PATTERN.sub(r'What \1?', response)
+        response = WOULD_YOU_LIKE_PATTERN.sub(r'Let\'s \1.', response)
+    return response
+
+
+def practical_framing(response, intent):
+    """Reduce emotional language for users uncomfortable with it"""
+    response = EMOTIONAL_TERM_PATTERN.sub('', response)
+    if not response.startswith("Let's look at") and not response.startswith("Consider"):
+        response = "Let's look at this practically. " + response
+    return response
+
+
+def normalize_experience(response, intent):
+    """Normalize the experience for users resistant to help-seeking"""
+    return _prefix_once(response, NORMALIZING_PHRASES)
+
+
+def specific_questions(response, intent):
+    """Replace open invitations with a specific question for users who disclose little"""
+    if intent in SPECIFIC_QUESTIONS:
+        lowered = response.lower()
+        if "could you share" in lowered or "would you like to" in lowered:
+            response = SHARE_MORE_PATTERN.sub(SPECIFIC_QUESTIONS[intent], response)
+            response = EXPLORE_PATTERN.sub(SPECIFIC_QUESTIONS[intent], response)
+    return response
+
+
+# Stage applied first for each communication style; other styles pass responses through
+STYLE_STAGES = {
+    "factual": factual_style,
+    "solution_focused": solution_focused_style,
+    "emotional": emotional_style,
+    "action_oriented": action_oriented_style
+}
+
+# Preference stages in the order they apply, each with the test that enables it
+PREFERENCE_STAGES = (
+    (lambda preferences: preferences["directness"] > 0.7, direct_questions),
+    (lambda preferences: preferences["emotional_comfort"] < 0.3, practical_framing),
+    (lambda preferences: preferences["help_seeking"] < 0.3, normalize_experience),
+    (lambda preferences: preferences["self_disclosure"] < 0.3, specific_questions)
+)
+
+
+class ResponseAdapter:
+    """
+    Adapts responses to a user's communication style and preferences
+
+    Adaptation is a chain of transform stages. Which stages run depends only
+    on the style and on which side of each preference threshold the user is,
+    so the chain for each (style, preference bucket) key is built once and
+    reused by every session that shares the adapter.
+    """
+
+    def __init__(self, style_stages=None, preference_stages=None):
+        """
+        Initialize the adapter
+
+        Args:
+            style_stages: Optional mapping of communication style to its stage
+            preference_stages: Optional sequence of (test, stage) pairs applied after the style stage
+        """
+        self.style_stages = STYLE_STAGES if style_stages is None else style_stages
+        self.preference_stages = PREFERENCE_STAGES if preference_stages is None else preference_stages
+        self._chains = {}
+
+    def preference_bucket(self, preferences):
+        """
+        Get the bucket a user's preferences fall into
+
+        Args:
+            preferences: The user's preference scores
+
+        Returns:
+            Tuple with one boolean per preference stage
+        """
+        return tuple(bool(test(preferences)) for test, _ in self.preference_stages)
+
+    def chain(self, style, bucket):
+        """
+        Get the stages to apply for a style and preference bucket
+
+        Args:
+            style: The communication style
+            bucket: Preference bucket from preference_bucket()
+
+        Returns:
+            Tuple of stage functions, applied in order
+        """
+        key = (style, bucket)
+        stages = self._chains.get(key)
+        if stages is None:
+            style_stage = self.style_stages.get(style)
+            stages = ((style_stage,) if style_stage else ()) + tuple(
+                stage for enabled, (_, stage) in zip(bucket, self.preference_stages) if enabled
+            )
+            self._chains[key] = stages
+        return stages
+
+    def adapt(self, response, intent, style, preferences):
+        """
+        Adapt a response to the user's communication style and preferences
+
+        Args:
+            response: The base response text
+            intent: The current conversational intent/topic
+            style: The user's communication style
+            preferences: The user's preference scores
+
+        Returns:
+            Modified response text
+        """
+        for stage in self.chain(style, self.preference_bucket(preferences)):
+            response = stage(response, intent)
+        return response
+
+    def adapt_style(self, response, intent, style):
+        """
+        Adapt a response to the communication style only
+
+        Args:
+            response: The base response text
+            intent: The current conversational intent/topic
+            style: The user's communication style
+
+        Returns:
+            Modified response text
+        """
+        stage = self.style_stages.get(style)
+        return stage(response, intent) if stage else response
+
+
+# Adapter shared by every bot that doesn't select its own
+default_adapter = ResponseAdapter()
@@ -0,0 +1,185 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get() when a query isn't cached, since None can be a cached value
+MISS = object()
+
+
+class SearchCache:
+    """
+    Bounded cache of health information lookups
+
+    Entries expire after a time to live and the least recently used entries
+    are evicted when the cache exceeds its entry count or memory budget.
+    Failed lookups can be cached too, with their own usually shorter time to
+    live, so a failing search service isn't asked again on every message.
+    The cache can be saved to a JSON file and loaded again on startup.
+    """
+
+    def __init__(self, ttl=3600.0, negative_ttl=300.0, max_entries=1024, max_bytes=8 * 1024 * 1024, path=None):
+        """
+        Initialize the cache
+
+        Args:
+            ttl: Seconds a successful lookup stays valid; 0 disables caching
+            negative_ttl: Seconds a failed lookup stays valid; 0 doesn't cache failures
+            max_entries: Maximum number of cached queries
+            max_bytes: Memory budget, measured as the serialized size of the cached values
+            path: Optional JSON file the cache is loaded from and saved to at exit
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        # Query -> (expires_at, size, value), least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def normalize(query):
+        """Normalize a query so equivalent queries share an entry"""
+        return " ".join(query.lower().split())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query):
+        """
+        Look up a query
+
+        Args:
+            query: Normalized search query
+
+        Returns:
+            The cached value, or MISS if the query isn't cached or has expired
+        """
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None and entry[0] <= time.time():
+                self._remove(query)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISS
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return entry[2]
+
+    def contains(self, query):
+        """Check whether a query is cached and unexpired, without counting a hit or miss"""
+        with self._lock:
+            entry = self._entries.get(query)
+            return entry is not None and entry[0] > time.time()
+
+    def put(self, query, value, negative=False):
+        """
+        Cache the result of a lookup
+
+        Args:
+            query: Normalized search query
+            value: JSON-serializable result
+            negative: True if the lookup failed, so the negative TTL applies
+        """
+        ttl = self.negative_ttl if negative else self.ttl
+        if ttl <= 0:
+            return
+        self._store(query, time.time() + ttl, value)
+
+    def _store(self, query, expires_at, value):
+        size = len(query) + len(json.dumps(value, separators=(',', ':')))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if query in self._entries:
+                self._remove(query)
+            self._entries[query] = (expires_at, size, value)
+            self._bytes += size
+            self._evict()
+
+    def _remove(self, query):
+        """Drop one entry; caller holds self._lock"""
+        self._bytes -= self._entries.pop(query)[1]
+
+    def _evict(self):
+        """Evict least recently used entries until within budget; caller holds self._lock"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            query = next(iter(self._entries))
+            self._remove(query)
+            self.evictions += 1
+
+    def count_negative_hit(self):
+        """Record that a hit returned a cached failure"""
+        with self._lock:
+            self.negative_hits += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Get the cache statistics
+
+        Returns:
+            Dictionary of entry count, size, hit and miss counts, and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def load(self):
+        """Load unexpired entries from the cache file, if it exists"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                entries = json.load(file).get("entries", [])
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            return
+        now = time.time()
+        for query, expires_at, value in entries:
+            if expires_at > now:
+                self._store(query, expires_at, value)
+
+    def save(self):
+        """Write the unexpired entries to the cache file, oldest first"""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[query, expires_at, value] for query, (expires_at, _, value) in self._entries.items() if expires_at > now]
+        # Each process writes its own temporary file, so processes saving at exit never mix their writes
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({"entries": entries}, file, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Error saving search cache: {e}")
+
+
+# Cache shared by every bot that isn't given its own
+default_search_cache = SearchCache()
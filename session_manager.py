@@ -0,0 +1,295 @@
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from mindmate_chatbot import MindMateBot
+from state_journal import StateJournal
+from training_index import TrainingIndex, check_training_data
+from knowledge_base import KnowledgeBase
+
+# Session ids become file names, so only allow a safe character set
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionManager:
+    """
+    Keeps one MindMateBot per user session
+
+    All sessions share a single TrainingIndex and KnowledgeBase. Only the
+    most recently used sessions stay in memory; the rest are spilled to
+    per-session state files and rehydrated the next time they are used.
+    reload() swaps in new training data and knowledge without a restart.
+    """
+
+    def __init__(self, training_data_path, sessions_dir="sessions", max_sessions=1000, index=None, store_factory=None,
+                 state_writer=None, history_window=200, knowledge_base=None, intent_engine="patterns",
+                 metrics=None, search_cache=None, search_client=None, shared_state=False):
+        """
+        Initialize the session manager
+
+        Args:
+            training_data_path: Path to the JSON file containing training data
+            sessions_dir: Directory holding the state files of spilled sessions
+            max_sessions: Maximum number of sessions kept in memory
+            index: Optional shared TrainingIndex; loaded from training_data_path if not given
+            store_factory: Optional function mapping a session id to its StateStore;
+                sessions use state files in sessions_dir if not given
+            state_writer: Optional WriteBehindWriter shared by all sessions
+            history_window: Number of history entries each session keeps in memory
+            knowledge_base: Optional shared KnowledgeBase; defaults to the shared knowledge_base.json
+            intent_engine: Intent engine used by every session, "patterns" or "tfidf"
+            metrics: Optional BotMetrics every session reports to
+            search_cache: Optional SearchCache shared by all sessions; defaults to the process-wide cache
+            search_client: Optional search backend shared by all sessions; defaults to the process-wide client
+            shared_state: Whether other processes write the same sessions' state; if so each turn holds
+                the session's store lock, reloads the session if its stored state changed since this
+                process saw it, and writes its changes before releasing the lock
+        """
+        self.training_data_path = training_data_path
+        self.index = index or TrainingIndex.shared(training_data_path)
+        self.knowledge_base = knowledge_base or KnowledgeBase.shared()
+        self.sessions_dir = sessions_dir
+        self.max_sessions = max_sessions
+        self.store_factory = store_factory
+        self.state_writer = state_writer
+        self.history_window = history_window
+        self.intent_engine = intent_engine
+        self.search_cache = search_cache
+        self.search_client = search_client
+        self.shared_state = shared_state
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.track_sessions(self)
+        if store_factory is None:
+            os.makedirs(self.sessions_dir, exist_ok=True)
+
+        # Session id -> bot, ordered from least to most recently used
+        self._sessions = OrderedDict()
+        self._last_active = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    @staticmethod
+    def new_session_id():
+        """Generate a new random session id"""
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def is_valid_session_id(session_id):
+        """Check that a client-supplied session id is safe to use"""
+        return isinstance(session_id, str) and bool(SESSION_ID_PATTERN.match(session_id))
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def state_path(self, session_id):
+        """Path of the state file for a session"""
+        return os.path.join(self.sessions_dir, session_id + ".json")
+
+    def _create_bot(self, session_id):
+        """Create a bot for a session, rehydrating it from its store if it was spilled"""
+        if self.store_factory:
+            state_store = self.store_factory(session_id)
+        else:
+            state_store = StateJournal(self.state_path(session_id))
+        # A new bot writes an empty state if none is stored, which must not overwrite another process's first turn
+        with state_store.turn_lock() if self.shared_state else nullcontext():
+            return MindMateBot(self.training_data_path, state_file=self.state_path(session_id),
+                               index=self.index, state_store=state_store, state_writer=self.state_writer,
+                               history_window=self.history_window, knowledge_base=self.knowledge_base,
+                               intent_engine=self.intent_engine, metrics=self.metrics,
+                               search_cache=self.search_cache, search_client=self.search_client)
+
+    def _touch(self, session_id, bot):
+        """Mark a session as just used and spill others if over capacity; caller holds self._lock"""
+        self._sessions.move_to_end(session_id)
+        self._last_active[session_id] = time.time()
+        self._evict_over_capacity()
+        return bot
+
+    def get(self, session_id):
+        """
+        Get the bot for a session, creating or rehydrating it as needed
+
+        Args:
+            session_id: A valid session id
+
+        Returns:
+            The session's MindMateBot
+        """
+        if not self.is_valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+
+        with self._lock:
+            bot = self._sessions.get(session_id)
+            if bot is None and not self.shared_state:
+                bot = self._sessions[session_id] = self._create_bot(session_id)
+            if bot is not None:
+                return self._touch(session_id, bot)
+
+        # A shared session is created under its turn lock, which may wait for another
+        # process's turn, so other sessions aren't held up meanwhile
+        bot = self._create_bot(session_id)
+        with self._lock:
+            bot = self._sessions.setdefault(session_id, bot)
+            return self._touch(session_id, bot)
+
+    @contextmanager
+    def session(self, session_id):
+        """
+        Use a session's bot with exclusive access for the duration of a turn
+
+        Args:
+            session_id: A valid session id
+
+        Yields:
+            The session's MindMateBot, locked for this caller
+        """
+        while True:
+            bot = self.get(session_id)
+            with bot.lock:
+                # The bot may have been spilled between get() and taking its lock
+                if self._sessions.get(session_id) is bot:
+                    # Without session affinity another worker may answer this session at the same time
+                    with bot.state_store.turn_lock() if self.shared_state else nullcontext():
+                        if self.shared_state and bot.state_store.is_stale():
+                            bot.load_state()
+                        # Reloaded training data is picked up between turns, never during one
+                        with self._lock:
+                            index, knowledge_base = self.index, self.knowledge_base
+                        if bot.index is not index or bot.knowledge_base is not knowledge_base:
+                            bot.index = index
+                            bot.knowledge_base = knowledge_base
+                        outer_turn, bot.turn_thread = bot.turn_thread, threading.get_ident()
+                        try:
+                            yield bot
+                        finally:
+                            bot.turn_thread = outer_turn
+                        # Other workers must see this turn before they can start the next one
+                        if self.shared_state:
+                            bot.persist_state()
+                    return
+
+    def reload(self):
+        """
+        Load the training data and knowledge base again and switch every session to them
+
+        The new indexes are compiled while turns keep running on the current
+        ones, then swapped in. Each session picks them up at the start of its
+        next turn, so turns already running finish on the indexes they started
+        with. If a file can't be loaded the current indexes stay in use.
+
+        Returns:
+            The new TrainingIndex
+
+        Raises:
+            OSError: A file can't be read
+            ValueError: A file isn't valid JSON or the training data is incomplete
+        """
+        with self._reload_lock:
+            index = TrainingIndex.load(self.training_data_path)
+            check_training_data(index.training_data)
+            if self.intent_engine == "tfidf":
+                index.intent_classifier
+            knowledge_base = self.knowledge_base
+            if knowledge_base.path:
+                knowledge_base = KnowledgeBase.from_file(knowledge_base.path)
+
+            TrainingIndex.share(index)
+            KnowledgeBase.share(knowledge_base)
+            with self._lock:
+                self.index = index
+                self.knowledge_base = knowledge_base
+            return index
+
+    def _persist_outside_turn(self, bot):
+        """
+        Write a bot's state between turns; caller holds the bot's lock
+
+        With shared state the write holds the session's store lock like a turn
+        does, and a bot whose stored state another worker changed since it was
+        read isn't written at all: its delta, or a compaction, would overwrite
+        that worker's turns. The next turn reloads it instead.
+        """
+        if not self.shared_state:
+            bot.persist_state()
+            return
+        with bot.state_store.turn_lock():
+            if not bot.state_store.is_stale():
+                bot.persist_state()
+
+    def _spill(self, session_id):
+        """Write a session to disk and drop it from memory; caller holds both locks"""
+        self._persist_outside_turn(self._sessions[session_id])
+        del self._sessions[session_id]
+        self._last_active.pop(session_id, None)
+
+    @staticmethod
+    def _try_lock_idle(bot):
+        """
+        Lock a bot that no turn is using, without waiting
+
+        The bot lock is reentrant, so it can't tell a turn running in this
+        thread (e.g. one that starts another session) from an idle bot;
+        session() marks the thread running a turn on the bot instead.
+
+        Returns:
+            True if the bot was idle and is now locked by the caller
+        """
+        if bot.turn_thread == threading.get_ident():
+            return False
+        return bot.lock.acquire(blocking=False)
+
+    def _evict_over_capacity(self):
+        """Spill least recently used sessions until within capacity; caller holds self._lock"""
+        if len(self._sessions) <= self.max_sessions:
+            return
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            bot = self._sessions[session_id]
+            # Skip sessions that are in the middle of a turn
+            if self._try_lock_idle(bot):
+                try:
+                    self._spill(session_id)
+                finally:
+                    bot.lock.release()
+
+    def evict_idle(self, max_idle_seconds):
+        """
+        Spill sessions that have not been used recently
+
+        Args:
+            max_idle_seconds: Sessions idle for longer than this are spilled
+
+        Returns:
+            Number of sessions spilled
+        """
+        cutoff = time.time() - max_idle_seconds
+        spilled = 0
+        with self._lock:
+            for session_id in list(self._sessions):
+                if self._last_active.get(session_id, 0) > cutoff:
+                    continue
+                bot = self._sessions[session_id]
+                if self._try_lock_idle(bot):
+                    try:
+                        self._spill(session_id)
+                        spilled += 1
+                    finally:
+                        bot.lock.release()
+        return spilled
+
+    def save_all(self):
+        """Write every resident session to disk without evicting it, bypassing any write-behind delay"""
+        with self._lock:
+            bots = list(self._sessions.values())
+        for bot in bots:
+            with bot.lock:
+                self._persist_outside_turn(bot)
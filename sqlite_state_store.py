@@ -0,0 +1,268 @@
+import os
+import sqlite3
+import threading
+import time
+from state_store import StateStore, file_lock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    current_topic TEXT,
+    communication_style TEXT,
+    archived_turns INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_session ON history (session_id, position);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (session_id, timestamp);
+CREATE TABLE IF NOT EXISTS mood_tracking (
+    session_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    positive INTEGER NOT NULL DEFAULT 0,
+    negative INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, day)
+);
+CREATE TABLE IF NOT EXISTS topic_frequency (
+    session_id TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (session_id, topic)
+);
+CREATE TABLE IF NOT EXISTS risk_factors (
+    session_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (session_id, name)
+);
+CREATE TABLE IF NOT EXISTS user_preferences (
+    session_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (session_id, name)
+);
+"""
+
+# Columns of the sessions table that are replaced as a whole
+SESSION_FIELDS = ("archived_turns", "current_topic", "communication_style")
+
+# Name/value tables keyed by session, and the column holding the key
+KEY_VALUE_TABLES = {
+    "topic_frequency": ("topic", "count"),
+    "risk_factors": ("name", "value"),
+    "user_preferences": ("name", "value")
+}
+
+# Each thread keeps its own connection per database file
+_local = threading.local()
+
+
+def get_connection(db_path, timeout=30.0):
+    """
+    Get this thread's connection to a state database, creating the schema on first use
+
+    Args:
+        db_path: Path to the SQLite database file
+        timeout: Seconds to wait for a lock held by another connection
+
+    Returns:
+        A sqlite3.Connection in WAL mode
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(db_path)
+    if connection is None:
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        connection = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        # WAL lets readers and a writer in other processes work concurrently
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connections[db_path] = connection
+    return connection
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State store that keeps one session's state as rows in a shared SQLite database
+
+    History turns are appended as rows, so saving a turn never reads or rewrites
+    older history. Several processes can share the database file; turn_lock()
+    takes a per-session lock file in a directory next to it, so one session's
+    turns are serialized without holding a database-wide write lock.
+    """
+
+    def __init__(self, db_path, session_id):
+        """
+        Initialize the store for one session
+
+        Args:
+            db_path: Path to the SQLite database file
+            session_id: The session whose rows this store reads and writes
+        """
+        self.db_path = db_path
+        self.session_id = session_id
+        self._exists = None
+        # updated_at of the session row as last read or written by this store
+        self._updated_at = None
+
+    @classmethod
+    def factory(cls, db_path):
+        """Return a function that creates a store for a session id, for use by SessionManager"""
+        return lambda session_id: cls(db_path, session_id)
+
+    def _connection(self):
+        return get_connection(self.db_path)
+
+    def exists(self):
+        if not self._exists:
+            row = self._connection().execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (self.session_id,)
+            ).fetchone()
+            self._exists = row is not None
+        return self._exists
+
+    def load(self):
+        connection = self._connection()
+        session = connection.execute(
+            "SELECT archived_turns, current_topic, communication_style, updated_at FROM sessions WHERE session_id = ?",
+            (self.session_id,)
+        ).fetchone()
+        if session is None:
+            self._exists = False
+            return None
+        self._exists = True
+        self._updated_at = session[3]
+
+        # Archived turns stay in the database but aren't loaded into memory
+        archived_turns = session[0]
+        state = {
+            "archived_turns": archived_turns,
+            "history_start": archived_turns,
+            "current_topic": session[1],
+            "communication_style": session[2],
+            "history": [
+                {"role": role, "message": message, "timestamp": timestamp}
+                for role, message, timestamp in connection.execute(
+                    "SELECT role, message, timestamp FROM history WHERE session_id = ? AND position >= ? ORDER BY position",
+                    (self.session_id, archived_turns)
+                )
+            ],
+            "mood_tracking": {
+                day: {"positive": positive, "negative": negative, "neutral": neutral}
+                for day, positive, negative, neutral in connection.execute(
+                    "SELECT day, positive, negative, neutral FROM mood_tracking WHERE session_id = ?",
+                    (self.session_id,)
+                )
+            }
+        }
+        for table, (key_column, value_column) in KEY_VALUE_TABLES.items():
+            state[table] = dict(connection.execute(
+                f"SELECT {key_column}, {value_column} FROM {table} WHERE session_id = ?",
+                (self.session_id,)
+            ))
+        return state
+
+    def _write(self, connection, delta, history_position=None):
+        """
+        Write a delta's rows and return the new updated_at; caller holds a transaction
+
+        Args:
+            connection: This thread's connection
+            delta: Delta or complete state dictionary
+            history_position: Position of the first history entry; defaults to after the last stored turn
+        """
+        updated_at = time.time()
+        connection.execute(
+            "INSERT INTO sessions (session_id, current_topic, communication_style, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (self.session_id, delta.get("current_topic"), delta.get("communication_style", "conversational"), updated_at)
+        )
+        for field in SESSION_FIELDS:
+            if field in delta:
+                connection.execute(
+                    f"UPDATE sessions SET {field} = ? WHERE session_id = ?",
+                    (delta[field], self.session_id)
+                )
+
+        if delta.get("history"):
+            if history_position is None:
+                history_position = connection.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM history WHERE session_id = ?",
+                    (self.session_id,)
+                ).fetchone()[0]
+            connection.executemany(
+                "INSERT INTO history (session_id, position, role, message, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(self.session_id, history_position + offset, entry.get("role"), entry.get("message", ""), entry.get("timestamp"))
+                 for offset, entry in enumerate(delta["history"])]
+            )
+
+        if delta.get("mood_tracking"):
+            connection.executemany(
+                "INSERT OR REPLACE INTO mood_tracking (session_id, day, positive, negative, neutral) VALUES (?, ?, ?, ?, ?)",
+                [(self.session_id, day, counts.get("positive", 0), counts.get("negative", 0), counts.get("neutral", 0))
+                 for day, counts in delta["mood_tracking"].items()]
+            )
+
+        for table, (key_column, value_column) in KEY_VALUE_TABLES.items():
+            if delta.get(table):
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} (session_id, {key_column}, {value_column}) VALUES (?, ?, ?)",
+                    [(self.session_id, key, value) for key, value in delta[table].items()]
+                )
+        return updated_at
+
+    def append(self, delta):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            updated_at = self._write(connection, delta)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._exists = True
+        self._updated_at = updated_at
+
+    def needs_compaction(self):
+        # The first save writes the complete state so no field is left partial
+        return not self.exists()
+
+    def compact(self, state):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            history_start = state.get("history_start", 0)
+            # Archived turns before history_start are kept; everything else is replaced
+            connection.execute(
+                "DELETE FROM history WHERE session_id = ? AND position >= ?",
+                (self.session_id, history_start)
+            )
+            for table in ("sessions", "mood_tracking") + tuple(KEY_VALUE_TABLES):
+                connection.execute(f"DELETE FROM {table} WHERE session_id = ?", (self.session_id,))
+            updated_at = self._write(connection, state, history_position=history_start)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._exists = True
+        self._updated_at = updated_at
+
+    def is_stale(self):
+        row = self._connection().execute(
+            "SELECT updated_at FROM sessions WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        return (row[0] if row else None) != self._updated_at
+
+    def turn_lock(self):
+        lock_dir = self.db_path + ".locks"
+        os.makedirs(lock_dir, exist_ok=True)
+        return file_lock(os.path.join(lock_dir, self.session_id + ".lock"))
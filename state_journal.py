@@ -0,0 +1,196 @@
+import json
+import os
+from contextlib import contextmanager
+from state_store import StateStore, apply_state_delta, file_lock
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows; the journal is then only safe for one process
+    fcntl = None
+
+
+class StateJournal(StateStore):
+    """
+    Snapshot plus append-only journal for a bot's conversation state
+
+    Each save appends a small JSON line with only what changed in that turn.
+    After enough appends the journal is compacted: the full state is written
+    to the snapshot file with an atomic rename and the journal is emptied.
+    Every delta carries a sequence number, and the snapshot records the last
+    one it includes, so a crash during compaction never replays a delta twice.
+
+    Reads hold a shared lock on the journal file and writes an exclusive one,
+    so several processes can use the same state files. A process notices
+    through is_stale() when another one has written them since. turn_lock()
+    keeps the state to one process from reloading it until the turn's
+    changes are written.
+    """
+
+    def __init__(self, snapshot_path, journal_path=None, compact_every=100, fsync=False):
+        """
+        Initialize the journal
+
+        Args:
+            snapshot_path: Path to the snapshot file (the bot_state.json format)
+            journal_path: Path to the JSONL journal (defaults to snapshot_path + ".journal")
+            compact_every: Number of appended deltas that triggers a compaction
+            fsync: Whether to fsync after every append for durability across power loss
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or snapshot_path + ".journal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.seq = 0
+        self.pending_entries = 0
+        # Files as this journal last saw them; another process may create them later
+        self._version = self._stat_version()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """
+        Open the journal, holding a shared or exclusive lock on it until closed
+
+        Writers open it for appending and create it if needed. Readers open
+        it read-only and get None if there is no journal yet.
+        """
+        if exclusive:
+            file = open(self.journal_path, 'a+b')
+        else:
+            try:
+                file = open(self.journal_path, 'rb')
+            except FileNotFoundError:
+                yield None
+                return
+        with file:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield file
+
+    def _stat_version(self):
+        """Identify the current contents of both files by their size, modification time and inode"""
+        version = []
+        for path in (self.snapshot_path, self.journal_path):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                version.append(None)
+            else:
+                version.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(version)
+
+    def exists(self):
+        """Return True if a snapshot or journal exists on disk"""
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def load(self):
+        """
+        Load the snapshot and replay the journal on top of it
+
+        Returns:
+            The state dictionary, or None if neither file could be read
+        """
+        with self._locked(exclusive=False) as journal:
+            state = self._load(journal)
+            self._version = self._stat_version()
+        return state
+
+    def _load(self, journal):
+        """Read the snapshot and replay the locked journal file, if there is one"""
+        state = None
+        try:
+            with open(self.snapshot_path, 'r') as file:
+                state = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        snapshot_seq = state.pop("journal_seq", 0) if state else 0
+        self.seq = snapshot_seq
+        self.pending_entries = 0
+
+        content = journal.read() if journal is not None else b""
+
+        # A crash mid-append can leave a torn last line; it is skipped here and cut by the next append
+        if content and not content.endswith(b"\n"):
+            content = content[:content.rfind(b"\n") + 1]
+
+        for line in content.splitlines():
+            try:
+                delta = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            seq = delta.get("seq", 0)
+            if seq <= snapshot_seq:
+                continue
+            if state is None:
+                state = {}
+            apply_state_delta(state, delta)
+            self.seq = max(self.seq, seq)
+            self.pending_entries += 1
+
+        return state
+
+    def append(self, delta):
+        """
+        Append a delta to the journal
+
+        Args:
+            delta: Dictionary of new history entries and changed fields
+        """
+        self.seq += 1
+        delta = dict(delta, seq=self.seq)
+        with self._locked(exclusive=True) as file:
+            self._drop_torn_line(file)
+            file.write(json.dumps(delta, separators=(',', ':')).encode('utf-8') + b"\n")
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+            self._version = self._stat_version()
+        self.pending_entries += 1
+
+    @staticmethod
+    def _drop_torn_line(file):
+        """Cut a torn last line off the journal so the next line starts clean; caller holds the exclusive lock"""
+        size = file.seek(0, os.SEEK_END)
+        if not size:
+            return
+        file.seek(size - 1)
+        if file.read(1) == b"\n":
+            return
+        file.seek(0)
+        content = file.read()
+        file.truncate(content.rfind(b"\n") + 1)
+
+    def needs_compaction(self):
+        """Return True if the journal has grown enough to be folded into the snapshot"""
+        return self.pending_entries >= self.compact_every or not os.path.exists(self.snapshot_path)
+
+    def compact(self, state):
+        """
+        Write the full state as the new snapshot and empty the journal
+
+        Args:
+            state: The complete current state dictionary
+        """
+        snapshot = dict(state, journal_seq=self.seq)
+        # Each process writes its own temporary file, then renames it over the snapshot
+        temp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with self._locked(exclusive=True) as journal:
+            with open(temp_path, 'w') as file:
+                json.dump(snapshot, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.snapshot_path)
+
+            # Deltas up to journal_seq are now in the snapshot, so the journal can go
+            journal.truncate(0)
+            self._version = self._stat_version()
+        self.pending_entries = 0
+
+    def is_stale(self):
+        """Return True if the snapshot or journal changed since this journal last read or wrote them"""
+        return self._stat_version() != self._version
+
+    def turn_lock(self):
+        """Hold an exclusive lock on a lock file next to the snapshot, separate from the journal's own lock"""
+        return file_lock(self.snapshot_path + ".lock")
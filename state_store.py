@@ -0,0 +1,134 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows; shared state is then only safe for one process
+    fcntl = None
+
+# Top-level state fields that are dictionaries merged key by key when applying deltas
+DICT_FIELDS = ("mood_tracking", "topic_frequency", "risk_factors", "user_preferences")
+
+# Top-level state fields that are replaced as a whole
+SCALAR_FIELDS = ("archived_turns", "current_topic", "communication_style")
+
+
+def apply_state_delta(state, delta):
+    """
+    Apply one state delta to a state dictionary in place
+
+    Args:
+        state: State dictionary in the bot_state.json format
+        delta: Delta dictionary as built by MindMateBot._state_delta
+    """
+    if delta.get("history"):
+        state.setdefault("history", []).extend(delta["history"])
+    for field in SCALAR_FIELDS:
+        if field in delta:
+            state[field] = delta[field]
+    for field in DICT_FIELDS:
+        if field in delta:
+            state.setdefault(field, {}).update(delta[field])
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on a lock file, creating it if needed"""
+    with open(path, 'ab') as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+class StateStore(ABC):
+    """
+    Storage backend for one bot's conversation state
+
+    The bot hands the store a delta after every turn: new history entries
+    plus the fields or dict keys that changed. Backends that can't apply
+    deltas cheaply forever ask for a compaction, at which point they receive
+    the complete state. Subclasses must implement exists, load, append and
+    compact.
+    """
+
+    @abstractmethod
+    def exists(self):
+        """Return True if any state has been stored"""
+
+    @abstractmethod
+    def load(self):
+        """
+        Load the stored state
+
+        Returns:
+            State dictionary in the bot_state.json format, or None if nothing is stored
+        """
+
+    @abstractmethod
+    def append(self, delta):
+        """
+        Store the changes from one or more turns
+
+        Args:
+            delta: Dictionary of new history entries and changed fields
+        """
+
+    def needs_compaction(self):
+        """Return True if the store wants the complete state on the next save"""
+        return False
+
+    def is_stale(self):
+        """
+        Return True if another process wrote the state since this store last read or wrote it
+
+        Stores that only one process uses never go stale.
+        """
+        return False
+
+    @contextmanager
+    def turn_lock(self):
+        """
+        Hold exclusive use of this state across processes, e.g. for a whole turn
+
+        Stores that only one process uses need no lock.
+        """
+        yield
+
+    @abstractmethod
+    def compact(self, state):
+        """
+        Replace the stored state with the complete current state
+
+        Args:
+            state: State dictionary in the bot_state.json format
+        """
+
+
+class MemoryStateStore(StateStore):
+    """
+    State store that keeps everything in memory and never touches the disk
+    """
+
+    def __init__(self):
+        self.state = None
+
+    def exists(self):
+        return self.state is not None
+
+    def load(self):
+        # Hand out a copy so the caller can't mutate the stored state
+        return json.loads(json.dumps(self.state)) if self.state is not None else None
+
+    def append(self, delta):
+        if self.state is None:
+            self.state = {}
+        apply_state_delta(self.state, json.loads(json.dumps(delta)))
+
+    def needs_compaction(self):
+        return self.state is None
+
+    def compact(self, state):
+        self.state = json.loads(json.dumps(state))
@@ -0,0 +1,102 @@
+import asyncio
+import importlib
+import os
+import shutil
+import sys
+import threading
+
+import pytest
+
+from state_journal import StateJournal
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def start_server(tmp_path, monkeypatch):
+    modules = []
+
+    def start(**env):
+        for name in [name for name in os.environ if name.startswith("MINDMATE_")]:
+            monkeypatch.delenv(name)
+        monkeypatch.setenv("MINDMATE_SESSIONS_DIR", str(tmp_path / "sessions"))
+        monkeypatch.setenv("MINDMATE_SESSION_IDLE_SECONDS", "0")
+        monkeypatch.setenv("MINDMATE_SEARCH_BACKEND", "local")
+        monkeypatch.setenv("MINDMATE_SEARCH_INDEX", str(tmp_path / "health_index.bin"))
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        # The server reads the training data from the working directory
+        shutil.copy(os.path.join(REPO_DIR, "training_data.json"), tmp_path)
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.delitem(sys.modules, "mindmate_asgi", raising=False)
+        modules.append(importlib.import_module("mindmate_asgi"))
+        return modules[-1]
+
+    yield start
+    for module in modules:
+        module.io_executor.shutdown(wait=True)
+    sys.modules.pop("mindmate_asgi", None)
+
+
+@pytest.fixture
+def server(start_server):
+    return start_server()
+
+
+def stored_messages(server, session_id):
+    state = StateJournal(server.sessions.state_path(session_id)).load() or {}
+    return [entry["message"] for entry in state.get("history", [])]
+
+
+def test_turn_state_is_written_while_the_session_is_held(server):
+    writes = []
+    bot = server.sessions.get("asgi1")
+    persist_state = bot.persist_state
+
+    def recording_persist_state():
+        writes.append(bot.turn_thread == threading.get_ident())
+        persist_state()
+
+    bot.persist_state = recording_persist_state
+    asyncio.run(server.chat_turn("asgi1", "I feel stressed about work"))
+    assert writes == [True]
+    assert "I feel stressed about work" in stored_messages(server, "asgi1")
+
+
+def test_lookup_is_planned_while_the_session_is_held(server, monkeypatch):
+    checks = []
+
+    def recording_needs_lookup(bot, message, analysis):
+        checks.append(bot.turn_thread == threading.get_ident())
+        return False
+
+    monkeypatch.setattr(server, "needs_lookup", recording_needs_lookup)
+    asyncio.run(server.chat_turn("asgi2", "What are the symptoms of depression?"))
+    assert checks == [True]
+
+
+async def run_lifespan(app):
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await app({"type": "lifespan"}, receive, send)
+    return sent
+
+
+def test_shutdown_writes_queued_sessions(start_server):
+    server = start_server(MINDMATE_WRITE_BEHIND_DELAY="3600")
+
+    async def serve():
+        await server.chat_turn("asgi3", "I can't sleep at night")
+        # The write-behind delay hasn't passed, so the turn is only queued
+        assert "I can't sleep at night" not in stored_messages(server, "asgi3")
+        return await run_lifespan(server.app)
+
+    assert asyncio.run(serve()) == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert "I can't sleep at night" in stored_messages(server, "asgi3")
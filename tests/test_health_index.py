@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from health_index import HealthIndex
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    index = HealthIndex.ensure(str(tmp_path_factory.mktemp("index") / "health_index.bin"))
+    yield index
+    index.close()
+
+
+def test_specific_query_matches(index):
+    result = index.search("health anxiety")
+    assert result["status"] == "ok"
+    assert "anxiety" in result["data"]["AbstractText"].lower()
+
+
+@pytest.mark.parametrize("query", ["health pizza", "pizza", "health"])
+def test_unrelated_query_has_no_match(index, query):
+    assert index.search(query) == {"status": "unavailable", "reason": "no_match"}
+
+
+def test_term_in_most_documents_is_not_a_match(tmp_path):
+    documents = [("water", "Drink water daily."), ("sleep", "Sleep and water help."),
+                 ("walk", "Walk after water."), ("stress", "Breathing slowly eases stress.")]
+    index = HealthIndex(HealthIndex.build(documents, str(tmp_path / "index.bin")))
+    try:
+        assert index.search("water")["reason"] == "no_match"
+        assert index.search("water stress")["data"]["Heading"] == "stress"
+    finally:
+        index.close()
+
+
+def test_build_writes_through_a_per_process_temporary_file(tmp_path):
+    path = str(tmp_path / "index.bin")
+    # Another worker's build in progress
+    with open(f"{path}.12345.tmp", 'wb') as file:
+        file.write(b"partial")
+    HealthIndex.build([("sleep", "Sleep helps.")], path)
+    assert sorted(os.listdir(tmp_path)) == ["index.bin", "index.bin.12345.tmp"]
+    with open(f"{path}.12345.tmp", 'rb') as file:
+        assert file.read() == b"partial"
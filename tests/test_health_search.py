@@ -0,0 +1,63 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from health_search import HealthSearchClient
+
+
+class DripHandler(BaseHTTPRequestHandler):
+    """Answers at once, then sends the body one byte at a time"""
+
+    body = b'{"AbstractText": "' + b"x" * 40 + b'"}'
+    delay = 0.1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        try:
+            for i in range(len(self.body)):
+                self.wfile.write(self.body[i:i + 1])
+                self.wfile.flush()
+                time.sleep(self.delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def drip_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DripHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_slow_body_stops_at_deadline(drip_server):
+    # Each byte arrives well within the read timeout, but the whole body takes about 4 seconds
+    client = HealthSearchClient(drip_server, deadline=0.5, retries=0)
+    started = time.monotonic()
+    result = client.search("sleep")
+    elapsed = time.monotonic() - started
+    client.close()
+
+    assert result == {"status": "unavailable", "reason": "deadline"}
+    assert elapsed < 1.0
+
+
+def test_fast_body_is_returned(drip_server, monkeypatch):
+    monkeypatch.setattr(DripHandler, "delay", 0)
+    client = HealthSearchClient(drip_server, deadline=2.0, retries=0)
+    result = client.search("sleep")
+    client.close()
+
+    assert result["status"] == "ok"
+    assert result["data"]["AbstractText"] == "x" * 40
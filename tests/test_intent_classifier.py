@@ -0,0 +1,42 @@
+import json
+import os
+
+import pytest
+
+from intent_classifier import IntentClassifier
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    with open(os.path.join(REPO_DIR, "training_data.json"), 'r') as file:
+        return IntentClassifier(json.load(file))
+
+
+@pytest.mark.parametrize("message", [
+    "the weather is nice today",
+    "the",
+    "a",
+    "what time is it",
+    "my cat is orange",
+    "I went to the shop yesterday",
+])
+def test_neutral_message_falls_back_to_default(classifier, message):
+    assert classifier.classify(message) == "default"
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("i can't sleep at night", "sleep"),
+    ("feeling really down lately", "emotions"),
+    ("what's the point", "purpose"),
+    ("hello", "greetings"),
+])
+def test_paraphrase_is_recognized(classifier, message, intent):
+    assert classifier.classify(message) == intent
+
+
+def test_unknown_words_lower_the_score(classifier):
+    known = dict(classifier.top_k("i can't sleep", 3))
+    diluted = dict(classifier.top_k("i can't sleep zyxwv qwrtp", 3))
+    assert diluted["sleep"] < known["sleep"]
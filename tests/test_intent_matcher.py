@@ -0,0 +1,109 @@
+import json
+import os
+import random
+
+import pytest
+
+from intent_matcher import IntentMatcher, KeywordAutomaton
+from mindmate_chatbot import MindMateBot
+from state_store import MemoryStateStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA_PATH = os.path.join(REPO_DIR, "training_data.json")
+
+
+def linear_scan(training_data, message):
+    """The matching rule as a plain scan over every pattern: longest match, then training data order"""
+    message = message.lower()
+    best = None
+    for rank, (intent, data) in enumerate(training_data.items()):
+        if intent == "default":
+            continue
+        for pattern in data.get("patterns", []):
+            if not isinstance(pattern, str) or not pattern or pattern.lower() not in message:
+                continue
+            key = (-len(pattern), rank)
+            if best is None or key < best[0]:
+                best = (key, intent)
+    return best[1] if best else "default"
+
+
+def first_match_scan(training_data, message):
+    """The original find_intent: the first intent with any pattern in the message"""
+    message = message.lower()
+    for intent, data in training_data.items():
+        if intent == "default":
+            continue
+        for pattern in data.get("patterns", []):
+            if pattern.lower() in message:
+                return intent
+    return "default"
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    with open(TRAINING_DATA_PATH, 'r') as file:
+        return json.load(file)
+
+
+@pytest.fixture(scope="module")
+def bot():
+    return MindMateBot(TRAINING_DATA_PATH, state_store=MemoryStateStore(), online_search=False)
+
+
+def all_patterns(training_data):
+    return [pattern for intent, data in training_data.items() if intent != "default"
+            for pattern in data.get("patterns", []) if isinstance(pattern, str) and pattern]
+
+
+def test_every_pattern_matches_like_a_linear_scan(training_data, bot):
+    for pattern in all_patterns(training_data):
+        for message in (pattern, f"well, {pattern.upper()} I guess"):
+            assert bot.find_intent(message) == linear_scan(training_data, message), message
+
+
+def test_pattern_combinations_match_like_a_linear_scan(training_data, bot):
+    patterns = all_patterns(training_data)
+    rng = random.Random(3)
+    for _ in range(2000):
+        message = " ".join(rng.sample(patterns, rng.randint(2, 4)))
+        assert bot.find_intent(message) == linear_scan(training_data, message), message
+
+
+def test_single_matching_intent_agrees_with_first_match_scan(training_data, bot):
+    matcher = IntentMatcher(training_data)
+    for pattern in all_patterns(training_data):
+        if len(matcher.match_all(pattern)) == 1:
+            assert bot.find_intent(pattern) == first_match_scan(training_data, pattern)
+
+
+def test_overlapping_keywords_are_all_found():
+    automaton = KeywordAutomaton(["he", "she", "his", "hers", "", "he"])
+    assert len(automaton) == 4
+    found = {automaton.keywords[keyword_id] for keyword_id in automaton.find_all("ushers")}
+    assert found == {"he", "she", "hers"}
+
+
+def test_longest_match_wins():
+    matcher = IntentMatcher({
+        "sadness": {"patterns": ["sad"]},
+        "grief": {"patterns": ["so sad", "loss"]},
+        "default": {"patterns": []}
+    })
+    assert matcher.match_all("I feel so SAD") == {"sadness": "sad", "grief": "so sad"}
+    assert matcher.best_match("I feel so SAD") == "grief"
+    assert matcher.best_match("sad") == "sadness"
+    assert matcher.best_match("fine") is None
+
+
+def test_ties_go_to_training_data_order():
+    training_data = {
+        "work": {"patterns": ["tired"]},
+        "sleep": {"patterns": ["tired", "awake"]},
+        "stress": {"patterns": ["tense"]}
+    }
+    matcher = IntentMatcher(training_data)
+    assert matcher.best_match("tired and tense") == "work"
+    assert matcher.best_match("tense and awake") == "sleep"
+    for message in ("tired and tense", "tense and awake", "awake"):
+        assert matcher.best_match(message) == linear_scan(training_data, message)
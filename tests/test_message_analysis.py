@@ -0,0 +1,54 @@
+import json
+import os
+import random
+
+from message_analysis import HEALTH_QUESTION_PATTERNS, MessageAnalyzer, analyze_message, analyze_messages
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEALTH_QUESTIONS = [
+    "What are the symptoms of depression?",
+    "How can I manage stress at work",
+    "Is exercise effective for anxiety?",
+    "Any latest research on insomnia?",
+    "new treatments for PTSD",
+    "I want to kill myself",
+    "",
+    "what is",
+    "what are the signs of\\x00burnout",
+    "what are the signs\x00of burnout",
+]
+
+
+def messages():
+    with open(os.path.join(REPO_DIR, "training_data.json"), 'r') as file:
+        training_data = json.load(file)
+    texts = [pattern for data in training_data.values() for pattern in data.get("patterns", []) if isinstance(pattern, str)]
+    rng = random.Random(5)
+    texts += [" ".join(rng.sample(texts, 3)) for _ in range(300)]
+    texts += HEALTH_QUESTIONS
+    # Repeats and upper case variants
+    texts += [text.upper() for text in texts[:50]] + texts[:50]
+    rng.shuffle(texts)
+    return texts
+
+
+def test_batch_matches_each_message_in_order():
+    batch = messages()
+    assert analyze_messages(batch) == [analyze_message(message) for message in batch]
+
+
+def test_batch_with_separator_in_a_message_matches_each_message():
+    batch = ["what are the symptoms of\x00stress", "what are the symptoms of stress", "hello"]
+    assert analyze_messages(batch) == [analyze_message(message) for message in batch]
+    assert [analysis.asks_health_question for analysis in analyze_messages(batch)] == [True, True, False]
+
+
+def test_question_patterns_match_within_one_message_only():
+    analyzer = MessageAnalyzer(question_patterns=HEALTH_QUESTION_PATTERNS)
+    batch = ["tell me what are the symptoms", "of anxiety", "what are the symptoms of anxiety"]
+    assert [analysis.asks_health_question for analysis in analyzer.analyze_batch(batch)] == [False, False, True]
+
+
+def test_empty_batch():
+    assert analyze_messages([]) == []
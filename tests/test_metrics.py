@@ -0,0 +1,62 @@
+import importlib
+import os
+import re
+import shutil
+import sys
+
+import pytest
+
+from metrics import Metric
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(text, name):
+    match = re.search(r"^%s (\S+)$" % re.escape(name), text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    for name in [name for name in os.environ if name.startswith("MINDMATE_")]:
+        monkeypatch.delenv(name)
+    monkeypatch.setenv("MINDMATE_METRICS", "1")
+    monkeypatch.setenv("MINDMATE_SESSIONS_DIR", str(tmp_path / "sessions"))
+    monkeypatch.setenv("MINDMATE_SESSION_IDLE_SECONDS", "0")
+    monkeypatch.setenv("MINDMATE_SEARCH_BACKEND", "local")
+    monkeypatch.setenv("MINDMATE_SEARCH_INDEX", str(tmp_path / "health_index.bin"))
+    # The API reads the training data from the working directory and writes its page template there
+    shutil.copy(os.path.join(REPO_DIR, "training_data.json"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "mindmate_api", raising=False)
+    module = importlib.import_module("mindmate_api")
+    yield module
+    sys.modules.pop("mindmate_api", None)
+
+
+def test_metric_without_samples_cannot_be_created():
+    class Incomplete(Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "Has no samples")
+
+
+def test_each_turn_counts_response_generation_once(api):
+    client = api.app.test_client()
+    response = client.post("/api/chat", json={"message": "I feel stressed about work", "session_id": "metrics1"})
+    assert response.status_code == 200
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert sample(text, "mindmate_turn_seconds_count") == 1
+    assert sample(text, 'mindmate_stage_seconds_count{stage="response_generation"}') == 1
+
+    # A streamed turn is timed over its chunks and still counted once
+    stream = client.post("/api/chat/stream", json={"message": "I can't sleep at night", "session_id": "metrics1"})
+    assert "event: done" in stream.get_data(as_text=True)
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert sample(text, "mindmate_turn_seconds_count") == 2
+    assert sample(text, 'mindmate_stage_seconds_count{stage="response_generation"}') == 2
+    assert sample(text, 'mindmate_stage_seconds_count{stage="find_intent"}') == 2
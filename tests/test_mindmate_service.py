@@ -0,0 +1,47 @@
+import os
+from contextlib import contextmanager
+
+from mindmate_chatbot import MindMateBot
+from mindmate_service import stream_reply
+from search_cache import SearchCache
+from state_store import MemoryStateStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA = os.path.join(REPO_DIR, "training_data.json")
+
+
+class FakeSearchClient:
+    remote = True
+
+    def search(self, query):
+        return {"status": "ok", "data": {"AbstractText": "Depression is a common condition."}}
+
+
+def counting_session(bot, entries):
+    @contextmanager
+    def session():
+        entries.append(1)
+        with bot.lock:
+            yield bot
+    return session
+
+
+def make_bot(online_search):
+    return MindMateBot(TRAINING_DATA, state_store=MemoryStateStore(), online_search=online_search,
+                       search_cache=SearchCache(), search_client=FakeSearchClient())
+
+
+def test_reply_without_a_lookup_holds_the_session_once():
+    bot = make_bot(online_search=False)
+    entries = []
+    chunks = list(stream_reply(counting_session(bot, entries), "I feel stressed about work"))
+    assert entries == [1]
+    assert chunks and all(kind != "status" for kind, _ in chunks)
+
+
+def test_lookup_runs_between_two_holds_of_the_session():
+    bot = make_bot(online_search=True)
+    entries = []
+    chunks = list(stream_reply(counting_session(bot, entries), "What are the symptoms of depression?"))
+    assert entries == [1, 1]
+    assert chunks[0][0] == "status"
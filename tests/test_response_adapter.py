@@ -0,0 +1,138 @@
+import itertools
+import json
+import os
+import random
+import re
+
+import pytest
+
+from mindmate_chatbot import MindMateBot
+from response_adapter import ResponseAdapter
+from state_store import MemoryStateStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA = os.path.join(REPO_DIR, "training_data.json")
+
+STYLES = ["conversational", "factual", "solution_focused", "emotional", "action_oriented"]
+
+# Values just on each side of every preference threshold
+PREFERENCE_VALUES = {
+    "directness": (0.7, 0.71),
+    "emotional_comfort": (0.29, 0.3),
+    "help_seeking": (0.29, 0.3),
+    "self_disclosure": (0.29, 0.3)
+}
+
+EXTRA_RESPONSES = [
+    "Could you share more about what's been happening? I'm here to listen.",
+    "Would you like to explore some ways to handle it? What feels hardest right now?",
+    "Could you tell me when this started? Would you like to try a breathing exercise?",
+    "That sounds difficult and challenging. How are you feeling about your emotions?",
+    "Many men have similar experiences. What would help most?",
+    "Research suggests that sleep matters. Consider a regular bedtime."
+]
+
+
+def baseline_adapt_to_style(response, intent, style):
+    """_adapt_response_to_style as it was before the adapter was compiled"""
+    if style == "factual":
+        factual_prefixes = ["Research suggests that ", "Studies have shown ",
+                            "According to mental health experts, ", "The data indicates that "]
+        if not any(prefix in response for prefix in factual_prefixes):
+            response = random.choice(factual_prefixes) + response.lower()
+    elif style == "solution_focused":
+        if "?" in response and not response.startswith("Would you like"):
+            response = re.sub(r'What.*\?', 'Let\'s identify specific steps to address this.', response)
+    elif style == "emotional":
+        emotional_validators = ["It's completely understandable to feel that way. ", "Your feelings are valid. ",
+                                "Many men experience similar emotions. "]
+        if not any(validator in response for validator in emotional_validators):
+            response = random.choice(emotional_validators) + response
+    elif style == "action_oriented":
+        action_phrases = ["Let's focus on what you can do right now. ", "Taking action, even small steps, can help. ",
+                          "Let's think about practical next steps. "]
+        if not any(phrase in response for phrase in action_phrases):
+            response = random.choice(action_phrases) + response
+    return response
+
+
+def baseline_adapt_to_user(response, intent, style, preferences):
+    """_adapt_response_to_user as it was before the adapter was compiled"""
+    response = baseline_adapt_to_style(response, intent, style)
+    if preferences["directness"] > 0.7 and "?" in response:
+        response = re.sub(r'Could you (.*?)\?', r'What \1?', response)
+        response = re.sub(r'Would you like to (.*?)\?', r'Let\'s \1.', response)
+    if preferences["emotional_comfort"] < 0.3:
+        for term in ["feel", "emotion", "difficult", "challenging", "struggling"]:
+            response = re.sub(r'\b' + term + r'\w*\b', '', response)
+        if not response.startswith("Let's look at") and not response.startswith("Consider"):
+            response = "Let's look at this practically. " + response
+    if preferences["help_seeking"] < 0.3:
+        normalizing_phrases = ["Many men have similar experiences. ", "This is actually quite common. ",
+                               "You're not alone in this. "]
+        if not any(phrase in response for phrase in normalizing_phrases):
+            response = random.choice(normalizing_phrases) + response
+    if preferences["self_disclosure"] < 0.3:
+        if "could you share" in response.lower() or "would you like to" in response.lower():
+            specific_questions = {
+                "stress": "On a scale of 1-10, how would you rate your current stress level?",
+                "sleep": "How many hours do you typically sleep per night?",
+                "emotions": "When did you first notice these feelings?",
+                "work": "What specific aspect of work has been most challenging?",
+                "relationships": "How long has this relationship issue been occurring?"
+            }
+            if intent in specific_questions:
+                response = re.sub(r'Could you share more.*?(\?)', specific_questions[intent], response)
+                response = re.sub(r'Would you like to explore.*?(\?)', specific_questions[intent], response)
+    return response
+
+
+@pytest.fixture(scope="module")
+def cases():
+    with open(TRAINING_DATA, 'r') as file:
+        training_data = json.load(file)
+    cases = []
+    for intent, data in training_data.items():
+        texts = data.get("responses", []) + data.get("follow_ups", [])
+        cases.extend((text, intent) for text in texts if isinstance(text, str))
+    intents = ["stress", "sleep", "emotions", "work", "relationships", "default"]
+    cases.extend((text, intent) for text in EXTRA_RESPONSES for intent in intents)
+    return cases
+
+
+def all_preferences():
+    names = list(PREFERENCE_VALUES)
+    for values in itertools.product(*PREFERENCE_VALUES.values()):
+        yield dict(zip(names, values))
+
+
+def test_compiled_chains_match_the_baseline(cases):
+    adapter = ResponseAdapter()
+    for style, preferences in itertools.product(STYLES, all_preferences()):
+        for seed, (response, intent) in enumerate(cases):
+            random.seed(seed)
+            expected = baseline_adapt_to_user(response, intent, style, preferences)
+            random.seed(seed)
+            assert adapter.adapt(response, intent, style, preferences) == expected, (style, preferences, response)
+
+
+def test_style_adaptation_matches_the_baseline(cases):
+    adapter = ResponseAdapter()
+    for style in STYLES:
+        for seed, (response, intent) in enumerate(cases):
+            random.seed(seed)
+            expected = baseline_adapt_to_style(response, intent, style)
+            random.seed(seed)
+            assert adapter.adapt_style(response, intent, style) == expected
+
+
+def test_bot_adapts_like_the_baseline(cases):
+    bot = MindMateBot(TRAINING_DATA, state_store=MemoryStateStore(), online_search=False)
+    for style, preferences in itertools.product(STYLES, all_preferences()):
+        bot.communication_style = style
+        bot.user_preferences = dict(preferences)
+        for seed, (response, intent) in enumerate(cases[:40]):
+            random.seed(seed)
+            expected = baseline_adapt_to_user(response, intent, style, preferences)
+            random.seed(seed)
+            assert bot._adapt_response_to_user(response, intent) == expected
@@ -0,0 +1,132 @@
+import json
+import os
+
+import pytest
+
+import search_cache
+from mindmate_chatbot import MindMateBot
+from search_cache import MISS, SearchCache
+from state_store import MemoryStateStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA = os.path.join(REPO_DIR, "training_data.json")
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search_cache.time, "time", clock)
+    return clock
+
+
+class FakeSearchClient:
+    remote = True
+
+    def __init__(self, result):
+        self.result = result
+        self.queries = []
+
+    def search(self, query):
+        self.queries.append(query)
+        return dict(self.result)
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = SearchCache(ttl=60, negative_ttl=10)
+    cache.put("sleep", {"AbstractText": "rest"})
+    cache.put("stress", None, negative=True)
+
+    clock.now += 9
+    assert cache.get("sleep") == {"AbstractText": "rest"}
+    assert cache.get("stress") is None
+    clock.now += 1
+    assert cache.get("stress") is MISS
+    assert cache.contains("sleep")
+    clock.now += 50
+    assert not cache.contains("sleep")
+    assert cache.get("sleep") is MISS
+    assert cache.stats()["expirations"] == 2
+    assert len(cache) == 0
+
+
+def test_zero_ttl_disables_caching(clock):
+    cache = SearchCache(ttl=0, negative_ttl=0)
+    cache.put("sleep", {"AbstractText": "rest"})
+    cache.put("stress", None, negative=True)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SearchCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is MISS
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_oldest_entries(clock):
+    value = "x" * 40
+    size = len("q0") + len(json.dumps(value))
+    cache = SearchCache(max_bytes=size * 3)
+    for number in range(5):
+        cache.put(f"q{number}", value)
+    assert [query for query in ("q0", "q1", "q2", "q3", "q4") if cache.contains(query)] == ["q2", "q3", "q4"]
+    assert cache.stats()["bytes"] == size * 3
+
+    # A value larger than the whole budget is never cached
+    cache.put("huge", "x" * (size * 3))
+    assert not cache.contains("huge")
+    assert len(cache) == 3
+
+
+def test_saved_entries_load_until_they_expire(tmp_path, clock):
+    path = str(tmp_path / "cache.json")
+    cache = SearchCache(ttl=60)
+    cache.path = path
+    cache.put("sleep", {"AbstractText": "rest"})
+    cache.save()
+
+    clock.now += 30
+    loaded = SearchCache(ttl=60)
+    loaded.path = path
+    loaded.load()
+    assert loaded.get("sleep") == {"AbstractText": "rest"}
+
+    clock.now += 30
+    expired = SearchCache(ttl=60)
+    expired.path = path
+    expired.load()
+    assert len(expired) == 0
+
+
+@pytest.mark.parametrize("reason", ["deadline", "circuit_open"])
+def test_interrupted_lookups_are_not_cached(reason):
+    client = FakeSearchClient({"status": "unavailable", "reason": reason})
+    bot = MindMateBot(TRAINING_DATA, state_store=MemoryStateStore(), search_cache=SearchCache(),
+                      search_client=client)
+    bot.search_health_info("symptoms of insomnia")
+    bot.search_health_info("symptoms of insomnia")
+    assert len(client.queries) == 2
+    assert len(bot.search_cache) == 0
+
+
+def test_failed_lookups_are_cached():
+    client = FakeSearchClient({"status": "unavailable", "reason": "status", "code": 503})
+    bot = MindMateBot(TRAINING_DATA, state_store=MemoryStateStore(), search_cache=SearchCache(),
+                      search_client=client)
+    bot.search_health_info("symptoms of insomnia")
+    bot.search_health_info("symptoms of insomnia")
+    assert len(client.queries) == 1
+    assert bot.search_cache.stats()["negative_hits"] == 1
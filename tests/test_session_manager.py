@@ -0,0 +1,47 @@
+import os
+import time
+
+from idle_evictor import IdleEvictor
+from session_manager import SessionManager
+from state_store import MemoryStateStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA = os.path.join(REPO_DIR, "training_data.json")
+
+
+def make_sessions(max_sessions):
+    return SessionManager(TRAINING_DATA, max_sessions=max_sessions, store_factory=lambda session_id: MemoryStateStore())
+
+
+def test_session_in_a_turn_of_this_thread_is_not_spilled():
+    sessions = make_sessions(1)
+    with sessions.session("first") as bot:
+        # Over capacity while "first" is mid-turn in this very thread
+        sessions.get("second")
+        assert "first" in sessions
+        bot.process_input("hello")
+    sessions.get("third")
+    assert "first" not in sessions
+
+
+def test_idle_sessions_are_spilled():
+    sessions = make_sessions(10)
+    sessions.get("first")
+    with sessions.session("second"):
+        assert sessions.evict_idle(0) == 1
+        assert "second" in sessions
+    assert "first" not in sessions
+
+
+def test_idle_evictor_spills_in_the_background():
+    sessions = make_sessions(10)
+    sessions.get("first")
+    evictor = IdleEvictor(sessions, max_idle_seconds=0, interval=0.01)
+    try:
+        deadline = time.time() + 5
+        while "first" in sessions and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        evictor.stop()
+    assert "first" not in sessions
+    assert evictor.spilled == 1
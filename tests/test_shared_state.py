@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+
+import pytest
+
+from session_manager import SessionManager
+from sqlite_state_store import SQLiteStateStore
+from state_journal import StateJournal
+from state_store import fcntl
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA = os.path.join(REPO_DIR, "training_data.json")
+SESSION_ID = "shared"
+TURNS = 100
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="needs advisory file locks")
+
+
+def run_turns(worker, sessions_dir, db_path, start):
+    store_factory = SQLiteStateStore.factory(db_path) if db_path else None
+    sessions = SessionManager(TRAINING_DATA, sessions_dir=sessions_dir, store_factory=store_factory,
+                              history_window=4 * TURNS, shared_state=True)
+    start.wait()
+    for turn in range(TURNS):
+        with sessions.session(SESSION_ID) as bot:
+            bot.process_input(f"hello from worker {worker} turn {turn}")
+
+
+@pytest.mark.parametrize("backend", ["journal", "sqlite"])
+def test_two_workers_lose_no_turns(tmp_path, backend):
+    sessions_dir = str(tmp_path / "sessions")
+    db_path = str(tmp_path / "state.db") if backend == "sqlite" else None
+    # Fork so both workers start from the already compiled training data, as preforked workers do
+    context = multiprocessing.get_context("fork")
+    start = context.Barrier(2)
+    workers = [context.Process(target=run_turns, args=(worker, sessions_dir, db_path, start)) for worker in range(2)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    if db_path:
+        state = SQLiteStateStore(db_path, SESSION_ID).load()
+    else:
+        state = StateJournal(os.path.join(sessions_dir, SESSION_ID + ".json")).load()
+    messages = [entry["message"] for entry in state["history"] if entry["role"] == "user"]
+    expected = {f"hello from worker {worker} turn {turn}" for worker in range(2) for turn in range(TURNS)}
+    assert sorted(messages) == sorted(expected)
+    assert len(state["history"]) == 4 * TURNS
+
+
+class QueueingWriter:
+    """State writer that leaves every write to the end of the session"""
+
+    def mark_dirty(self, bot):
+        pass
+
+
+def test_stored_archive_count_matches_after_every_turn(tmp_path):
+    sessions = SessionManager(TRAINING_DATA, sessions_dir=str(tmp_path / "sessions"), history_window=4,
+                              state_writer=QueueingWriter(), shared_state=True)
+    # Enough turns to move a whole archive segment out of memory
+    for turn in range(60):
+        with sessions.session(SESSION_ID) as bot:
+            bot.process_input(f"hello turn {turn}")
+        state = StateJournal(sessions.state_path(SESSION_ID)).load()
+        assert state.get("archived_turns", 0) == bot.conversation_history.start
+    assert bot.conversation_history.start > 0
+
+
+@pytest.mark.parametrize("write", ["save_all", "evict_idle"])
+def test_stale_session_is_not_written_outside_a_turn(tmp_path, write):
+    sessions_dir = str(tmp_path / "sessions")
+    first, second = (SessionManager(TRAINING_DATA, sessions_dir=sessions_dir, shared_state=True) for _ in range(2))
+    with first.session(SESSION_ID) as bot:
+        bot.process_input("hello from the first worker")
+    # A change this worker hasn't written yet
+    with bot.lock:
+        bot.current_topic = "stale"
+    with second.session(SESSION_ID) as other:
+        other.process_input("hello from the second worker")
+
+    if write == "save_all":
+        first.save_all()
+    else:
+        assert first.evict_idle(0) == 1
+
+    state = StateJournal(first.state_path(SESSION_ID)).load()
+    messages = [entry["message"] for entry in state["history"] if entry["role"] == "user"]
+    assert messages == ["hello from the first worker", "hello from the second worker"]
+    assert state["current_topic"] == other.current_topic
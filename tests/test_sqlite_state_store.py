@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from mindmate_chatbot import MindMateBot
+from sqlite_state_store import SQLiteStateStore, get_connection
+from state_store import StateStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA = os.path.join(REPO_DIR, "training_data.json")
+
+
+def entry(number):
+    return {"role": "user", "message": f"message {number}", "timestamp": f"2026-01-01 10:00:{number:02d}"}
+
+
+def positions(db_path, session_id):
+    return [row[0] for row in get_connection(db_path).execute(
+        "SELECT position FROM history WHERE session_id = ? ORDER BY id", (session_id,))]
+
+
+def test_incomplete_store_fails_when_constructed():
+    class NoCompaction(StateStore):
+        def exists(self):
+            return False
+
+        def load(self):
+            return None
+
+        def append(self, delta):
+            pass
+
+    with pytest.raises(TypeError):
+        NoCompaction()
+
+
+def test_state_round_trips(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(db_path, "abc")
+    assert not store.exists()
+    assert store.load() is None
+    store.compact({
+        "history": [entry(1)],
+        "current_topic": "stress",
+        "communication_style": "direct",
+        "mood_tracking": {"2026-01-01": {"positive": 1, "negative": 0, "neutral": 2}},
+        "topic_frequency": {"stress": 1},
+        "risk_factors": {"isolation": 1},
+        "user_preferences": {"detail_level": 0.7}
+    })
+    store.append({"history": [entry(2)], "topic_frequency": {"sleep": 1}, "current_topic": "sleep"})
+
+    state = SQLiteStateStore(db_path, "abc").load()
+    assert state["history"] == [entry(1), entry(2)]
+    assert state["current_topic"] == "sleep"
+    assert state["communication_style"] == "direct"
+    assert state["mood_tracking"] == {"2026-01-01": {"positive": 1, "negative": 0, "neutral": 2}}
+    assert state["topic_frequency"] == {"stress": 1, "sleep": 1}
+    assert state["risk_factors"] == {"isolation": 1}
+    assert state["user_preferences"] == {"detail_level": 0.7}
+    assert SQLiteStateStore(db_path, "other").load() is None
+
+
+def test_bot_state_round_trips(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    bot = MindMateBot(TRAINING_DATA, state_file=str(tmp_path / "abc.json"),
+                      state_store=SQLiteStateStore(db_path, "abc"), online_search=False)
+    for message in ("hello", "I feel stressed about work", "I can't sleep"):
+        bot.process_input(message)
+
+    reloaded = MindMateBot(TRAINING_DATA, state_file=str(tmp_path / "abc.json"),
+                           state_store=SQLiteStateStore(db_path, "abc"), online_search=False)
+    assert [turn.to_dict() for turn in reloaded.conversation_history] == \
+        [turn.to_dict() for turn in bot.conversation_history]
+    assert reloaded.topic_frequency == bot.topic_frequency
+
+
+def test_is_stale_across_stores(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    first, second = SQLiteStateStore(db_path, "abc"), SQLiteStateStore(db_path, "abc")
+    assert not first.is_stale()
+    second.compact({"history": [entry(1)]})
+    assert first.is_stale()
+    assert not second.is_stale()
+
+    first.load()
+    assert not first.is_stale()
+    first.append({"history": [entry(2)]})
+    assert second.is_stale()
+    assert not first.is_stale()
+
+
+def test_history_positions_stay_monotonic(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(db_path, "abc")
+    store.compact({"history": [entry(0), entry(1)]})
+    store.append({"history": [entry(2)]})
+    store.append({"history": [entry(3), entry(4)]})
+    assert positions(db_path, "abc") == [0, 1, 2, 3, 4]
+
+    # Two turns are archived; the rest of the history is rewritten after them
+    store.compact({"archived_turns": 2, "history_start": 2, "history": [entry(2), entry(3), entry(4)]})
+    store.append({"history": [entry(5)]})
+    assert sorted(positions(db_path, "abc")) == [0, 1, 2, 3, 4, 5]
+
+    state = SQLiteStateStore(db_path, "abc").load()
+    assert state["archived_turns"] == 2
+    assert [item["message"] for item in state["history"]] == ["message 2", "message 3", "message 4", "message 5"]
@@ -0,0 +1,116 @@
+import os
+import shutil
+
+from state_journal import StateJournal
+
+
+def turn(number):
+    return {"history": [{"role": "user", "message": f"message {number}", "timestamp": None}],
+            "topic_frequency": {"stress": number}}
+
+
+def messages(state):
+    return [entry["message"] for entry in state["history"]]
+
+
+def test_load_replays_the_journal_on_top_of_the_snapshot(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    journal.compact({"history": [{"role": "bot", "message": "welcome"}], "current_topic": None})
+    journal.append(turn(1))
+    journal.append(dict(turn(2), current_topic="stress"))
+
+    state = StateJournal(path).load()
+    assert messages(state) == ["welcome", "message 1", "message 2"]
+    assert state["topic_frequency"] == {"stress": 2}
+    assert state["current_topic"] == "stress"
+    assert "journal_seq" not in state
+
+
+def test_torn_last_line_is_ignored_and_cut_by_the_next_append(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    journal.append(turn(1))
+    with open(journal.journal_path, 'ab') as file:
+        file.write(b'{"history":[{"role":"user","mess')
+
+    reopened = StateJournal(path)
+    assert messages(reopened.load()) == ["message 1"]
+    reopened.append(turn(2))
+
+    assert messages(StateJournal(path).load()) == ["message 1", "message 2"]
+    with open(journal.journal_path, 'rb') as file:
+        assert file.read().count(b"\n") == 2
+
+
+def test_compaction_keeps_sequence_numbers_advancing(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    state = {"history": []}
+    for number in (1, 2, 3):
+        journal.append(turn(number))
+        state["history"].extend(turn(number)["history"])
+    journal.compact(state)
+    journal.append(turn(4))
+    assert journal.seq == 4
+
+    reopened = StateJournal(path)
+    assert messages(reopened.load()) == ["message 1", "message 2", "message 3", "message 4"]
+    assert reopened.seq == 4
+    reopened.append(turn(5))
+    assert messages(StateJournal(path).load())[-2:] == ["message 4", "message 5"]
+
+
+def test_crash_during_compaction_does_not_replay_deltas_twice(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    state = {"history": []}
+    for number in (1, 2):
+        journal.append(turn(number))
+        state["history"].extend(turn(number)["history"])
+    saved_journal = str(tmp_path / "saved.journal")
+    shutil.copy(journal.journal_path, saved_journal)
+    journal.compact(state)
+    # The snapshot was replaced but the journal wasn't emptied yet
+    shutil.copy(saved_journal, journal.journal_path)
+
+    assert messages(StateJournal(path).load()) == ["message 1", "message 2"]
+
+
+def test_needs_compaction_without_a_snapshot(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path, compact_every=3)
+    assert journal.needs_compaction()
+    journal.append(turn(1))
+    assert journal.needs_compaction()
+
+    journal.compact({"history": []})
+    assert not journal.needs_compaction()
+    journal.append(turn(2))
+    journal.append(turn(3))
+    assert not journal.needs_compaction()
+    journal.append(turn(4))
+    assert journal.needs_compaction()
+
+    os.remove(path)
+    assert journal.needs_compaction()
+
+
+def test_load_does_not_create_files(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    assert journal.load() is None
+    assert not journal.exists()
+    assert os.listdir(tmp_path) == []
+
+
+def test_is_stale_after_another_journal_writes(tmp_path):
+    path = str(tmp_path / "state.json")
+    first, second = StateJournal(path), StateJournal(path)
+    first.load()
+    second.load()
+    second.append(turn(1))
+    assert first.is_stale()
+    assert not second.is_stale()
+    first.load()
+    assert not first.is_stale()
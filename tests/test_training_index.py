@@ -0,0 +1,55 @@
+import os
+import shutil
+import stat
+
+import pytest
+
+import training_index
+from training_index import TrainingIndex, snapshot_path
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "getuid"), reason="needs file owners")
+
+
+@pytest.fixture
+def training_data(tmp_path):
+    path = str(tmp_path / "training_data.json")
+    shutil.copy(os.path.join(REPO_DIR, "training_data.json"), path)
+    return path
+
+
+@pytest.fixture
+def unpickled(monkeypatch):
+    loads = []
+    load = training_index.pickle.load
+
+    def recording_load(file):
+        loads.append(file.name)
+        return load(file)
+
+    monkeypatch.setattr(training_index.pickle, "load", recording_load)
+    return loads
+
+
+def test_snapshot_is_private_and_reused(training_data, unpickled):
+    TrainingIndex.load(training_data)
+    mode = os.stat(snapshot_path(training_data)).st_mode
+    assert not mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+    index = TrainingIndex.load(training_data)
+    assert unpickled == [snapshot_path(training_data)]
+    assert "default" in index.training_data
+
+
+@pytest.mark.parametrize("write_bit", [stat.S_IWGRP, stat.S_IWOTH])
+def test_snapshot_others_can_write_is_not_unpickled(training_data, unpickled, write_bit):
+    TrainingIndex.load(training_data)
+    path = snapshot_path(training_data)
+    os.chmod(path, os.stat(path).st_mode | write_bit)
+
+    index = TrainingIndex.load(training_data)
+    assert unpickled == []
+    assert "default" in index.training_data
+    # The snapshot is written again, privately
+    assert not os.stat(path).st_mode & (stat.S_IWGRP | stat.S_IWOTH)
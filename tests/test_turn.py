@@ -0,0 +1,76 @@
+import os
+import time
+
+import pytest
+
+from mindmate_chatbot import MindMateBot
+from state_store import MemoryStateStore
+from turn import Role, Turn
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_DATA = os.path.join(REPO_DIR, "training_data.json")
+
+
+@pytest.fixture(params=["UTC0", "Europe/Berlin", "America/New_York", "Australia/Lord_Howe"])
+def local_time_zone(request):
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = request.param
+    time.tzset()
+    yield request.param
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def hourly_timestamps(year=2026):
+    start = int(time.mktime((year, 1, 1, 0, 30, 15, 0, 0, -1)))
+    return range(start, start + 366 * 24 * 3600, 3600)
+
+
+def test_stored_entries_round_trip(local_time_zone):
+    for timestamp in hourly_timestamps():
+        entry = {"role": "user", "message": "hi", "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))}
+        assert Turn.from_dict(entry).to_dict() == entry
+
+
+def test_turns_round_trip_outside_the_repeated_hour(local_time_zone):
+    for timestamp in hourly_timestamps():
+        turn = Turn(Role.BOT, "hello", timestamp)
+        restored = Turn.from_dict(turn.to_dict())
+        if time.localtime(timestamp - 3600).tm_isdst == time.localtime(timestamp).tm_isdst == \
+                time.localtime(timestamp + 3600).tm_isdst:
+            assert restored == turn
+        else:
+            assert restored.to_dict() == turn.to_dict()
+
+
+def test_malformed_timestamps_default_to_now():
+    before = int(time.time())
+    for timestamp in ("yesterday", "2026-13-40 99:00:00", [], {"at": 1}):
+        turn = Turn.from_dict({"role": "bot", "message": "hi", "timestamp": timestamp})
+        assert before <= turn.timestamp <= int(time.time())
+    assert Turn.from_dict({"role": "user", "message": "hi", "timestamp": 1700000000}).timestamp == 1700000000
+
+
+@pytest.mark.parametrize("entry", [
+    {"role": "assistant", "message": "hi"},
+    {"message": "no role"},
+    "just text",
+    None
+])
+def test_invalid_entries_are_not_turns(entry):
+    assert Turn.parse(entry) is None
+
+
+def test_bad_history_entries_do_not_break_loading():
+    store = MemoryStateStore()
+    store.compact({"history": [
+        {"role": "user", "message": "first", "timestamp": "2026-01-01 10:00:00"},
+        {"role": "system", "message": "unknown role", "timestamp": "2026-01-01 10:00:01"},
+        {"role": "bot", "message": "second", "timestamp": "not a time"},
+        {"role": "user", "message": "third", "timestamp": "2026-01-01 10:00:03"}
+    ]})
+    bot = MindMateBot(TRAINING_DATA, state_store=store, online_search=False)
+    assert [turn.message for turn in bot.conversation_history] == ["first", "second", "third"]
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from write_behind import WriteBehindWriter
+
+
+class FakeBot:
+    def __init__(self, failures=0):
+        self.lock = threading.RLock()
+        self.writes = 0
+        self.failures = failures
+
+    def persist_state(self):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.writes += 1
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_full_batch_is_written_without_waiting_for_the_delay():
+    writer = WriteBehindWriter(delay=60, max_batch=3)
+    try:
+        bots = [FakeBot() for _ in range(3)]
+        for bot in bots[:2]:
+            writer.mark_dirty(bot)
+        time.sleep(0.05)
+        assert len(writer) == 2
+        writer.mark_dirty(bots[2])
+        assert wait_for(lambda: all(bot.writes == 1 for bot in bots))
+        assert len(writer) == 0
+    finally:
+        writer.close()
+
+
+def test_flush_writes_each_queued_bot_once():
+    writer = WriteBehindWriter(delay=60)
+    try:
+        bot, other = FakeBot(), FakeBot()
+        for _ in range(3):
+            writer.mark_dirty(bot)
+        writer.mark_dirty(other)
+        writer.flush()
+        assert (bot.writes, other.writes) == (1, 1)
+        assert len(writer) == 0
+    finally:
+        writer.close()
+
+
+def test_close_writes_what_is_queued_and_later_saves_directly():
+    writer = WriteBehindWriter(delay=60)
+    bot = FakeBot()
+    writer.mark_dirty(bot)
+    writer.close()
+    assert bot.writes == 1
+    writer.mark_dirty(bot)
+    assert bot.writes == 2
+    writer.close()
+
+
+def test_failed_write_is_logged_and_retried(caplog):
+    writer = WriteBehindWriter(delay=60)
+    try:
+        bot = FakeBot(failures=1)
+        writer.mark_dirty(bot)
+        writer.flush()
+        assert bot.writes == 0
+        assert len(writer) == 1
+        assert "Error writing bot state" in caplog.text
+        writer.flush()
+        assert bot.writes == 1
+        assert len(writer) == 0
+    finally:
+        writer.close()
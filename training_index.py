@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import pickle
+import stat
+import threading
+from intent_matcher import IntentMatcher
+from intent_classifier import IntentClassifier
+
+# Training data used when the JSON file is missing or invalid
+DEFAULT_TRAINING_DATA = {
+    "greetings": {
+        "patterns": ["hello", "hi", "hey", "howdy", "greetings", "good morning", "good afternoon", "good evening"],
+        "responses": [
+            "Hello! I'm MindMate, a companion designed specifically for men's mental wellbeing. What's on your mind today?",
+            "Hi there. I'm here to listen and chat without judgment. How are you feeling today?",
+            "Hey! I'm MindMate. I'm here to provide a space where you can express yourself freely. What would you like to talk about?"
+        ]
+    },
+    "stress": {
+        "patterns": ["stressed", "pressure", "overwhelmed", "too much", "can't handle", "burnout"],
+        "responses": [
+            "It sounds like you're dealing with a lot of stress. Many men experience this but don't always talk about it. What specific situations are causing you to feel this way?",
+            "Feeling overwhelmed is common, especially when we're juggling multiple responsibilities. What's contributing most to your stress right now?",
+            "I hear that you're feeling under pressure. Sometimes taking a step back to identify what's in your control can help. Would you like to explore some stress management techniques?"
+        ],
+        "follow_ups": [
+            "Have you tried any particular ways to manage this stress?",
+            "How has this stress been affecting other areas of your life?",
+            "On a scale of 1-10, how would you rate your current stress level?"
+        ]
+    },
+    "sleep": {
+        "patterns": ["can't sleep", "insomnia", "trouble sleeping", "awake at night", "sleep problems"],
+        "responses": [
+            "Sleep difficulties can really impact our mental well-being. What's your sleep pattern been like recently?",
+            "Many people struggle with sleep, especially during stressful periods. Have you noticed any patterns with your sleep troubles?",
+            "Sleep problems can both result from and contribute to mental health challenges. How long have you been experiencing these sleep issues?"
+        ],
+        "follow_ups": [
+            "Have you tried any sleep hygiene techniques, like limiting screen time before bed?",
+            "How is your sleep environment? Sometimes small changes can make a big difference.",
+            "Many find that having a consistent bedtime routine helps. What does your evening routine look like?"
+        ]
+    },
+    "relationships": {
+        "patterns": ["relationship", "partner", "girlfriend", "boyfriend", "wife", "husband", "marriage"],
+        "responses": [
+            "Relationships can bring both joy and challenges. What aspects of your relationship have been on your mind?",
+            "Many men find it difficult to discuss relationship concerns. I appreciate you bringing this up. What's going on with your relationship?",
+            "Navigating relationships takes work and good communication. What specific situation in your relationship would you like to explore?"
+        ],
+        "follow_ups": [
+            "Have you been able to discuss these feelings with your partner?",
+            "What would an ideal resolution to this situation look like for you?",
+            "How have relationship dynamics affected your overall well-being?"
+        ]
+    },
+    "work": {
+        "patterns": ["job", "career", "workplace", "boss", "coworker", "employment", "work"],
+        "responses": [
+            "Work can be a significant source of both fulfillment and stress. What's been happening in your work life?",
+            "Many men tie their identity closely to their work. How has your job been affecting your mental state lately?",
+            "Workplace challenges can spill over into other areas of life. What specific aspects of work have been difficult?"
+        ],
+        "follow_ups": [
+            "How does your current job align with your longer-term goals?",
+            "What parts of your work do you find most rewarding?",
+            "Have you been able to maintain boundaries between work and personal time?"
+        ]
+    },
+    "emotions": {
+        "patterns": ["feelings", "angry", "sad", "happy", "upset", "emotional", "mood", "depression", "anxiety"],
+        "responses": [
+            "Thank you for sharing how you're feeling. Many men find it difficult to express emotions. Can you tell me more about what triggered these feelings?",
+            "I appreciate you opening up about your emotions. That takes courage. When did you start feeling this way?",
+            "Emotions provide important information about our needs and experiences. How have you been managing these feelings?"
+        ],
+        "follow_ups": [
+            "How do these emotions show up physically in your body?",
+            "What helps you process these kinds of feelings when they arise?",
+            "Have you noticed any patterns around when these emotions are strongest?"
+        ]
+    },
+    "isolation": {
+        "patterns": ["lonely", "alone", "isolated", "no friends", "no one understands", "disconnected"],
+        "responses": [
+            "Feeling isolated is a common but difficult experience. How long have you been feeling this way?",
+            "Social connection is important for wellbeing, and it's meaningful that you're sharing these feelings. What has contributed to this sense of isolation?",
+            "Many men experience loneliness but don't always talk about it. What kind of connections would you like to have in your life?"
+        ],
+        "follow_ups": [
+            "Are there people in your life you feel you could reach out to?",
+            "What activities have helped you feel connected to others in the past?",
+            "Has there been a change in your social circumstances recently?"
+        ]
+    },
+    "default": {
+        "responses": [
+            "I'm here to listen and support you. Could you share more about what's on your mind?",
+            "Thank you for sharing that. How has this been affecting you?",
+            "I appreciate you opening up. Would you like to explore this topic further?"
+        ]
+    }
+}
+
+# Snapshot format version; bump when the compiled classes change so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+
+def check_training_data(training_data):
+    """
+    Check that training data has the shape the bot relies on
+
+    Raises:
+        ValueError: describing the first problem found
+    """
+    if not isinstance(training_data, dict):
+        raise ValueError("Training data must be a JSON object of intents")
+    for intent, data in training_data.items():
+        if not isinstance(data, dict):
+            raise ValueError(f"Intent {intent!r} must be a JSON object")
+    if not training_data.get("default", {}).get("responses"):
+        raise ValueError("Training data needs a \"default\" intent with responses")
+
+
+def snapshot_path(path):
+    """Path of the compiled snapshot kept next to a training data file"""
+    return path + ".compiled"
+
+
+def is_private_file(file):
+    """Check that an open file belongs to the current user and no one else can write to it"""
+    if not hasattr(os, "getuid"):
+        # Windows has no owner ids or group and world write bits to check
+        return True
+    info = os.fstat(file.fileno())
+    return info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+class TrainingIndex:
+    """
+    Parsed training data and its compiled pattern index
+
+    An index is built once and shared by every bot and session that uses the same
+    training data, so it must be treated as read-only once built
+
+    Compiling is the slow part of loading, so from_file keeps a pickled
+    snapshot of the compiled index next to the JSON file, keyed by a SHA-256
+    of the file's contents, and rebuilds it whenever the file changes.
+    """
+
+    # Process-wide cache of indexes by training data path
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, training_data, path=None, intent_matcher=None, classifier_snapshot=None):
+        """
+        Compile an index over already-parsed training data
+
+        Args:
+            training_data: Dictionary of intents, as loaded from training_data.json
+            path: Optional path the training data was loaded from
+            intent_matcher: Optional IntentMatcher already compiled from training_data
+            classifier_snapshot: Optional pickled IntentClassifier built from training_data
+        """
+        self.path = path
+        self.training_data = training_data
+        # Compile all intent patterns once so matching is a single pass per message
+        self.intent_matcher = intent_matcher or IntentMatcher(training_data)
+        # The TF-IDF classifier is only built, or unpickled, if a bot selects it
+        self._intent_classifier = None
+        self._classifier_snapshot = classifier_snapshot
+        self._classifier_lock = threading.Lock()
+
+    @property
+    def intent_classifier(self):
+        """The TF-IDF intent classifier, vectorized on first use"""
+        if self._intent_classifier is None:
+            with self._classifier_lock:
+                if self._intent_classifier is None:
+                    if self._classifier_snapshot is not None:
+                        self._intent_classifier = pickle.loads(self._classifier_snapshot)
+                    else:
+                        self._intent_classifier = IntentClassifier(self.training_data)
+        return self._intent_classifier
+
+    @classmethod
+    def from_file(cls, path, snapshot=True):
+        """
+        Load training data from a JSON file and compile it
+
+        If the file doesn't exist or is invalid, it is created with the default training data
+
+        Args:
+            path: Path to the JSON file containing training data
+            snapshot: Whether to load the compiled snapshot when it matches the file,
+                and to write a new one when it doesn't
+
+        Returns:
+            A new TrainingIndex
+        """
+        try:
+            return cls.load(path, snapshot)
+        except (FileNotFoundError, json.JSONDecodeError):
+            training_data = json.loads(json.dumps(DEFAULT_TRAINING_DATA))
+            # Create the file with default training data
+            with open(path, 'w') as file:
+                json.dump(training_data, file, indent=4)
+            return cls(training_data, path)
+
+    @classmethod
+    def load(cls, path, snapshot=True):
+        """
+        Load training data from a JSON file and compile it, without falling back to the defaults
+
+        Args:
+            path: Path to the JSON file containing training data
+            snapshot: Whether to load the compiled snapshot when it matches the file,
+                and to write a new one when it doesn't
+
+        Returns:
+            A new TrainingIndex
+
+        Raises:
+            OSError: The file can't be read
+            json.JSONDecodeError: The file isn't valid JSON
+        """
+        with open(path, 'rb') as file:
+            source = file.read()
+        digest = hashlib.sha256(source).hexdigest()
+        if snapshot:
+            index = cls.load_snapshot(path, digest)
+            if index is not None:
+                return index
+
+        index = cls(json.loads(source), path)
+        if snapshot:
+            index.save_snapshot(digest)
+        return index
+
+    @classmethod
+    def load_snapshot(cls, path, digest):
+        """
+        Load the compiled snapshot of a training data file
+
+        Args:
+            path: Path to the JSON file containing training data
+            digest: SHA-256 hex digest of the file's current contents
+
+        Returns:
+            A TrainingIndex, or None if there is no snapshot or it was built from other contents
+        """
+        # Snapshots are pickles, and unpickling one can run code, so a snapshot is only read if this
+        # user wrote it and no one else could have changed it; otherwise the data is compiled again
+        try:
+            with open(snapshot_path(path), 'rb') as file:
+                if not is_private_file(file):
+                    return None
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION or data.get("digest") != digest:
+            return None
+        return cls(data["training_data"], path, data["intent_matcher"], data["intent_classifier"])
+
+    def save_snapshot(self, digest):
+        """
+        Write the compiled snapshot next to the training data file
+
+        The TF-IDF classifier is built for the snapshot too, and stored pickled
+        so that loading the snapshot only unpickles it if a bot selects it.
+
+        Args:
+            digest: SHA-256 hex digest of the training data file the index was built from
+        """
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "digest": digest,
+            "training_data": self.training_data,
+            "intent_matcher": self.intent_matcher,
+            "intent_classifier": pickle.dumps(self.intent_classifier, protocol=pickle.HIGHEST_PROTOCOL)
+        }
+        path = snapshot_path(self.path)
+        # Each process writes its own temporary file, then renames it over the snapshot
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            # Only the owner may write the snapshot, whatever the umask, or load_snapshot won't trust it
+            with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644), 'wb') as file:
+                pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError:
+            # A read-only deployment still works; it just compiles on every start
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    @classmethod
+    def shared(cls, path):
+        """
+        Get the process-wide index for a training data file, loading it on first use
+
+        Args:
+            path: Path to the JSON file containing training data
+
+        Returns:
+            The shared TrainingIndex for the path
+        """
+        with cls._cache_lock:
+            index = cls._cache.get(path)
+            if index is None:
+                index = cls._cache[path] = cls.from_file(path)
+            return index
+
+    @classmethod
+    def share(cls, index):
+        """Make an index the process-wide one for its path, e.g. after reloading the training data"""
+        with cls._cache_lock:
+            cls._cache[index.path] = index
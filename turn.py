@@ -0,0 +1,106 @@
+import time
+from enum import Enum
+
+# Timestamp format used in bot_state.json and the other stored history formats
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class Role(Enum):
+    """Who sent a turn; every turn shares these two members"""
+    USER = "user"
+    BOT = "bot"
+
+
+class Turn:
+    """
+    One conversation history entry
+
+    Turns are kept in memory as slotted records with a Role member and an
+    integer epoch timestamp. The stored formats still use dictionaries with a
+    formatted local-time timestamp; to_dict() and from_dict() convert between
+    the two. A stored entry converts back to the same entry; a timestamp in
+    the hour repeated when daylight saving time ends may come back as the
+    other instance of that hour.
+    """
+
+    __slots__ = ("role", "message", "timestamp")
+
+    def __init__(self, role, message, timestamp=None):
+        """
+        Create a turn
+
+        Args:
+            role: A Role member
+            message: The message text
+            timestamp: Seconds since the epoch; defaults to now
+        """
+        self.role = role
+        self.message = message
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+
+    @classmethod
+    def from_dict(cls, entry):
+        """
+        Create a turn from a stored history entry
+
+        A missing or malformed timestamp is replaced with the current time.
+
+        Args:
+            entry: Dictionary with 'role', 'message' and 'timestamp' keys
+
+        Returns:
+            A Turn
+
+        Raises:
+            KeyError, ValueError: The entry has no role or an unknown one
+        """
+        timestamp = entry.get('timestamp')
+        try:
+            if isinstance(timestamp, str):
+                # Stored timestamps are local time with one-second resolution
+                timestamp = int(time.mktime(time.strptime(timestamp, TIMESTAMP_FORMAT)))
+            elif timestamp is not None:
+                timestamp = int(timestamp)
+        except (ValueError, TypeError, OverflowError):
+            timestamp = None
+        message = entry.get('message', '')
+        return cls(Role(entry['role']), message if isinstance(message, str) else str(message), timestamp)
+
+    @classmethod
+    def parse(cls, entry):
+        """
+        Create a turn from a stored history entry, skipping entries that aren't turns
+
+        Args:
+            entry: A stored history entry, possibly malformed
+
+        Returns:
+            A Turn, or None if the entry isn't a dictionary with a known role
+        """
+        if not isinstance(entry, dict):
+            return None
+        try:
+            return cls.from_dict(entry)
+        except (KeyError, ValueError):
+            return None
+
+    def to_dict(self):
+        """
+        Convert the turn to the stored history entry format
+
+        Returns:
+            Dictionary with 'role', 'message' and 'timestamp' keys
+        """
+        return {
+            'role': self.role.value,
+            'message': self.message,
+            'timestamp': time.strftime(TIMESTAMP_FORMAT, time.localtime(self.timestamp))
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, Turn):
+            return NotImplemented
+        return (self.role, self.message, self.timestamp) == (other.role, other.message, other.timestamp)
+
+    def __repr__(self):
+        return "Turn(%s, %r, %d)" % (self.role.name, self.message, self.timestamp)
@@ -0,0 +1,111 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindWriter:
+    """
+    Background writer that takes state saves off the request path
+
+    Bots mark themselves dirty instead of writing on every turn. A daemon
+    thread waits for the configured delay, or until the batch fills up, and
+    then persists every dirty bot once, so several turns of a session are
+    written as one delta. Anything still queued is written on flush(),
+    close(), or at interpreter exit. A bot whose write fails is logged and
+    stays queued, so its changes are retried with the next batch.
+    """
+
+    def __init__(self, delay=1.0, max_batch=64):
+        """
+        Initialize the writer
+
+        Args:
+            delay: Seconds to wait after the first dirty bot before flushing
+            max_batch: Number of dirty bots that triggers an immediate flush
+        """
+        self.delay = delay
+        self.max_batch = max_batch
+        self._dirty = OrderedDict()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="mindmate-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __len__(self):
+        return len(self._dirty)
+
+    def mark_dirty(self, bot):
+        """
+        Queue a bot whose state changed since its last save
+
+        Args:
+            bot: The MindMateBot to persist
+        """
+        with self._condition:
+            if self._closed:
+                # After shutdown there is no background thread, so write synchronously
+                bot.persist_state()
+                return
+            self._dirty[id(bot)] = bot
+            if len(self._dirty) == 1 or len(self._dirty) >= self.max_batch:
+                self._condition.notify()
+
+    def _take_batch(self):
+        """Remove and return every queued bot; caller holds self._condition"""
+        batch = list(self._dirty.values())
+        self._dirty.clear()
+        return batch
+
+    def _write(self, batch):
+        """Persist each bot in the batch under its own lock"""
+        with self._flush_lock:
+            for bot in batch:
+                try:
+                    with bot.lock:
+                        bot.persist_state()
+                except Exception:
+                    logger.exception("Error writing bot state; it stays queued for the next flush")
+                    # Keep the bot queued so its changes are retried on the next flush
+                    with self._condition:
+                        self._dirty.setdefault(id(bot), bot)
+
+    def _run(self):
+        """Background loop: wait for dirty bots, let the batch fill for `delay`, then write"""
+        while True:
+            with self._condition:
+                while not self._dirty and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                deadline = time.monotonic() + self.delay
+                while len(self._dirty) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._take_batch()
+            self._write(batch)
+
+    def flush(self):
+        """Write every queued bot now, in the calling thread"""
+        with self._condition:
+            batch = self._take_batch()
+        self._write(batch)
+
+    def close(self):
+        """Stop the background thread and write anything still queued"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self.flush()
+        if self._dirty:
+            logger.error("%d bot states could not be written at shutdown", len(self._dirty))